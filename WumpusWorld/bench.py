@@ -0,0 +1,292 @@
+import argparse
+import random
+import sys
+import time
+from typing import List, Optional
+
+from engine import Game, Agent, World
+
+
+def time_episodes(world_cls, agent_cls, n: int, episodes: int, max_steps: int, seed: int):
+    steps = 0
+    elapsed = 0.0
+    for e in range(episodes):
+        game = Game(world=world_cls(n=n), rng=random.Random(2 * (seed + e)))
+        game.reset()
+        agent = agent_cls(game, random.Random(2 * (seed + e) + 1))
+        t0 = time.perf_counter()
+        s = 0
+        while not game.terminal and s < max_steps:
+            agent.step()
+            s += 1
+        elapsed += time.perf_counter() - t0
+        steps += s
+    return steps, elapsed
+
+
+def time_percepts(world_cls, n: int, rounds: int, seed: int) -> float:
+    world = world_cls(n=n)
+    world.reset_random(random.Random(seed))
+    cells = [(x, y) for x in range(1, n + 1) for y in range(1, n + 1)]
+    percepts_at = world.percepts_at
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        for x, y in cells:
+            percepts_at(x, y)
+    return (time.perf_counter() - t0) / (rounds * len(cells))
+
+
+def bench_bitboard(sizes: List[int], seed: int):
+    from bitboard import BitAgent, BitWorld
+    plan = {4: (2000, 128), 16: (100, 400), 64: (40, 400)}
+    print(f"{'n':>4} {'backend':>8} {'steps':>7} {'us/step':>10} {'us/percept':>11}")
+    for n in sizes:
+        episodes, max_steps = plan.get(n, (20, 8 * n * n))
+        rows = []
+        for name, w, a in (("sets", World, Agent), ("bits", BitWorld, BitAgent)):
+            steps, elapsed = time_episodes(w, a, n, episodes, max_steps, seed)
+            per_percept = time_percepts(w, n, max(1, 20000 // (n * n)), seed)
+            rows.append(elapsed / max(steps, 1))
+            print(f"{n:>4} {name:>8} {steps:>7} {1e6 * rows[-1]:>10.2f} {1e6 * per_percept:>11.3f}")
+        print(f"{n:>4} {'speedup':>8} {'':>7} {rows[0] / rows[1]:>9.1f}x")
+
+
+def bench_replay(actions: int, seed: int):
+    from replay import Recording, Replay
+    rng = random.Random(seed)
+    # a hazard-free board keeps the stream from ending early
+    stream = bytes(rng.choice(b"FFFLRGDS") for _ in range(actions))
+    rec = Recording(8, (frozenset(), None, (4, 4)), stream)
+    t0 = time.perf_counter()
+    rp = Replay(rec)
+    built = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    for t in range(0, len(rp), max(1, len(rp) // 10000)):
+        rp.state(t)
+    seek = (time.perf_counter() - t0) / min(len(rp) + 1, 10000)
+    print(f"replayed {len(rp)} actions in {built:.3f}s ({len(rp) / built / 1e6:.2f}M actions/s), "
+          f"random seek {1e6 * seek:.2f}us")
+
+
+def bench_inference(n: int, episodes: int, seed: int):
+    from inference import RiskModel, breeze_clauses, naive_pit_probabilities
+    states = []
+    for e in range(episodes):
+        game = Game(world=World(n=n), rng=random.Random(2 * (seed + e)))
+        game.reset()
+        agent = Agent(game, random.Random(2 * (seed + e) + 1))
+        s = 0
+        while not game.terminal and s < 400:
+            agent.step()
+            s += 1
+            if agent.breeze_cells:
+                states.append((set(agent.visited), set(agent.breeze_cells), set(agent.stench_cells),
+                               game.world.wumpus_alive))
+    model = RiskModel()
+    times = []
+    for visited, breeze, stench, alive in states:
+        t0 = time.perf_counter()
+        model.pit_probabilities(n, visited, breeze)
+        model.wumpus_probabilities(n, visited, stench, alive)
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    print(f"{n}x{n}: {len(states)} knowledge states, exact inference "
+          f"mean {1e3 * sum(times) / len(times):.3f}ms p99 {1e3 * times[int(len(times) * 0.99)]:.3f}ms "
+          f"max {1e3 * times[-1]:.3f}ms")
+    naive_t, naive_k, skipped = 0.0, 0, 0
+    for visited, breeze, _, _ in states[:200]:
+        frontier = set().union(*breeze_clauses(n, visited, breeze)[1])
+        if len(frontier) > 16:
+            skipped += 1
+            continue
+        t0 = time.perf_counter()
+        naive_pit_probabilities(n, visited, breeze)
+        naive_t += time.perf_counter() - t0
+        naive_k += 1
+    if naive_k:
+        print(f"naive joint enumeration: mean {1e3 * naive_t / naive_k:.3f}ms over {naive_k} states "
+              f"({skipped} states with more than 16 frontier cells skipped)")
+
+
+def bench_grid(sizes: List[int], episodes: int, seed: int, pit_prob: float):
+    from bitboard import BitAgent, BitWorld
+    print(f"{'n':>4} {'backend':>8} {'steps':>7} {'mean us':>9} {'p50 us':>8} {'p99 us':>8} {'max us':>9}")
+    for n in sizes:
+        for name, w, a in (("sets", World, Agent), ("bits", BitWorld, BitAgent)):
+            lat = []
+            for e in range(episodes):
+                game = Game(world=w(n=n, pit_prob=pit_prob), rng=random.Random(2 * (seed + e)))
+                game.reset()
+                agent = a(game, random.Random(2 * (seed + e) + 1))
+                s = 0
+                while not game.terminal and s < 2000:
+                    t0 = time.perf_counter()
+                    agent.step()
+                    lat.append(time.perf_counter() - t0)
+                    s += 1
+            lat.sort()
+            k = len(lat)
+            print(f"{n:>4} {name:>8} {k:>7} {1e6 * sum(lat) / k:>9.1f} {1e6 * lat[k // 2]:>8.1f} "
+                  f"{1e6 * lat[min(k - 1, k * 99 // 100)]:>8.1f} {1e6 * lat[-1]:>9.1f}")
+
+
+def bench_render(sizes: List[int], seed: int, frames: int = 300):
+    import os
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    from wumpus import Renderer
+    print(f"{'n':>4} {'full ms/frame':>14} {'dirty ms/frame':>15} {'speedup':>8}")
+    for n in sizes:
+        rows = []
+        for full in (True, False):
+            game = Game(world=World(n=n, pit_prob=0.05), rng=random.Random(2 * seed))
+            game.reset()
+            agent = Agent(game, random.Random(2 * seed + 1))
+            renderer = Renderer(game)
+            renderer.draw()
+            elapsed = 0.0
+            for _ in range(frames):
+                if game.terminal:
+                    game.reset()
+                    agent.reset()
+                agent.step()
+                t0 = time.perf_counter()
+                if full:
+                    renderer.invalidate()
+                renderer.draw()
+                elapsed += time.perf_counter() - t0
+            rows.append(elapsed / frames)
+        print(f"{n:>4} {1e3 * rows[0]:>14.3f} {1e3 * rows[1]:>15.3f} {rows[0] / rows[1]:>7.1f}x")
+
+
+def bench_vecenv(k: int, seed: int, rounds: int = 200):
+    import numpy as np
+    from vecenv import VecEnv, ACTIONS
+    env = VecEnv(k, seed=seed)
+    env.reset()
+    actions = np.random.default_rng(seed).integers(0, len(ACTIONS), size=(rounds, k))
+    t0 = time.perf_counter()
+    for a in actions:
+        env.step(a)
+    vec = (time.perf_counter() - t0) / rounds
+    games = [Game(rng=random.Random(seed + i)) for i in range(k)]
+    for g in games:
+        g.reset()
+    t0 = time.perf_counter()
+    for _ in range(10):
+        for g in games:
+            g.move_forward()
+            if g.terminal:
+                g.reset()
+    loop = (time.perf_counter() - t0) / 10
+    print(f"{k} games: VecEnv.step {1e3 * vec:.2f}ms, {k} Game.move_forward calls {1e3 * loop:.2f}ms "
+          f"({loop / vec:.1f}x), {k / vec / 1e6:.2f}M game-steps/s")
+
+
+def bench_planner(sizes: List[int], episodes: int, seed: int, budgets: List[float]):
+    from headless import run_batch
+    from planner import PlannerAgent
+    print(f"{'n':>4} {'agent':>12} {'score':>8} {'win %':>6} {'decisions':>9} {'rollouts/s':>11} {'ms/decision':>11}")
+    for n in sizes:
+        for budget in [None] + budgets:
+            agents = []
+
+            def make(game, rng=None):
+                agent = Agent(game, rng) if budget is None else PlannerAgent(game, rng, budget=budget / 1000)
+                agents.append(agent)
+                return agent
+
+            s = run_batch(episodes, seed=seed, world_cls=lambda: World(n=n), agent_cls=make).summary()
+            name = "rules" if budget is None else f"plan {budget:g}ms"
+            if budget is None:
+                print(f"{n:>4} {name:>12} {s['score_mean']:>8.1f} {100 * s['win_rate']:>6.1f}")
+                continue
+            decisions = sum(a.decisions for a in agents)
+            rollouts = sum(a.rollouts for a in agents)
+            spent = sum(a.planning_time for a in agents)
+            print(f"{n:>4} {name:>12} {s['score_mean']:>8.1f} {100 * s['win_rate']:>6.1f} {decisions:>9} "
+                  f"{rollouts / spent if spent else 0:>11.0f} {1e3 * spent / max(decisions, 1):>11.2f}")
+
+
+def bench_kb(sizes: List[int], episodes: int, seed: int, pit_prob: float):
+    from kb import KBAgent
+    print(f"{'n':>4} {'agent':>6} {'updates':>8} {'mean us':>8} {'p99 us':>8} {'safe':>7} {'pits':>6} {'wumpus':>6}")
+    for n in sizes:
+        for name, cls in (("rules", Agent), ("kb", KBAgent)):
+            lat = []
+            safe = pits = wumpus = 0
+            for e in range(episodes):
+                game = Game(world=World(n=n, pit_prob=pit_prob), rng=random.Random(2 * (seed + e)))
+                game.reset()
+                agent = cls(game, random.Random(2 * (seed + e) + 1))
+                update = agent.update_knowledge
+
+                def timed(p, x, y, update=update):
+                    t0 = time.perf_counter()
+                    update(p, x, y)
+                    lat.append(time.perf_counter() - t0)
+
+                agent.update_knowledge = timed
+                s = 0
+                while not game.terminal and s < 2000:
+                    agent.step()
+                    s += 1
+                safe += len(agent.safe)
+                pits += len(agent.pits)
+                wumpus += agent.wumpus_cell is not None
+            lat.sort()
+            k = len(lat)
+            print(f"{n:>4} {name:>6} {k:>8} {1e6 * sum(lat) / k:>8.2f} {1e6 * lat[min(k - 1, k * 99 // 100)]:>8.2f} "
+                  f"{safe:>7} {pits:>6} {wumpus:>6}")
+
+
+def bench_worldgen(sizes: List[int], games: int, seed: int, pit_prob: float):
+    import numpy as np
+    from worldgen import generate_worlds, justified_path, solvable_worlds
+    print(f"{'n':>4} {'raw/s':>10} {'solvable/s':>11} {'accepted':>9} {'mean path':>10}")
+    for n in sizes:
+        rng = np.random.default_rng(seed)
+        t0 = time.perf_counter()
+        generate_worlds(games, rng, n, pit_prob)
+        raw = games / (time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        b = solvable_worlds(games, rng, n, pit_prob)
+        dt = time.perf_counter() - t0
+        accepted = (justified_path(generate_worlds(games, rng, n, pit_prob)) > 0).mean()
+        print(f"{n:>4} {raw:>10.0f} {games / dt:>11.0f} {accepted:>9.1%} {b.path.mean():>10.2f}")
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Wumpus World micro-benchmarks.")
+    parser.add_argument("suite", choices=["bitboard", "replay", "inference", "grid", "render", "vecenv", "planner", "kb",
+                                        "worldgen"])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 16, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--actions", type=int, default=1_000_000)
+    parser.add_argument("--episodes", type=int, default=20)
+    parser.add_argument("--pit-prob", type=float, default=0.05)
+    parser.add_argument("--games", type=int, default=4096)
+    parser.add_argument("--budgets", type=float, nargs="+", default=[1, 5, 20], help="planner ms per decision")
+    args = parser.parse_args(argv)
+    if args.suite == "bitboard":
+        bench_bitboard(args.sizes, args.seed)
+    elif args.suite == "replay":
+        bench_replay(args.actions, args.seed)
+    elif args.suite == "inference":
+        for n in args.sizes:
+            bench_inference(n, 50, args.seed)
+    elif args.suite == "grid":
+        bench_grid(args.sizes, args.episodes, args.seed, args.pit_prob)
+    elif args.suite == "render":
+        bench_render(args.sizes, args.seed)
+    elif args.suite == "vecenv":
+        bench_vecenv(args.games, args.seed)
+    elif args.suite == "planner":
+        bench_planner(args.sizes, args.episodes, args.seed, args.budgets)
+    elif args.suite == "kb":
+        bench_kb(args.sizes, args.episodes, args.seed, args.pit_prob)
+    elif args.suite == "worldgen":
+        bench_worldgen(args.sizes, args.games, args.seed, args.pit_prob)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,266 @@
+import random
+from collections import deque
+from functools import lru_cache
+from typing import Iterator, List, Optional, Tuple
+
+from engine import DIRS, EAST, NORTH, WEST, SOUTH, Agent, Game, Percepts, World, cell_index, cell_xy
+
+class BitGrid:
+    def __init__(self, n: int):
+        self.n = n
+        self.cells = n * n
+        self.full = (1 << self.cells) - 1
+        self.xy: List[Tuple[int, int]] = [cell_xy(i, n) for i in range(self.cells)]
+        # step[i][d] is the cell reached by moving from i in direction d, or -1 at the wall
+        self.step: List[List[int]] = []
+        self.nbr: List[int] = []
+        self.nbr_xy: List[List[Tuple[int, int]]] = []
+        for i in range(self.cells):
+            x, y = self.xy[i]
+            row = []
+            mask = 0
+            for dx, dy in DIRS:
+                nx, ny = x + dx, y + dy
+                if 1 <= nx <= n and 1 <= ny <= n:
+                    j = cell_index(nx, ny, n)
+                    row.append(j)
+                    mask |= 1 << j
+                else:
+                    row.append(-1)
+            self.step.append(row)
+            self.nbr.append(mask)
+            self.nbr_xy.append([self.xy[j] for j in row if j >= 0])
+
+
+@lru_cache(maxsize=None)
+def grid(n: int) -> BitGrid:
+    return BitGrid(n)
+
+
+def iter_bits(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def to_mask(cells, n: int) -> int:
+    m = 0
+    for x, y in cells:
+        m |= 1 << cell_index(x, y, n)
+    return m
+
+
+class BitWorld(World):
+    __slots__ = ("grid",)
+
+    def rebuild_percepts(self):
+        self.grid = grid(self.n)
+        super().rebuild_percepts()
+
+    def neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
+        return list(self.grid.nbr_xy[(y - 1) * self.n + (x - 1)])
+
+
+class BitAgent(Agent):
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model=None):
+        self.game = game
+        self.rng = rng if rng is not None else random.Random()
+        self.risk_model = risk_model
+        self.path_home: List[str] = []
+        self.plan: List[str] = []
+        self.bfs_nodes = 0
+        self.reset()
+
+    def reset(self):
+        self.grid = grid(self.game.world.n)
+        self.path_home.clear()
+        self.plan.clear()
+        self.visited = 0
+        self.safe = 1
+        self.pits = 0
+        self.breeze = 0
+        self.stench = 0
+        self.wumpus_cell: Optional[Tuple[int, int]] = None
+        self.wumpus_mask = 0
+        self.frontier_version = None
+        self.frontier_paths = {}
+        self.risk_key = None
+
+    def idx(self, x: int, y: int) -> int:
+        return (y - 1) * self.grid.n + (x - 1)
+
+    def live_wumpus_mask(self) -> int:
+        return self.wumpus_mask if self.game.world.wumpus_alive else 0
+
+    def set_wumpus(self, mask: int):
+        i = mask.bit_length() - 1
+        self.wumpus_mask = mask
+        self.wumpus_cell = self.grid.xy[i]
+
+    def mark_visited(self, x: int, y: int):
+        self.visited |= 1 << self.idx(x, y)
+
+    def nbrs(self, x: int, y: int) -> List[Tuple[int, int]]:
+        return list(self.grid.nbr_xy[self.idx(x, y)])
+
+    def update_knowledge(self, p: Percepts, x: int, y: int):
+        i = self.idx(x, y)
+        nb = self.grid.nbr[i]
+        if not p.breeze and not p.stench:
+            self.safe |= nb & ~self.pits
+        if p.breeze:
+            self.breeze |= 1 << i
+            unknown = nb & ~self.safe & ~self.pits & ~self.wumpus_mask
+            if unknown and not unknown & (unknown - 1):
+                self.pits |= unknown
+        if p.stench and self.game.world.wumpus_alive:
+            self.stench |= 1 << i
+            unknown = nb & ~self.safe & ~self.pits
+            if self.wumpus_cell is None and unknown and not unknown & (unknown - 1):
+                self.set_wumpus(unknown)
+        self.infer_wumpus_from_intersections()
+
+    def infer_wumpus_from_intersections(self):
+        if self.wumpus_cell or not self.game.world.wumpus_alive or not self.stench:
+            return
+        nbr = self.grid.nbr
+        candidates = ~(self.safe | self.pits) & self.grid.full
+        for s in iter_bits(self.stench):
+            candidates &= nbr[s]
+            if not candidates:
+                return
+        if not candidates & (candidates - 1):
+            self.set_wumpus(candidates)
+
+    def risk_at(self, i: int) -> float:
+        b = 1 << i
+        if b & self.safe:
+            return 0.0
+        if b & (self.pits | self.live_wumpus_mask()):
+            return 1.0
+        if self.risk_model is not None:
+            return self.model_risk(i)
+        known = self.safe | self.pits
+        nbr = self.grid.nbr
+        risk = 0.0
+        for j in iter_bits(self.breeze & nbr[i]):
+            risk += 1.0 / (nbr[j] & ~known).bit_count()
+        return risk
+
+    def model_risk(self, i: int) -> float:
+        alive = self.game.world.wumpus_alive
+        key = (self.visited, alive)
+        if key != self.risk_key:
+            xy = self.grid.xy
+            self.risk_sets = tuple({xy[j] for j in iter_bits(m)} for m in (self.visited, self.breeze, self.stench))
+            self.risk_key = key
+        return self.risk_model.risk(self.grid.n, *self.risk_sets, alive, self.grid.xy[i])
+
+    def cell_risk(self, cell: Tuple[int, int]) -> float:
+        return self.risk_at(self.idx(*cell))
+
+    def best_adjacent_unknown(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        blocked = self.visited | self.safe | self.pits | self.live_wumpus_mask()
+        options = []
+        for j in self.grid.step[self.idx(x, y)]:
+            if j < 0 or (blocked >> j) & 1:
+                continue
+            options.append((self.risk_at(j), self.grid.xy[j]))
+        if not options:
+            return None
+        options.sort(key=lambda t: (t[0], t[1][0], t[1][1]))
+        return options[0][1]
+
+    def passable(self) -> int:
+        return self.safe & ~self.pits & ~self.live_wumpus_mask()
+
+    def search(self, start: int, goal_mask: int) -> List[str]:
+        # Same action-level search as Agent.bfs_path over packed (cell << 2 | heading) states.
+        if (goal_mask >> start) & 1:
+            return []
+        step = self.grid.step
+        ok = self.passable()
+        s0 = start << 2 | self.game.agent.dir
+        parent = {s0: None}
+        q = deque([s0])
+        while q:
+            s = q.popleft()
+            c, d = s >> 2, s & 3
+            moves = [(c << 2 | (d + 1) & 3, "L"), (c << 2 | (d - 1) & 3, "R")]
+            j = step[c][d]
+            if j >= 0 and (ok >> j) & 1:
+                moves.insert(0, (j << 2 | d, "F"))
+            for t, a in moves:
+                if t in parent:
+                    continue
+                parent[t] = (s, a)
+                if a == "F" and (goal_mask >> (t >> 2)) & 1:
+                    self.bfs_nodes += len(parent)
+                    path = []
+                    while parent[t] is not None:
+                        t, a = parent[t]
+                        path.append(a)
+                    path.reverse()
+                    return path
+                q.append(t)
+        self.bfs_nodes += len(parent)
+        return []
+
+    def bfs_path(self, start: Tuple[int, int], goal_pred) -> List[str]:
+        goal = 0
+        for i, c in enumerate(self.grid.xy):
+            if goal_pred(c):
+                goal |= 1 << i
+        return self.search(self.idx(*start), goal)
+
+    def knowledge_version(self):
+        return self.safe, self.pits, self.visited, self.wumpus_mask, self.game.world.wumpus_alive
+
+    def pick_safe_frontier(self) -> List[str]:
+        version = self.knowledge_version()
+        if version != self.frontier_version:
+            self.frontier_version = version
+            self.frontier_paths.clear()
+        a = self.game.agent
+        pose = (a.x, a.y, a.dir)
+        path = self.frontier_paths.get(pose)
+        if path is None:
+            frontier = self.safe & ~self.visited
+            path = self.search(self.idx(a.x, a.y), frontier) if frontier else []
+            self.frontier_paths[pose] = path
+        return list(path)
+
+    def wumpus_line_of_sight_guess(self) -> bool:
+        if not self.wumpus_cell or not self.game.world.wumpus_alive:
+            return False
+        ax, ay = self.game.agent.x, self.game.agent.y
+        wx, wy = self.wumpus_cell
+        if ax == wx and ay != wy:
+            desired = NORTH if wy > ay else SOUTH
+        elif ay == wy and ax != wx:
+            desired = EAST if wx > ax else WEST
+        else:
+            return False
+        step = self.grid.step
+        c = step[self.idx(ax, ay)][desired]
+        target = self.idx(wx, wy)
+        while c != target:
+            if (self.pits >> c) & 1:
+                return False
+            c = step[c][desired]
+        for t in self.turn_seq(self.game.agent.dir, desired):
+            self.execute_action(t)
+        self.game.shoot()
+        return True
+
+    def danger_ahead(self, stench_now: bool) -> bool:
+        j = self.grid.step[self.idx(self.game.agent.x, self.game.agent.y)][self.game.agent.dir]
+        if j < 0:
+            return False
+        b = 1 << j
+        if b & (self.pits | self.live_wumpus_mask()):
+            return True
+        if stench_now and not b & self.safe:
+            return True
+        return False
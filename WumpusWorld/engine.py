@@ -0,0 +1,754 @@
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Set
+from collections import deque
+from functools import lru_cache
+
+GRID_SIZE = 4
+CELL_PIT_PROB = 0.2
+
+DIRS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+EAST, NORTH, WEST, SOUTH = 0, 1, 2, 3
+
+Layout = Tuple[Set[Tuple[int, int]], Tuple[int, int], Tuple[int, int]]
+
+def cell_index(x: int, y: int, n: int) -> int:
+    return (y - 1) * n + (x - 1)
+
+def cell_xy(i: int, n: int) -> Tuple[int, int]:
+    return i % n + 1, i // n + 1
+
+def check_board(n: int, pit_prob: float, pit_count: Optional[int] = None):
+    # the Wumpus and the gold need a cell other than the start
+    if n < 2:
+        raise ValueError(f"board side must be at least 2, got {n}")
+    if not 0 <= pit_prob <= 1:
+        raise ValueError(f"pit probability must be in [0, 1], got {pit_prob}")
+    if pit_count is not None and not 0 <= pit_count <= n * n - 1:
+        raise ValueError(f"pit count must be in 0..{n * n - 1} on {n}x{n}, got {pit_count}")
+
+BREEZE, STENCH, GLITTER, BUMP, SCREAM = 1, 2, 4, 8, 16
+
+# one byte per action in Game.actions, using the letters Agent.execute_action understands
+FORWARD, LEFT, RIGHT, GRAB, SHOOT, CLIMB, RELEASE = b"FLRGSCD"
+ACTION_METHODS = {FORWARD: "move_forward", LEFT: "turn_left", RIGHT: "turn_right", GRAB: "grab",
+                  SHOOT: "shoot", CLIMB: "climb", RELEASE: "release"}
+
+@dataclass(frozen=True, slots=True)
+class Percepts:
+    breeze: bool = False
+    stench: bool = False
+    glitter: bool = False
+    bump: bool = False
+    scream: bool = False
+
+# every possible Percepts value, indexed by its BREEZE|STENCH|GLITTER|BUMP|SCREAM code
+PERCEPTS = tuple(
+    Percepts(breeze=bool(c & BREEZE), stench=bool(c & STENCH), glitter=bool(c & GLITTER),
+             bump=bool(c & BUMP), scream=bool(c & SCREAM))
+    for c in range(32)
+)
+
+@dataclass(slots=True)
+class World:
+    n: int = GRID_SIZE
+    pits: Set[Tuple[int, int]] = field(default_factory=set)
+    wumpus: Optional[Tuple[int, int]] = None
+    gold: Optional[Tuple[int, int]] = None
+    wumpus_alive: bool = True
+    pit_prob: float = CELL_PIT_PROB
+    pit_count: Optional[int] = None  # exact number of pits instead of one draw per cell
+    percept_codes: List[int] = field(default_factory=list, repr=False, compare=False)
+
+    def __post_init__(self):
+        check_board(self.n, self.pit_prob, self.pit_count)
+        self.rebuild_percepts()
+
+    def inside(self, x: int, y: int) -> bool:
+        return 1 <= x <= self.n and 1 <= y <= self.n
+
+    def neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
+        res = []
+        for dx, dy in DIRS:
+            nx, ny = x + dx, y + dy
+            if self.inside(nx, ny):
+                res.append((nx, ny))
+        return res
+
+    def rebuild_percepts(self):
+        n = self.n
+        codes = [0] * (n * n)
+        for x, y in self.pits:
+            for nx, ny in self.neighbors(x, y):
+                codes[(ny - 1) * n + (nx - 1)] |= BREEZE
+        if self.wumpus and self.wumpus_alive:
+            for nx, ny in self.neighbors(*self.wumpus):
+                codes[(ny - 1) * n + (nx - 1)] |= STENCH
+        if self.gold:
+            gx, gy = self.gold
+            codes[(gy - 1) * n + (gx - 1)] |= GLITTER
+        self.percept_codes = codes
+
+    def percepts_at(self, x: int, y: int, bump: bool = False, scream: bool = False) -> Percepts:
+        code = self.percept_codes[(y - 1) * self.n + (x - 1)]
+        if bump:
+            code |= BUMP
+        if scream:
+            code |= SCREAM
+        return PERCEPTS[code]
+
+    def kill_wumpus(self):
+        if not self.wumpus_alive:
+            return
+        self.wumpus_alive = False
+        if self.wumpus:
+            n = self.n
+            for nx, ny in self.neighbors(*self.wumpus):
+                self.percept_codes[(ny - 1) * n + (nx - 1)] &= ~STENCH
+
+    def revive_wumpus(self):
+        if self.wumpus_alive:
+            return
+        self.wumpus_alive = True
+        if self.wumpus:
+            n = self.n
+            for nx, ny in self.neighbors(*self.wumpus):
+                self.percept_codes[(ny - 1) * n + (nx - 1)] |= STENCH
+
+    def take_gold(self):
+        if self.gold:
+            gx, gy = self.gold
+            self.percept_codes[(gy - 1) * self.n + (gx - 1)] &= ~GLITTER
+        self.gold = None
+
+    def drop_gold(self, x: int, y: int):
+        self.take_gold()
+        self.gold = (x, y)
+        self.percept_codes[(y - 1) * self.n + (x - 1)] |= GLITTER
+
+    def reset_random(self, rng: Optional[random.Random] = None):
+        if rng is None:
+            rng = random
+        self.pits.clear()
+        self.wumpus_alive = True
+        self.wumpus = None
+        self.gold = None
+        if self.pit_count is None:
+            for x in range(1, self.n + 1):
+                for y in range(1, self.n + 1):
+                    if (x, y) == (1, 1):
+                        continue
+                    if rng.random() < self.pit_prob:
+                        self.pits.add((x, y))
+        else:
+            cells = [(x, y) for x in range(1, self.n + 1) for y in range(1, self.n + 1) if (x, y) != (1, 1)]
+            self.pits.update(rng.sample(cells, min(self.pit_count, len(cells))))
+        while True:
+            wx, wy = rng.randint(1, self.n), rng.randint(1, self.n)
+            if (wx, wy) != (1, 1):  # allow Wumpus anywhere except start (even in a pit)
+                self.wumpus = (wx, wy)
+                break
+        while True:
+            gx, gy = rng.randint(1, self.n), rng.randint(1, self.n)
+            if (gx, gy) != (1, 1):  # allow gold anywhere except start (even in a pit or on the Wumpus)
+                self.gold = (gx, gy)
+                break
+        self.rebuild_percepts()
+
+    def load_layout(self, layout: Layout):
+        pits, wumpus, gold = layout
+        self.pits = set(pits)
+        self.wumpus = wumpus
+        self.gold = gold
+        self.wumpus_alive = True
+        self.rebuild_percepts()
+
+@dataclass(slots=True)
+class AgentState:
+    x: int = 1
+    y: int = 1
+    dir: int = EAST
+    has_gold: bool = False
+    arrow_available: bool = True
+    alive: bool = True
+
+class Zobrist:
+    # Random 64-bit keys for every piece of game state. Seeded by the board size so hashes
+    # agree across processes.
+    def __init__(self, n: int):
+        rng = random.Random(n)
+        cells = n * n
+        self.n = n
+        self.pose = [rng.getrandbits(64) for _ in range(4 * cells)]  # cell * 4 + dir
+        self.pit = [rng.getrandbits(64) for _ in range(cells)]
+        self.wumpus = [rng.getrandbits(64) for _ in range(cells)]
+        self.gold = [rng.getrandbits(64) for _ in range(cells)]
+        self.has_gold, self.arrow, self.alive, self.wumpus_alive, self.terminal = (
+            rng.getrandbits(64) for _ in range(5))
+
+@lru_cache(maxsize=None)
+def zobrist(n: int) -> Zobrist:
+    return Zobrist(n)
+
+# what an action changed, one byte per entry in Game.actions, so Game.undo can reverse it
+UNDO_MOVED, UNDO_DIED, UNDO_DONE, UNDO_KILLED = 1, 2, 4, 8
+
+# Game.snapshot(): x, y, dir, has_gold, arrow, alive, score, terminal, wumpus_alive, gold,
+# number of actions, number of undo entries, hash
+Snapshot = Tuple[int, int, int, bool, bool, bool, int, bool, bool, Optional[Tuple[int, int]], int, int, int]
+
+@dataclass(slots=True)
+class Game:
+    world: World = field(default_factory=World)
+    agent: AgentState = field(default_factory=AgentState)
+    score: int = 0
+    terminal: bool = False
+    last_scream: bool = False
+    rng: random.Random = field(default_factory=random.Random, repr=False, compare=False)
+    start_layout: Optional[Layout] = field(default=None, repr=False, compare=False)
+    actions: bytearray = field(default_factory=bytearray, repr=False, compare=False)
+    undo_log: bytearray = field(default_factory=bytearray, repr=False, compare=False)
+    # Zobrist hash of the layout and everything an action can change except the score, so
+    # two move orders that reach the same position hash alike
+    state_hash: int = field(default=0, repr=False, compare=False)
+    keys: Optional[Zobrist] = field(default=None, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.mark_start()
+
+    def mark_start(self):
+        w = self.world
+        self.start_layout = (frozenset(w.pits), w.wumpus, w.gold)
+        self.actions = bytearray()
+        self.undo_log = bytearray()
+        self.rehash()
+
+    def rehash(self):
+        w = self.world
+        a = self.agent
+        k = self.keys
+        if k is None or k.n != w.n:
+            k = self.keys = zobrist(w.n)
+        n = w.n
+        h = k.pose[((a.y - 1) * n + (a.x - 1)) * 4 + a.dir]
+        for x, y in w.pits:
+            h ^= k.pit[(y - 1) * n + (x - 1)]
+        if w.wumpus:
+            h ^= k.wumpus[(w.wumpus[1] - 1) * n + (w.wumpus[0] - 1)]
+        if w.gold:
+            h ^= k.gold[(w.gold[1] - 1) * n + (w.gold[0] - 1)]
+        if a.has_gold:
+            h ^= k.has_gold
+        if a.arrow_available:
+            h ^= k.arrow
+        if a.alive:
+            h ^= k.alive
+        if w.wumpus_alive:
+            h ^= k.wumpus_alive
+        if self.terminal:
+            h ^= k.terminal
+        self.state_hash = h
+
+    def reset(self, layout: Optional[Layout] = None):
+        if layout is None:
+            self.world.reset_random(self.rng)
+        else:
+            self.world.load_layout(layout)
+        self.agent = AgentState()
+        self.score = 0
+        self.terminal = False
+        self.last_scream = False
+        self.mark_start()
+
+    def pose_key(self) -> int:
+        a = self.agent
+        return self.keys.pose[((a.y - 1) * self.world.n + (a.x - 1)) * 4 + a.dir]
+
+    def turn_left(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(LEFT)
+        self.undo_log.append(0)
+        h = self.state_hash ^ self.pose_key()
+        self.agent.dir = (self.agent.dir + 1) % 4
+        self.state_hash = h ^ self.pose_key()
+        self.score -= 1
+        return self.percepts()
+
+    def turn_right(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(RIGHT)
+        self.undo_log.append(0)
+        h = self.state_hash ^ self.pose_key()
+        self.agent.dir = (self.agent.dir - 1) % 4
+        self.state_hash = h ^ self.pose_key()
+        self.score -= 1
+        return self.percepts()
+
+    def move_forward(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(FORWARD)
+        dx, dy = DIRS[self.agent.dir]
+        nx, ny = self.agent.x + dx, self.agent.y + dy
+        bump = False
+        if not self.world.inside(nx, ny):
+            bump = True
+            self.undo_log.append(0)
+        else:
+            h = self.state_hash ^ self.pose_key()
+            self.agent.x, self.agent.y = nx, ny
+            self.state_hash = h ^ self.pose_key()
+            if (nx, ny) in self.world.pits or (self.world.wumpus_alive and (nx, ny) == self.world.wumpus):
+                self.undo_log.append(UNDO_MOVED | UNDO_DIED)
+                self.agent.alive = False
+                self.terminal = True
+                self.state_hash ^= self.keys.alive ^ self.keys.terminal
+                self.score -= 1
+                self.score -= 1000
+                return self.percepts()
+            self.undo_log.append(UNDO_MOVED)
+        self.score -= 1
+        return self.percepts(bump=bump)
+
+    def grab(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(GRAB)
+        if (self.agent.x, self.agent.y) == self.world.gold and not self.agent.has_gold:
+            self.undo_log.append(UNDO_DONE)
+            self.agent.has_gold = True
+            self.state_hash ^= self.keys.has_gold ^ self.keys.gold[(self.agent.y - 1) * self.world.n + (self.agent.x - 1)]
+            self.world.take_gold()
+        else:
+            self.undo_log.append(0)
+        self.score -= 1
+        return self.percepts()
+
+    def release(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(RELEASE)
+        if self.agent.has_gold:
+            self.undo_log.append(UNDO_DONE)
+            self.world.drop_gold(self.agent.x, self.agent.y)
+            self.agent.has_gold = False
+            self.state_hash ^= self.keys.has_gold ^ self.keys.gold[(self.agent.y - 1) * self.world.n + (self.agent.x - 1)]
+        else:
+            self.undo_log.append(0)
+        self.score -= 1
+        return self.percepts()
+
+    def shoot(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(SHOOT)
+        if not self.agent.arrow_available:
+            self.undo_log.append(0)
+            self.score -= 1
+            return self.percepts()
+        self.agent.arrow_available = False
+        self.state_hash ^= self.keys.arrow
+        self.score -= 10
+        self.score -= 1
+        x, y = self.agent.x, self.agent.y
+        dx, dy = DIRS[self.agent.dir]
+        effect = UNDO_DONE
+        while True:
+            x += dx
+            y += dy
+            if not self.world.inside(x, y):
+                break
+            if self.world.wumpus_alive and (x, y) == self.world.wumpus:
+                self.world.kill_wumpus()
+                self.state_hash ^= self.keys.wumpus_alive
+                self.last_scream = True
+                effect |= UNDO_KILLED
+                break
+        self.undo_log.append(effect)
+        return self.percepts(scream=self.last_scream)
+
+    def climb(self):
+        if self.terminal:
+            return self.percepts()
+        self.actions.append(CLIMB)
+        if (self.agent.x, self.agent.y) == (1, 1):
+            self.undo_log.append(UNDO_DONE)
+            self.score -= 1
+            if self.agent.has_gold:
+                self.score += 1000
+            self.terminal = True
+            self.state_hash ^= self.keys.terminal
+        else:
+            self.undo_log.append(0)
+            self.score -= 1
+        return self.percepts()
+
+    def undo(self) -> bool:
+        # Unmake the last action. Returns False when there is nothing recorded to undo.
+        if not self.undo_log:
+            return False
+        effect = self.undo_log.pop()
+        action = self.actions.pop()
+        a = self.agent
+        k = self.keys
+        self.score += 1
+        if action == LEFT or action == RIGHT:
+            h = self.state_hash ^ self.pose_key()
+            a.dir = (a.dir + (-1 if action == LEFT else 1)) % 4
+            self.state_hash = h ^ self.pose_key()
+        elif action == FORWARD:
+            if effect & UNDO_DIED:
+                a.alive = True
+                self.terminal = False
+                self.state_hash ^= k.alive ^ k.terminal
+                self.score += 1000
+            if effect & UNDO_MOVED:
+                h = self.state_hash ^ self.pose_key()
+                dx, dy = DIRS[a.dir]
+                a.x -= dx
+                a.y -= dy
+                self.state_hash = h ^ self.pose_key()
+        elif action == GRAB:
+            if effect & UNDO_DONE:
+                a.has_gold = False
+                self.world.drop_gold(a.x, a.y)
+                self.state_hash ^= k.has_gold ^ k.gold[(a.y - 1) * self.world.n + (a.x - 1)]
+        elif action == RELEASE:
+            if effect & UNDO_DONE:
+                self.state_hash ^= k.has_gold ^ k.gold[(a.y - 1) * self.world.n + (a.x - 1)]
+                self.world.take_gold()
+                a.has_gold = True
+        elif action == SHOOT:
+            if effect & UNDO_DONE:
+                a.arrow_available = True
+                self.state_hash ^= k.arrow
+                self.score += 10
+            if effect & UNDO_KILLED:
+                self.world.revive_wumpus()
+                self.state_hash ^= k.wumpus_alive
+        elif action == CLIMB:
+            if effect & UNDO_DONE:
+                self.terminal = False
+                self.state_hash ^= k.terminal
+                if a.has_gold:
+                    self.score -= 1000
+        self.last_scream = False
+        return True
+
+    def snapshot(self) -> Snapshot:
+        a = self.agent
+        w = self.world
+        return (a.x, a.y, a.dir, a.has_gold, a.arrow_available, a.alive, self.score, self.terminal,
+                w.wumpus_alive, w.gold, len(self.actions), len(self.undo_log), self.state_hash)
+
+    def restore(self, snap: Snapshot):
+        # Puts back a snapshot taken earlier in the same episode, truncating the action log.
+        a = self.agent
+        w = self.world
+        (a.x, a.y, a.dir, a.has_gold, a.arrow_available, a.alive, self.score, self.terminal,
+         wumpus_alive, gold, n_actions, n_undo, self.state_hash) = snap
+        if wumpus_alive != w.wumpus_alive:
+            if wumpus_alive:
+                w.revive_wumpus()
+            else:
+                w.kill_wumpus()
+        if gold != w.gold:
+            if gold is None:
+                w.take_gold()
+            else:
+                w.drop_gold(*gold)
+        del self.actions[n_actions:]
+        del self.undo_log[n_undo:]
+        self.last_scream = False
+
+    def apply(self, action: int) -> Percepts:
+        # play one action byte, as recorded in self.actions
+        return getattr(self, ACTION_METHODS[action])()
+
+    def percepts(self, bump: bool = False, scream: bool = False) -> Percepts:
+        p = self.world.percepts_at(self.agent.x, self.agent.y, bump=bump, scream=scream or self.last_scream)
+        self.last_scream = False
+        return p
+
+class Agent:
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model=None):
+        self.game = game
+        self.rng = rng if rng is not None else random.Random()
+        self.risk_model = risk_model
+        self.visited: Set[Tuple[int, int]] = set()
+        self.path_home: List[str] = []
+        self.safe: Set[Tuple[int, int]] = {(1, 1)}
+        self.frontier: Set[Tuple[int, int]] = {(1, 1)}  # safe but not yet visited
+        self.pits: Set[Tuple[int, int]] = set()
+        self.wumpus_cell: Optional[Tuple[int, int]] = None
+        self.breeze_cells: Set[Tuple[int, int]] = set()
+        self.stench_cells: Set[Tuple[int, int]] = set()
+        self.plan: List[str] = []
+        self.frontier_version = None
+        self.frontier_paths: Dict[Tuple[int, int, int], List[str]] = {}
+        self.bfs_nodes = 0  # search states expanded so far, read by profiling
+
+    def reset(self):
+        self.visited.clear()
+        self.path_home.clear()
+        self.safe = {(1, 1)}
+        self.frontier = {(1, 1)}
+        self.pits.clear()
+        self.wumpus_cell = None
+        self.breeze_cells.clear()
+        self.stench_cells.clear()
+        self.plan.clear()
+        self.frontier_version = None
+        self.frontier_paths.clear()
+
+    def mark_visited(self, x: int, y: int):
+        self.visited.add((x, y))
+        self.frontier.discard((x, y))
+
+    def nbrs(self, x: int, y: int) -> List[Tuple[int, int]]:
+        out: List[Tuple[int, int]] = []
+        for dx, dy in DIRS:
+            nx, ny = x + dx, y + dy
+            if 1 <= nx <= self.game.world.n and 1 <= ny <= self.game.world.n:
+                out.append((nx, ny))
+        return out
+
+    def update_knowledge(self, p: Percepts, x: int, y: int):
+        if not p.breeze and not p.stench:
+            for c in self.nbrs(x, y):
+                if c not in self.pits:
+                    self.safe.add(c)
+                    if c not in self.visited:
+                        self.frontier.add(c)
+        if p.breeze:
+            self.breeze_cells.add((x, y))
+            unknown = [c for c in self.nbrs(x, y) if c not in self.safe and c not in self.pits and c != self.wumpus_cell]
+            if len(unknown) == 1:
+                self.pits.add(unknown[0])
+        if p.stench and self.game.world.wumpus_alive:
+            self.stench_cells.add((x, y))
+            unknown = [c for c in self.nbrs(x, y) if c not in self.safe and c not in self.pits]
+            if self.wumpus_cell is None and len(unknown) == 1:
+                self.wumpus_cell = unknown[0]
+        self.infer_wumpus_from_intersections()
+
+    def infer_wumpus_from_intersections(self):
+        if self.wumpus_cell or not self.game.world.wumpus_alive:
+            return
+        candidates: Optional[Set[Tuple[int, int]]] = None
+        for sx, sy in self.stench_cells:
+            neigh = {c for c in self.nbrs(sx, sy) if c not in self.safe and c not in self.pits}
+            candidates = neigh if candidates is None else candidates & neigh
+            if not candidates:
+                return
+        if candidates and len(candidates) == 1:
+            self.wumpus_cell = next(iter(candidates))
+
+    def cell_risk(self, cell: Tuple[int, int]) -> float:
+        if cell in self.safe or cell in self.pits:
+            return 0.0 if cell in self.safe else 1.0
+        if self.wumpus_cell and self.game.world.wumpus_alive and cell == self.wumpus_cell:
+            return 1.0
+        if self.risk_model is not None:
+            return self.risk_model.risk(self.game.world.n, self.visited, self.breeze_cells, self.stench_cells,
+                                        self.game.world.wumpus_alive, cell)
+        risk = 0.0
+        # only breezes next to the cell can blame it, so there is no need to scan them all
+        for b in self.nbrs(*cell):
+            if b in self.breeze_cells:
+                u = [c for c in self.nbrs(*b) if c not in self.safe and c not in self.pits]
+                risk += 1.0 / len(u)
+        return risk
+
+    def best_adjacent_unknown(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        options = self.risk_table(x, y)
+        return options[0][1] if options else None
+
+    def risk_table(self, x: int, y: int) -> List[Tuple[float, Tuple[int, int]]]:
+        # the unknown neighbours of (x, y) with their risk, safest first
+        options = []
+        for dx, dy in DIRS:
+            nx, ny = x + dx, y + dy
+            if not self.game.world.inside(nx, ny):
+                continue
+            c = (nx, ny)
+            if c in self.visited or c in self.safe:
+                continue
+            if c in self.pits:
+                continue
+            if self.wumpus_cell and self.game.world.wumpus_alive and c == self.wumpus_cell:
+                continue
+            options.append((self.cell_risk(c), c))
+        options.sort(key=lambda t: (t[0], t[1][0], t[1][1]))
+        return options
+
+    def bfs_path(self, start: Tuple[int, int], goal_pred) -> List[str]:
+        # Breadth-first over (cell, heading) with one edge per action, so the first goal
+        # reached has the fewest actions. Parent pointers replace per-entry path copies.
+        if goal_pred(start):
+            return []
+        world = self.game.world
+        n = world.n
+        wumpus = self.wumpus_cell if world.wumpus_alive else None
+        safe, pits = self.safe, self.pits
+        s0 = (start, self.game.agent.dir)
+        parent = {s0: None}
+        q = deque([s0])
+        while q:
+            s = q.popleft()
+            (cx, cy), d = s
+            dx, dy = DIRS[d]
+            nxt = (cx + dx, cy + dy)
+            moves = [((cx, cy), (d + 1) % 4, "L"), ((cx, cy), (d - 1) % 4, "R")]
+            if (1 <= nxt[0] <= n and 1 <= nxt[1] <= n and nxt in safe
+                    and nxt not in pits and nxt != wumpus):
+                moves.insert(0, (nxt, d, "F"))
+            for cell, nd, a in moves:
+                t = (cell, nd)
+                if t in parent:
+                    continue
+                parent[t] = (s, a)
+                if a == "F" and goal_pred(cell):
+                    self.bfs_nodes += len(parent)
+                    path = []
+                    while parent[t] is not None:
+                        t, a = parent[t]
+                        path.append(a)
+                    path.reverse()
+                    return path
+                q.append(t)
+        self.bfs_nodes += len(parent)
+        return []
+
+    def knowledge_version(self):
+        # safe, pits and visited only ever grow, so their sizes identify the knowledge state
+        return len(self.safe), len(self.pits), len(self.visited), self.wumpus_cell, self.game.world.wumpus_alive
+
+    def pick_safe_frontier(self) -> List[str]:
+        version = self.knowledge_version()
+        if version != self.frontier_version:
+            self.frontier_version = version
+            self.frontier_paths.clear()
+        pose = (self.game.agent.x, self.game.agent.y, self.game.agent.dir)
+        path = self.frontier_paths.get(pose)
+        if path is None:
+            frontier = self.frontier
+            path = self.bfs_path(pose[:2], frontier.__contains__) if frontier else []
+            self.frontier_paths[pose] = path
+        return list(path)
+
+    def execute_action(self, a: str):
+        if a == "F":
+            self.game.move_forward()
+        elif a == "L":
+            self.game.turn_left()
+        elif a == "R":
+            self.game.turn_right()
+        elif a == "C":
+            self.game.climb()
+
+    def wumpus_line_of_sight_guess(self) -> bool:
+        if not self.wumpus_cell or not self.game.world.wumpus_alive:
+            return False
+        ax, ay = self.game.agent.x, self.game.agent.y
+        wx, wy = self.wumpus_cell
+        if ax == wx:
+            desired = NORTH if wy > ay else SOUTH
+            for y in range(ay + (1 if wy > ay else -1), wy, (1 if wy > ay else -1)):
+                if (ax, y) in self.pits:
+                    return False
+            for t in self.turn_seq(self.game.agent.dir, desired):
+                self.execute_action(t)
+            self.game.shoot()
+            return True
+        if ay == wy:
+            desired = EAST if wx > ax else WEST
+            for x in range(ax + (1 if wx > ax else -1), wx, (1 if wx > ax else -1)):
+                if (x, ay) in self.pits:
+                    return False
+            for t in self.turn_seq(self.game.agent.dir, desired):
+                self.execute_action(t)
+            self.game.shoot()
+            return True
+        return False
+
+    def turn_seq(self, cur: int, target: int) -> List[str]:
+        diff = (target - cur) % 4
+        if diff == 0:
+            return []
+        if diff == 1:
+            return ["L"]
+        if diff == 3:
+            return ["R"]
+        return ["L", "L"]
+
+    def danger_ahead(self, stench_now: bool) -> bool:
+        dx, dy = DIRS[self.game.agent.dir]
+        nx, ny = self.game.agent.x + dx, self.game.agent.y + dy
+        if not self.game.world.inside(nx, ny):
+            return False
+        nxt = (nx, ny)
+        if nxt in self.pits:
+            return True
+        if self.wumpus_cell and self.game.world.wumpus_alive and nxt == self.wumpus_cell:
+            return True
+        if stench_now and nxt not in self.safe:
+            return True
+        return False
+
+    def step(self) -> bool:
+        if self.game.terminal:
+            return False
+        x, y = self.game.agent.x, self.game.agent.y
+        self.mark_visited(x, y)
+        p = self.game.percepts()
+        self.update_knowledge(p, x, y)
+        if p.glitter and not self.game.agent.has_gold:
+            self.game.grab()
+            self.plan = self.bfs_path((self.game.agent.x, self.game.agent.y), lambda pos: pos == (1, 1)) + ["C"]
+            return True
+        if (x, y) == (1, 1) and self.game.agent.has_gold:
+            self.game.climb()
+            return True
+        if p.stench and self.game.agent.arrow_available:
+            if self.wumpus_line_of_sight_guess():
+                return True
+            if self.danger_ahead(stench_now=True):
+                self.game.shoot()
+                return True
+        if self.plan:
+            a = self.plan.pop(0)
+            self.execute_action(a)
+            return True
+        path = self.pick_safe_frontier()
+        if path:
+            self.plan = path
+            a = self.plan.pop(0)
+            self.execute_action(a)
+            return True
+        target = self.best_adjacent_unknown(x, y)
+        if target and not p.stench:
+            tx, ty = target
+            for i, (dx, dy) in enumerate(DIRS):
+                if (x + dx, y + dy) == (tx, ty):
+                    for t in self.turn_seq(self.game.agent.dir, i):
+                        self.execute_action(t)
+                    self.game.move_forward()
+                    return True
+        if p.stench:
+            if self.rng.random() < 0.5:
+                self.game.turn_left()
+            else:
+                self.game.turn_right()
+            return True
+        before = (self.game.agent.x, self.game.agent.y)
+        p2 = self.game.move_forward()
+        after = (self.game.agent.x, self.game.agent.y)
+        if p2.bump or before == after:
+            if self.rng.random() < 0.5:
+                self.game.turn_left()
+            else:
+                self.game.turn_right()
+        return True
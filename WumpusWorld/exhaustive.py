@@ -0,0 +1,255 @@
+import argparse
+import copy
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from bitboard import grid
+from engine import CELL_PIT_PROB, Agent, Game, World, cell_index, cell_xy
+from headless import OUTCOMES, default_max_steps
+
+# A set of worlds is a product P x W x G: P is an array of pit codes (bit i - 1 set for a
+# pit in cell i; the start cell never holds one), W and G are masks of the cells that may
+# hold the Wumpus and the gold. Every percept depends on one factor only, so splitting a
+# set by what the agent perceives keeps it a product.
+WorldSet = Tuple[np.ndarray, int, int]
+
+
+@dataclass
+class Expectation:
+    weight: float = 0.0
+    score: float = 0.0  # probability-weighted sum of final scores
+    outcomes: Dict[str, float] = field(default_factory=lambda: {k: 0.0 for k in OUTCOMES})
+    worlds: int = 0
+    leaves: int = 0
+    steps: int = 0  # agent steps actually simulated
+
+    def add(self, weight: float, worlds: int, score: int, outcome: str):
+        self.weight += weight
+        self.score += weight * score
+        self.outcomes[outcome] += weight
+        self.worlds += worlds
+        self.leaves += 1
+
+    def merge(self, other: "Expectation"):
+        self.weight += other.weight
+        self.score += other.score
+        for k, v in other.outcomes.items():
+            self.outcomes[k] += v
+        self.worlds += other.worlds
+        self.leaves += other.leaves
+        self.steps += other.steps
+
+    def summary(self) -> Dict[str, object]:
+        w = self.weight or 1.0
+        return {
+            "score_mean": self.score / w,
+            "win_rate": self.outcomes["win"] / w,
+            "outcomes": {k: v / w for k, v in self.outcomes.items()},
+            "worlds": self.worlds,
+            "leaves": self.leaves,
+            "steps": self.steps,
+            "weight": self.weight,
+        }
+
+
+class Explorer:
+    """Plays a deterministic agent on every world of an n x n board at once.
+
+    The agent starts every world with the same RNG seed, so its actions depend only on the
+    percepts it has seen. Worlds that have produced the same percepts so far share one
+    simulation. The set is split only when the agent enters a new cell or shoots, and the
+    agent is copied only when both sides of a split are non-empty. This walks the trie of
+    percept histories rather than the worlds. Each branch runs on a Game loaded with one
+    representative world, and each leaf adds its score weighted by the probability mass of
+    its worlds under pit_prob, with the Wumpus and gold uniform over the other cells.
+    """
+
+    def __init__(self, n: int = 4, pit_prob: float = CELL_PIT_PROB, max_steps: Optional[int] = None,
+                 agent_cls=Agent, seed: int = 0):
+        self.n = n
+        self.cells = n * n
+        self.pit_prob = pit_prob
+        self.max_steps = max_steps if max_steps is not None else default_max_steps(n)
+        self.agent_cls = agent_cls
+        self.seed = seed
+        step = grid(n).step
+        self.pit_bit = [0] + [1 << (i - 1) for i in range(1, self.cells)]
+        self.near_pits = [sum(self.pit_bit[j] for j in row if j >= 0) for row in step]
+        self.near_cells = [sum(1 << j for j in row if j >= 0) for row in step]
+        self.line = [[0] * 4 for _ in range(self.cells)]  # cells an arrow from i heading d passes
+        for i in range(self.cells):
+            for d in range(4):
+                j = step[i][d]
+                while j >= 0:
+                    self.line[i][d] |= 1 << j
+                    j = step[j][d]
+        free = self.cells - 1
+        self.codes = np.arange(1 << free, dtype=np.uint32)
+        k = np.bitwise_count(self.codes)
+        self.prob = pit_prob ** k * (1.0 - pit_prob) ** (free - k)
+        self.others = ((1 << self.cells) - 1) ^ 1
+        self.result = Expectation()
+
+    def layout(self, pits: int, wumpus: int, gold: int):
+        n = self.n
+        cells = {cell_xy(i, n) for i in range(1, self.cells) if pits & self.pit_bit[i]}
+        low = lambda m: (m & -m).bit_length() - 1
+        return cells, cell_xy(low(wumpus), n), cell_xy(low(gold), n)
+
+    def load(self, game: Game, ws: WorldSet, wumpus_alive: bool):
+        # Point the game at a representative of ws, keeping the agent's own state.
+        pits, wumpus, gold = ws
+        game.world.load_layout(self.layout(int(pits[0]), wumpus, gold))
+        if not wumpus_alive:
+            game.world.kill_wumpus()
+        if game.agent.has_gold:
+            game.world.take_gold()
+
+    def fork(self, game: Game, agent: Agent) -> Tuple[Game, Agent]:
+        g = Game(world=World(n=self.n, pit_prob=self.pit_prob))
+        g.agent = copy.copy(game.agent)
+        g.score = game.score
+        memo = {id(game): g}
+        model = getattr(agent, "risk_model", None)
+        if model is not None:
+            memo[id(model)] = model
+        return g, copy.deepcopy(agent, memo)
+
+    def leaf(self, ws: WorldSet, score: int, outcome: str):
+        pits, wumpus, gold = ws
+        w, g = wumpus.bit_count(), gold.bit_count()
+        total = (self.cells - 1) ** 2
+        self.result.add(float(self.prob[pits].sum()) * w * g / total, len(pits) * w * g, score, outcome)
+
+    def percept_split(self, i: int, ws: WorldSet, wumpus_alive: bool, has_gold: bool) -> List[WorldSet]:
+        # the sets the agent can tell apart once it stands on cell i
+        pits, wumpus, gold = ws
+        near = self.near_pits[i]
+        breezy = (pits & near) != 0
+        ps = [p for p in (pits[breezy], pits[~breezy]) if len(p)]
+        ws_ = [wumpus]
+        if wumpus_alive:
+            ws_ = [m for m in (wumpus & self.near_cells[i], wumpus & ~self.near_cells[i]) if m]
+        gs = [gold]
+        if not has_gold:
+            gs = [m for m in (gold & (1 << i), gold & ~(1 << i)) if m]
+        return [(p, w, g) for p in ps for w in ws_ for g in gs]
+
+    def run(self, wumpus: Optional[int] = None) -> Expectation:
+        # every world, or only those with the Wumpus in cell `wumpus`
+        self.result = Expectation()
+        game = Game(world=World(n=self.n, pit_prob=self.pit_prob))
+        agent = self.agent_cls(game)
+        agent.rng.seed(self.seed)
+        root = (self.codes, self.others if wumpus is None else 1 << wumpus, self.others)
+        branches = self.percept_split(0, root, True, False)
+        stack = [(*self.fork(game, agent), ws, 0, True) for ws in branches[1:]]
+        stack.append((game, agent, branches[0], 0, True))
+        while stack:
+            self.explore(*stack.pop(), stack)
+        return self.result
+
+    def step(self, game: Game, agent: Agent):
+        # one agent step on the branch's representative world; a hook for subclasses
+        agent.step()
+
+    def explore(self, game: Game, agent: Agent, ws: WorldSet, steps: int, wumpus_alive: bool, stack: list):
+        self.load(game, ws, wumpus_alive)
+        a = game.agent
+        while True:
+            if game.terminal:
+                self.leaf(ws, game.score, "win" if a.has_gold else "climb")
+                return
+            if steps >= self.max_steps:
+                self.leaf(ws, game.score, "timeout")
+                return
+            x, y, arrow, alive = a.x, a.y, a.arrow_available, game.world.wumpus_alive
+            self.step(game, agent)
+            steps += 1
+            self.result.steps += 1
+            a = game.agent
+            if (a.x, a.y) != (x, y):
+                i = cell_index(a.x, a.y, self.n)
+                pits, wumpus, gold = ws
+                score = game.score + (1000 if not a.alive else 0)
+                pit = (pits & self.pit_bit[i]) != 0
+                if pit.any():
+                    self.leaf((pits[pit], wumpus, gold), score - 1000, "pit")
+                pits = pits[~pit]
+                if alive and wumpus >> i & 1 and len(pits):
+                    self.leaf((pits, 1 << i, gold), score - 1000, "wumpus")
+                    wumpus &= ~(1 << i)
+                if not len(pits) or not wumpus:
+                    return
+                a.alive = True
+                game.terminal = False
+                game.score = score
+                branches = self.percept_split(i, (pits, wumpus, gold), alive, a.has_gold)
+            elif arrow and not a.arrow_available and alive:
+                pits, wumpus, gold = ws
+                hit = wumpus & self.line[cell_index(x, y, self.n)][a.dir]
+                branches = [(pits, m, gold) for m in (hit, wumpus & ~hit) if m]
+                if len(branches) == 2:
+                    stack.append((*self.fork(game, agent), branches[0], steps, False))
+                ws = branches[-1]
+                self.load(game, ws, ws[1] != hit)
+                continue
+            else:
+                continue
+            for b in branches[1:]:
+                stack.append((*self.fork(game, agent), b, steps, alive))
+            ws = branches[0]
+            self.load(game, ws, alive)
+
+
+def _run_task(task) -> Expectation:
+    wumpus, n, pit_prob, max_steps, agent_cls, seed = task
+    return Explorer(n, pit_prob, max_steps, agent_cls, seed).run(wumpus)
+
+
+def evaluate(n: int = 4, pit_prob: float = CELL_PIT_PROB, max_steps: Optional[int] = None, agent_cls=Agent,
+             seed: int = 0, workers: Optional[int] = None) -> Expectation:
+    # One task per Wumpus cell; worlds only share a simulation within a task.
+    tasks = [(w, n, pit_prob, max_steps, agent_cls, seed) for w in range(1, n * n)]
+    total = Expectation()
+    if workers == 1:
+        parts = map(_run_task, tasks)
+        for part in parts:
+            total.merge(part)
+        return total
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        for part in pool.map(_run_task, tasks):
+            total.merge(part)
+    return total
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Exact expected score of Agent over every world of a small board.")
+    parser.add_argument("--size", type=int, default=4, help="board side length (4 is 7.4M worlds)")
+    parser.add_argument("--pit-prob", type=float, default=CELL_PIT_PROB)
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0, help="agent RNG seed, the same for every world")
+    parser.add_argument("--kb", action="store_true", help="evaluate kb.KBAgent instead of Agent")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = one per core)")
+    args = parser.parse_args(argv)
+    agent_cls = Agent
+    if args.kb:
+        from kb import KBAgent
+        agent_cls = KBAgent
+    t0 = time.perf_counter()
+    e = evaluate(args.size, args.pit_prob, args.max_steps, agent_cls, args.seed, args.workers or None)
+    s = e.summary()
+    print(f"worlds: {s['worlds']}  leaves: {s['leaves']}  agent steps: {s['steps']}  "
+          f"time: {time.perf_counter() - t0:.1f}s")
+    print(f"expected score: {s['score_mean']:.4f}  win rate: {s['win_rate']:.4%}")
+    print("outcomes: " + "  ".join(f"{k}={v:.4%}" for k, v in s["outcomes"].items()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,319 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, Iterable, List, Optional, Sequence
+
+from engine import CELL_PIT_PROB, GRID_SIZE, Game, Agent, Layout, World, check_board
+
+OUTCOMES = ("win", "climb", "pit", "wumpus", "timeout")
+
+
+@dataclass
+class EpisodeResult:
+    score: int
+    steps: int
+    outcome: str
+    best: Optional[int] = None  # oracle score for the same layout, when one was asked for
+
+
+@dataclass
+class BatchReport:
+    results: List[EpisodeResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def summary(self) -> Dict[str, object]:
+        n = len(self.results)
+        if n == 0:
+            return {"episodes": 0}
+        scores = [r.score for r in self.results]
+        steps = sorted(r.steps for r in self.results)
+        outcomes = Counter(r.outcome for r in self.results)
+        return {
+            "episodes": n,
+            "elapsed_s": self.elapsed,
+            "episodes_per_s": n / self.elapsed if self.elapsed > 0 else float("inf"),
+            "steps_per_s": sum(steps) / self.elapsed if self.elapsed > 0 else float("inf"),
+            "score_mean": sum(scores) / n,
+            "score_median": statistics.median(scores),
+            "win_rate": outcomes["win"] / n,
+            "outcomes": {k: outcomes[k] for k in OUTCOMES},
+            "steps": {
+                "min": steps[0],
+                "p50": steps[n // 2],
+                "p90": steps[min(n - 1, (n * 9) // 10)],
+                "p99": steps[min(n - 1, (n * 99) // 100)],
+                "max": steps[-1],
+                "mean": sum(steps) / n,
+            },
+            **regret_summary(self.results),
+        }
+
+
+def regret_summary(results: List[EpisodeResult]) -> Dict[str, object]:
+    if not results or results[0].best is None:
+        return {}
+    n = len(results)
+    regret = sorted(r.best - r.score for r in results)
+    return {
+        "regret": {
+            "mean": sum(regret) / n,
+            "p50": regret[n // 2],
+            "p90": regret[min(n - 1, (n * 9) // 10)],
+            "max": regret[-1],
+            "optimal": sum(1 for r in regret if r == 0) / n,
+        },
+        "winnable": sum(1 for r in results if r.best > 0) / n,
+    }
+
+
+def default_max_steps(n: int) -> int:
+    # The rule-based agent never gives up, so a stuck episode would spin forever.
+    return 8 * n * n
+
+
+def classify(game: Game) -> str:
+    if not game.terminal:
+        return "timeout"
+    a = game.agent
+    if a.alive:
+        return "win" if a.has_gold else "climb"
+    if (a.x, a.y) in game.world.pits:
+        return "pit"
+    return "wumpus"
+
+
+def play_episode(game: Game, agent: Agent, max_steps: int, layout: Optional[Layout] = None) -> EpisodeResult:
+    game.reset(layout)
+    agent.reset()
+    step = agent.step
+    steps = 0
+    while not game.terminal and steps < max_steps:
+        step()
+        steps += 1
+    return EpisodeResult(game.score, steps, classify(game))
+
+
+def seed_episode(game: Game, agent: Agent, seed: int):
+    # Separate streams for world generation and agent tie-breaks, both fixed by the episode seed.
+    game.rng.seed(2 * seed)
+    agent.rng.seed(2 * seed + 1)
+
+
+def run_batch(episodes: int, max_steps: Optional[int] = None, seed: Optional[int] = None,
+              layouts: Optional[Iterable[Layout]] = None, world_cls=World, agent_cls=Agent,
+              on_episode: Optional[Callable[[Game, EpisodeResult], None]] = None, oracle=None) -> BatchReport:
+    game = Game(world=world_cls())
+    agent = agent_cls(game)
+    if max_steps is None:
+        max_steps = default_max_steps(game.world.n)
+    if layouts is None:
+        layouts = (None for _ in range(episodes))
+    report = BatchReport()
+    results = report.results
+    t0 = time.perf_counter()
+    for e, layout in enumerate(layouts):
+        if seed is not None:
+            seed_episode(game, agent, seed + e)
+        result = play_episode(game, agent, max_steps, layout)
+        if oracle is not None:
+            result.best = oracle.best_score(game.world.n, game.start_layout)
+        results.append(result)
+        if on_episode is not None:
+            on_episode(game, result)
+    report.elapsed = time.perf_counter() - t0
+    return report
+
+
+def _run_chunk(task) -> List[EpisodeResult]:
+    start, stop, max_steps, world_cls, agent_cls, oracle, layouts = task
+    return run_batch(stop - start, max_steps, seed=start, layouts=layouts, world_cls=world_cls, agent_cls=agent_cls,
+                     oracle=oracle).results
+
+
+def evaluate_parallel(start: int, stop: int, workers: Optional[int] = None, max_steps: Optional[int] = None,
+                      world_cls=World, agent_cls=Agent, chunk: Optional[int] = None, oracle=None,
+                      layouts: Optional[Sequence[Layout]] = None) -> BatchReport:
+    # Episode i always uses seed i, so the merged results match run_batch(stop - start, seed=start)
+    # regardless of how the range is split. layouts[i - start], when given, is episode i's world.
+    workers = workers or os.cpu_count() or 1
+    total = stop - start
+    if chunk is None:
+        chunk = max(1, -(-total // (workers * 8)))
+    tasks = [(s, min(s + chunk, stop), max_steps, world_cls, agent_cls, oracle,
+              None if layouts is None else layouts[s - start:min(s + chunk, stop) - start])
+             for s in range(start, stop, chunk)]
+    report = BatchReport()
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for part in pool.map(_run_chunk, tasks):
+            report.results.extend(part)
+    report.elapsed = time.perf_counter() - t0
+    return report
+
+
+def format_summary(s: Dict[str, object]) -> str:
+    if s["episodes"] == 0:
+        return "no episodes"
+    st = s["steps"]
+    oc = s["outcomes"]
+    lines = [
+        f"episodes: {s['episodes']}  time: {s['elapsed_s']:.2f}s  "
+        f"episodes/s: {s['episodes_per_s']:.0f}  steps/s: {s['steps_per_s']:.0f}",
+        f"score mean: {s['score_mean']:.2f}  median: {s['score_median']}  win rate: {s['win_rate']:.2%}",
+        "outcomes: " + "  ".join(f"{k}={oc[k]}" for k in OUTCOMES),
+        f"steps: min={st['min']} p50={st['p50']} p90={st['p90']} p99={st['p99']} max={st['max']} mean={st['mean']:.1f}",
+    ]
+    if "regret" in s:
+        rg = s["regret"]
+        lines.append(f"regret: mean={rg['mean']:.2f} p50={rg['p50']} p90={rg['p90']} max={rg['max']} "
+                     f"optimal={rg['optimal']:.2%}  winnable: {s['winnable']:.2%}")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Run Wumpus World episodes without a window.")
+    parser.add_argument("-n", "--episodes", type=int, default=10000)
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="board side length")
+    parser.add_argument("--pit-prob", type=float, default=CELL_PIT_PROB)
+    parser.add_argument("--pit-count", type=int, default=None, help="exact number of pits per world")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--numpy-worlds", action="store_true", help="pre-generate all worlds with worldgen")
+    parser.add_argument("--solvable", action="store_true",
+                        help="only worlds with a percept-justified safe path to the gold (worldgen.solvable_worlds)")
+    parser.add_argument("--min-path", type=int, default=1, help="with --solvable, shortest allowed path to the gold")
+    parser.add_argument("--max-path", type=int, default=None, help="with --solvable, longest allowed path to the gold")
+    parser.add_argument("--bitboard", action="store_true", help="use the integer-bitmask World/Agent backend")
+    parser.add_argument("--kb", action="store_true", help="derive safe cells with kb.KBAgent's unit propagation")
+    parser.add_argument("--tcache", metavar="MB", type=float, default=None,
+                        help="share frontier plans and risk tables across episodes in an LRU cache of this size")
+    parser.add_argument("--exact-risk", action="store_true", help="rank risky moves with inference.RiskModel")
+    parser.add_argument("--planner-ms", type=float, default=None,
+                        help="settle uncertain moves with planner.PlannerAgent, this many ms per decision")
+    parser.add_argument("--policy", metavar="PATH", default=None,
+                        help="play a table compiled by policy.py instead of running Agent.step")
+    parser.add_argument("--qtable", metavar="PATH", default=None,
+                        help="play a Q-table trained by rl.py greedily instead of running Agent.step")
+    parser.add_argument("--profile", metavar="PREFIX", default=None,
+                        help="time each phase of Agent.step, write PREFIX.json and PREFIX.prof (pstats)")
+    parser.add_argument("--trace", metavar="PREFIX", default=None,
+                        help="append every episode to the binary trace PREFIX.worlds/PREFIX.steps")
+    parser.add_argument("--oracle", action="store_true",
+                        help="score every layout with oracle.Oracle and report the agent's regret")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes (0 = one per core)")
+    args = parser.parse_args(argv)
+    try:
+        check_board(args.size, args.pit_prob, args.pit_count)
+    except ValueError as e:
+        parser.error(str(e))
+    # these bring their own agent, which the Agent options below would not reach
+    own = [f for f, on in (("--planner-ms", args.planner_ms is not None), ("--policy", args.policy),
+                           ("--qtable", args.qtable)) if on]
+    tweaks = [f for f, on in (("--bitboard", args.bitboard), ("--kb", args.kb), ("--tcache", args.tcache is not None),
+                              ("--exact-risk", args.exact_risk)) if on]
+    if len(own) > 1:
+        parser.error(f"{own[0]} and {own[1]} pick different agents")
+    if own and tweaks:
+        parser.error(f"{own[0]} plays its own agent and cannot take {', '.join(tweaks)}")
+    world_cls, agent_cls = World, Agent
+    if args.bitboard:
+        from bitboard import BitAgent, BitWorld
+        world_cls, agent_cls = BitWorld, BitAgent
+    if args.kb:
+        from kb import KBAgent
+        agent_cls = KBAgent
+    tcache = None
+    if args.tcache is not None:
+        if args.bitboard or args.kb:
+            parser.error("--tcache works with the default Agent")
+        if args.workers != 1:
+            parser.error("--tcache needs --workers 1")
+        from transposition import CachedAgent, TranspositionCache
+        tcache = TranspositionCache(int(args.tcache * (1 << 20)))
+        agent_cls = partial(CachedAgent, cache=tcache)
+    world_cls = partial(world_cls, n=args.size, pit_prob=args.pit_prob, pit_count=args.pit_count)
+    if args.exact_risk:
+        from inference import RiskModel
+        agent_cls = partial(agent_cls, risk_model=RiskModel(args.pit_prob))
+    if args.planner_ms is not None:
+        from planner import PlannerAgent
+        agent_cls = partial(PlannerAgent, budget=args.planner_ms / 1000)
+    if args.policy:
+        from policy import PolicyAgent, PolicyTable
+        table = PolicyTable(args.policy)
+        if table.n != args.size:
+            parser.error(f"{args.policy} was compiled for --size {table.n}")
+        max_steps = default_max_steps(args.size) if args.max_steps is None else args.max_steps
+        if max_steps > table.max_steps:
+            parser.error(f"{args.policy} covers {table.max_steps} steps, fewer than --max-steps {max_steps}")
+        agent_cls = partial(PolicyAgent, table=table)
+    if args.qtable:
+        from rl import QAgent, load_q
+        agent_cls = partial(QAgent, q=load_q(args.qtable))
+    profiler = None
+    if args.profile:
+        from profiling import Profiler
+        if args.workers != 1:
+            parser.error("--profile needs --workers 1")
+        profiler = Profiler()
+        agent_cls = profiler.factory(agent_cls)
+    writer = None
+    if args.trace:
+        from tracefile import TraceWriter
+        if args.workers != 1:
+            parser.error("--trace needs --workers 1")
+        writer = TraceWriter(args.trace, args.size)
+    oracle = None
+    if args.oracle:
+        from oracle import Oracle
+        oracle = Oracle()
+    layouts = None
+    if args.solvable:
+        import numpy as np
+        from worldgen import solvable_worlds
+        try:
+            batch = solvable_worlds(args.episodes, np.random.default_rng(args.seed), n=args.size,
+                                    pit_prob=args.pit_prob, pit_count=args.pit_count, min_path=args.min_path,
+                                    max_path=args.max_path)
+        except ValueError as e:
+            parser.error(f"--solvable: {e}")
+        layouts = batch.layouts()
+    elif args.numpy_worlds:
+        import numpy as np
+        from worldgen import generate_worlds
+        layouts = generate_worlds(args.episodes, np.random.default_rng(args.seed), n=args.size,
+                                  pit_prob=args.pit_prob, pit_count=args.pit_count).layouts()
+    # without --seed every run draws its own base seed, whichever path plays the episodes
+    seed = args.seed if args.seed is not None else random.randrange(1 << 31)
+    if args.workers != 1:
+        report = evaluate_parallel(seed, seed + args.episodes, workers=args.workers or None,
+                                   max_steps=args.max_steps, world_cls=world_cls, agent_cls=agent_cls,
+                                   oracle=oracle, layouts=None if layouts is None else list(layouts))
+        print(format_summary(report.summary()))
+        return
+    on_episode = None
+    if writer is not None:
+        def on_episode(game: Game, result: EpisodeResult):
+            writer.write_episode(game, result.outcome)
+    report = run_batch(args.episodes, max_steps=args.max_steps, seed=seed, layouts=layouts,
+                       world_cls=world_cls, agent_cls=agent_cls, on_episode=on_episode, oracle=oracle)
+    if writer is not None:
+        writer.close()
+    print(format_summary(report.summary()))
+    if tcache is not None:
+        print(tcache.format())
+    if profiler is not None:
+        profiler.to_json(args.profile + ".json")
+        profiler.dump_stats(args.profile + ".prof")
+        print(profiler.format())
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,191 @@
+from typing import Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from engine import CELL_PIT_PROB, DIRS
+
+Cell = Tuple[int, int]
+Clause = FrozenSet[Cell]
+
+
+def neighbors(x: int, y: int, n: int) -> List[Cell]:
+    return [(x + dx, y + dy) for dx, dy in DIRS if 1 <= x + dx <= n and 1 <= y + dy <= n]
+
+
+def components(clauses: Iterable[Clause]) -> List[FrozenSet[Clause]]:
+    # union-find over the cells, clauses sharing a cell end up in the same component
+    parent: Dict[Cell, Cell] = {}
+
+    def find(c: Cell) -> Cell:
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+
+    clauses = list(clauses)
+    for cl in clauses:
+        it = iter(cl)
+        root = next(it)
+        parent.setdefault(root, root)
+        root = find(root)
+        for c in it:
+            parent.setdefault(c, c)
+            r = find(c)
+            if r != root:
+                parent[r] = root
+    groups: Dict[Cell, List[Clause]] = {}
+    for cl in clauses:
+        groups.setdefault(find(next(iter(cl))), []).append(cl)
+    return [frozenset(g) for g in groups.values()]
+
+
+def drop_subsumed(clauses: FrozenSet[Clause]) -> FrozenSet[Clause]:
+    # "a or b" already implies "a or b or c", so the longer clause adds no constraint
+    ordered = sorted(clauses, key=len)
+    kept: List[Clause] = []
+    for cl in ordered:
+        if not any(k <= cl for k in kept):
+            kept.append(cl)
+    return frozenset(kept)
+
+
+def breeze_clauses(n: int, visited: Set[Cell], breeze: Set[Cell]) -> Tuple[Set[Cell], List[Clause]]:
+    # cells known to be pit-free, and one "at least one pit" clause per breeze over the rest
+    clear: Set[Cell] = set(visited)
+    clear.add((1, 1))
+    for v in visited:
+        if v not in breeze:
+            clear.update(neighbors(*v, n))
+    clauses = [frozenset(c for c in neighbors(*b, n) if c not in clear) for b in breeze]
+    return clear, [cl for cl in clauses if cl]
+
+
+class RiskModel:
+    """Exact posterior pit and Wumpus probabilities from the agent's percept history.
+
+    Pits are independent with probability pit_prob and the Wumpus is uniform over the
+    non-start cells, independent of the pits (as in World.reset_random), so the two
+    posteriors factorize. Every breeze is an "at least one pit" clause over its unknown
+    neighbours; only the cells in such clauses are enumerated, split into independent
+    components and memoized by clause set, while every other unknown cell keeps the prior.
+    """
+
+    def __init__(self, pit_prob: float = CELL_PIT_PROB, memo_limit: int = 200_000):
+        self.p = pit_prob
+        self.memo: Dict[FrozenSet[Clause], Tuple[float, Dict[Cell, float]]] = {}
+        self.memo_limit = memo_limit
+        self.last_key = None
+        self.last: Tuple[Dict[Cell, float], Dict[Cell, float], float, float] = ({}, {}, 0.0, 0.0)
+
+    def solve(self, clauses: FrozenSet[Clause]) -> Tuple[float, Dict[Cell, float]]:
+        # Returns Z, the prior mass of assignments satisfying every clause, and for each cell
+        # in the clauses the part of Z in which that cell holds a pit.
+        if not clauses:
+            return 1.0, {}
+        hit = self.memo.get(clauses)
+        if hit is not None:
+            return hit
+        comps = components(clauses)
+        if len(comps) > 1:
+            parts = [self.solve(c) for c in comps]
+            z = 1.0
+            for pz, _ in parts:
+                z *= pz
+            t: Dict[Cell, float] = {}
+            for pz, pt in parts:
+                scale = z / pz
+                for c, w in pt.items():
+                    t[c] = w * scale
+            result = (z, t)
+        else:
+            p = self.p
+            counts: Dict[Cell, int] = {}
+            for cl in clauses:
+                for c in cl:
+                    counts[c] = counts.get(c, 0) + 1
+            v = max(counts, key=lambda c: (counts[c], c))
+            z_pit, t_pit = self.solve(drop_subsumed(frozenset(cl for cl in clauses if v not in cl)))
+            rest = [cl - {v} for cl in clauses]
+            if any(not cl for cl in rest):
+                z_free, t_free = 0.0, {}
+            else:
+                z_free, t_free = self.solve(drop_subsumed(frozenset(rest)))
+            z = p * z_pit + (1 - p) * z_free
+            t = {v: p * z_pit}
+            for c in counts:
+                if c == v:
+                    continue
+                # a cell no longer constrained in a branch is a pit with its prior probability
+                a = t_pit[c] if c in t_pit else p * z_pit
+                b = t_free[c] if c in t_free else p * z_free
+                t[c] = p * a + (1 - p) * b
+            result = (z, t)
+        if len(self.memo) >= self.memo_limit:
+            self.memo.clear()
+        self.memo[clauses] = result
+        return result
+
+    def pit_probabilities(self, n: int, visited: Set[Cell], breeze: Set[Cell]) -> Tuple[Dict[Cell, float], float]:
+        # Returns probabilities for the frontier cells (unknown cells next to a breeze) and
+        # the probability shared by every other unknown cell that is not next to a calm cell.
+        clear, clauses = breeze_clauses(n, visited, breeze)
+        probs: Dict[Cell, float] = {c: 0.0 for c in clear if c not in visited}
+        for comp in components(drop_subsumed(frozenset(clauses))):
+            z, t = self.solve(comp)
+            for c, w in t.items():
+                probs[c] = w / z if z > 0 else 1.0
+        return probs, self.p
+
+    def wumpus_probabilities(self, n: int, visited: Set[Cell], stench: Set[Cell],
+                             alive: bool) -> Tuple[Dict[Cell, float], float]:
+        if not alive:
+            return {}, 0.0
+        if stench:
+            it = iter(stench)
+            cand = set(neighbors(*next(it), n))
+            for s in it:
+                cand.intersection_update(neighbors(*s, n))
+        else:
+            cand = {(x, y) for x in range(1, n + 1) for y in range(1, n + 1)}
+        cand.discard((1, 1))
+        cand.difference_update(visited)
+        for v in visited:
+            if v not in stench:
+                cand.difference_update(neighbors(*v, n))
+        if not cand:
+            return {}, 0.0
+        # the Wumpus ignores pits, so every consistent cell is equally likely
+        share = 1.0 / len(cand)
+        return {c: share for c in cand}, 0.0
+
+    def update(self, n: int, visited: Set[Cell], breeze: Set[Cell], stench: Set[Cell], alive: bool):
+        # risk is asked for several cells per step, so the tables are kept for the last state
+        key = (n, alive, frozenset(visited), frozenset(breeze), frozenset(stench))
+        if key != self.last_key:
+            pits, pit_default = self.pit_probabilities(n, visited, breeze)
+            wumpus, wumpus_default = self.wumpus_probabilities(n, visited, stench, alive)
+            self.last = (pits, wumpus, pit_default, wumpus_default)
+            self.last_key = key
+        return self.last
+
+    def risk(self, n: int, visited: Set[Cell], breeze: Set[Cell], stench: Set[Cell], alive: bool,
+             cell: Cell) -> float:
+        pits, wumpus, pit_default, wumpus_default = self.update(n, visited, breeze, stench, alive)
+        pp = pits.get(cell, pit_default)
+        pw = wumpus.get(cell, wumpus_default)
+        return pp + pw - pp * pw
+
+
+def naive_pit_probabilities(n: int, visited: Set[Cell], breeze: Set[Cell],
+                            pit_prob: float = CELL_PIT_PROB) -> Dict[Cell, float]:
+    # Reference enumeration over every frontier cell at once, for checking RiskModel.
+    _, clauses = breeze_clauses(n, visited, breeze)
+    frontier = sorted({c for cl in clauses for c in cl})
+    z = 0.0
+    t = {c: 0.0 for c in frontier}
+    for bits in range(1 << len(frontier)):
+        pits = {c for i, c in enumerate(frontier) if bits >> i & 1}
+        if all(any(c in pits for c in cl) for cl in clauses):
+            w = pit_prob ** len(pits) * (1 - pit_prob) ** (len(frontier) - len(pits))
+            z += w
+            for c in pits:
+                t[c] += w
+    return {c: t[c] / z for c in frontier}
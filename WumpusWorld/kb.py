@@ -0,0 +1,236 @@
+import random
+from typing import Dict, List, Optional, Set
+
+from bitboard import grid
+from engine import Agent, Game, Percepts
+
+
+class KnowledgeBase:
+    """Clause store over "pit at cell i" and "Wumpus at cell i" with unit propagation.
+
+    Variable i is P(i) and variable cells + i is W(i); a literal is var << 1, with the low
+    bit set for the negation. A breeze adds the clause "one of the neighbours is a pit",
+    and each clause watches two literals that are not false, so an assignment only visits
+    the clauses watching its negation. There is no backtracking, so a satisfied clause
+    never needs to be looked at again.
+
+    Stenches are not stored as clauses. There is one Wumpus, so it lies in the
+    intersection of the neighbourhoods of every stench seen. That intersection is kept as
+    a running candidate set, and every cell outside it is implicitly Wumpus-free. The
+    Wumpus may share a cell with a pit, so the two literals of a cell are independent and
+    a cell is safe once its pit literal is false and the Wumpus is dead or not there.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.cells = n * n
+        g = grid(n)
+        self.nbr: List[List[int]] = [[j for j in row if j >= 0] for row in g.step]
+        self.val: List[Optional[bool]] = [None] * (2 * self.cells)
+        self.watches: Dict[int, List[List[int]]] = {}
+        self.queue: List[int] = []
+        self.told: Set[int] = set()
+        self.cand: Optional[Set[int]] = None
+        self.wumpus: Optional[int] = None
+        self.alive = True
+        self.safe: Set[int] = set()
+        self.pit_free: Set[int] = set()  # pit-free cells not yet known to be Wumpus-free
+        self.new_safe: List[int] = []
+        self.new_pits: List[int] = []
+        self.conflicts = 0
+
+    def pit(self, i: int) -> int:
+        return i << 1
+
+    def wumpus_lit(self, i: int) -> int:
+        return (self.cells + i) << 1
+
+    def value(self, lit: int) -> Optional[bool]:
+        v = self.val[lit >> 1]
+        return None if v is None else v != bool(lit & 1)
+
+    def assign(self, lit: int):
+        want = not lit & 1
+        cur = self.val[lit >> 1]
+        if cur is None:
+            self.val[lit >> 1] = want
+            self.queue.append(lit)
+        elif cur != want:
+            self.conflicts += 1
+
+    def add_clause(self, lits: List[int]):
+        live = []
+        for lit in lits:
+            v = self.value(lit)
+            if v:
+                return
+            if v is None:
+                live.append(lit)
+        if not live:
+            self.conflicts += 1
+        elif len(live) == 1:
+            self.assign(live[0])
+        else:
+            self.watches.setdefault(live[0], []).append(live)
+            self.watches.setdefault(live[1], []).append(live)
+
+    def wumpus_free(self, i: int) -> bool:
+        return self.val[self.cells + i] is False or (self.cand is not None and i not in self.cand)
+
+    def check_safe(self, i: int):
+        if i in self.safe or self.val[i] is not False:
+            return
+        if self.alive and not self.wumpus_free(i):
+            self.pit_free.add(i)
+            return
+        self.pit_free.discard(i)
+        self.safe.add(i)
+        self.new_safe.append(i)
+
+    def narrow(self, cand: Set[int]):
+        # every cell leaving the candidate set has just become Wumpus-free
+        old = self.cand
+        self.cand = cand
+        if old is None:
+            for i in list(self.pit_free):
+                self.check_safe(i)
+        else:
+            for i in old - cand:
+                self.check_safe(i)
+        if len(cand) == 1 and self.wumpus is None:
+            self.assign(self.wumpus_lit(next(iter(cand))))
+
+    def on_assign(self, lit: int):
+        v = lit >> 1
+        true = not lit & 1
+        if v < self.cells:
+            if true:
+                self.new_pits.append(v)
+            else:
+                self.check_safe(v)
+        else:
+            i = v - self.cells
+            if true:
+                self.wumpus = i
+                self.narrow({i})
+            else:
+                if self.cand is not None and i in self.cand:
+                    self.narrow(self.cand - {i})
+                self.check_safe(i)
+
+    def propagate(self):
+        val = self.val
+        while self.queue:
+            lit = self.queue.pop()
+            self.on_assign(lit)
+            false_lit = lit ^ 1
+            ws = self.watches.get(false_lit)
+            if not ws:
+                continue
+            k = 0
+            while k < len(ws):
+                cl = ws[k]
+                if cl[0] == false_lit:
+                    cl[0], cl[1] = cl[1], cl[0]
+                other = cl[0]
+                ov = val[other >> 1]
+                if ov is not None and ov != bool(other & 1):
+                    # satisfied for good, stop watching it here
+                    ws[k] = ws[-1]
+                    ws.pop()
+                    continue
+                for j in range(2, len(cl)):
+                    lv = val[cl[j] >> 1]
+                    if lv is None or lv != bool(cl[j] & 1):
+                        cl[1], cl[j] = cl[j], cl[1]
+                        self.watches.setdefault(cl[1], []).append(cl)
+                        ws[k] = ws[-1]
+                        ws.pop()
+                        break
+                else:
+                    if ov is None:
+                        self.assign(other)
+                    else:
+                        self.conflicts += 1
+                    k += 1
+
+    def tell(self, i: int, breeze: bool, stench: bool):
+        # Percepts at cell i, which the agent is standing on. Repeats are ignored.
+        if i in self.told:
+            return
+        self.told.add(i)
+        nbr = self.nbr[i]
+        w = self.cells
+        assign = self.assign
+        assign(i << 1 | 1)
+        if self.alive:
+            assign((w + i) << 1 | 1)
+        if breeze:
+            self.add_clause([j << 1 for j in nbr])
+        else:
+            for j in nbr:
+                assign(j << 1 | 1)
+        if self.alive:
+            if stench:
+                near = {j for j in nbr if self.val[w + j] is not False}
+                self.narrow(near if self.cand is None else self.cand & near)
+            else:
+                for j in nbr:
+                    assign((w + j) << 1 | 1)
+        self.propagate()
+        if not breeze and not self.alive:
+            # pit literals set before the scream do not come round the queue again
+            for j in nbr:
+                self.check_safe(j)
+
+    def kill(self):
+        # The Wumpus no longer matters anywhere. Cells become safe as percepts clear their
+        # pit literals, and cells already told are told again, now without the stench.
+        self.alive = False
+        self.cand = None
+        self.pit_free.clear()
+        for i in range(self.cells, 2 * self.cells):
+            self.val[i] = False
+        self.told.clear()
+
+
+class KBAgent(Agent):
+    # Agent whose safe cells, pits and Wumpus location come from a KnowledgeBase instead of
+    # the hand-written rules; planning and risk-taking are unchanged.
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model=None):
+        super().__init__(game, rng, risk_model)
+        self.kb = KnowledgeBase(game.world.n)
+
+    def reset(self):
+        super().reset()
+        self.kb = KnowledgeBase(self.game.world.n)
+
+    def update_knowledge(self, p: Percepts, x: int, y: int):
+        kb = self.kb
+        alive = self.game.world.wumpus_alive
+        i = (y - 1) * kb.n + (x - 1)
+        if i in kb.told and kb.alive == alive:
+            return
+        if kb.alive and not alive:
+            kb.kill()
+        if p.breeze:
+            self.breeze_cells.add((x, y))
+        if p.stench and alive:
+            self.stench_cells.add((x, y))
+        kb.tell(i, p.breeze, p.stench and alive)
+        xy = grid(kb.n).xy
+        for i in kb.new_pits:
+            self.pits.add(xy[i])
+        for i in kb.new_safe:
+            c = xy[i]
+            self.safe.add(c)
+            if c not in self.visited:
+                self.frontier.add(c)
+        kb.new_pits.clear()
+        kb.new_safe.clear()
+        if self.wumpus_cell is None and kb.wumpus is not None:
+            self.wumpus_cell = xy[kb.wumpus]
+
+    def infer_wumpus_from_intersections(self):
+        # the knowledge base keeps the stench intersection itself
+        return
@@ -0,0 +1,128 @@
+from typing import Dict, List, Tuple
+
+from bitboard import grid
+from engine import FORWARD, LEFT, RIGHT, GRAB, SHOOT, CLIMB, Layout, cell_index, zobrist
+
+# search state: ((cell * 4 + dir) << 3) | HAS_GOLD | ARROW | WUMPUS_ALIVE
+HAS_GOLD, ARROW, WUMPUS_ALIVE = 4, 2, 1
+START = ARROW | WUMPUS_ALIVE
+SHOOT_COST = 11
+
+
+def layout_hash(n: int, layout: Layout) -> int:
+    # Zobrist hash of the layout alone, with the same keys Game.state_hash uses
+    k = zobrist(n)
+    pits, wumpus, gold = layout
+    h = n
+    for x, y in pits:
+        h ^= k.pit[cell_index(x, y, n)]
+    if wumpus:
+        h ^= k.wumpus[cell_index(*wumpus, n)]
+    if gold:
+        h ^= k.gold[cell_index(*gold, n)]
+    return h
+
+
+class Oracle:
+    """Best achievable score for a known layout, with the Game action costs.
+
+    A shortest-path search over (cell, heading, has_gold, arrow, wumpus_alive): moves and
+    turns cost 1, grabbing costs 1, shooting costs 11 and is only tried where it kills the Wumpus,
+    and stepping into a pit or the live Wumpus is never taken. Edge costs are 1 or 11, so a
+    bucket queue stands in for the heap. The best plan climbs out with the gold, or just
+    climbs out at the start for -1 when that costs less. Results are cached by layout hash.
+    """
+
+    def __init__(self, cache_limit: int = 1_000_000):
+        self.cache: Dict[Tuple[int, int], Tuple[int, bytes]] = {}
+        self.cache_limit = cache_limit
+        self.hits = 0
+        self.misses = 0
+
+    def solve(self, n: int, layout: Layout) -> Tuple[int, bytes]:
+        # Returns the best score and an action sequence that achieves it.
+        key = (n, layout_hash(n, layout))
+        hit = self.cache.get(key)
+        if hit is not None:
+            self.hits += 1
+            return hit
+        self.misses += 1
+        result = self.search(n, layout)
+        if len(self.cache) >= self.cache_limit:
+            self.cache.clear()
+        self.cache[key] = result
+        return result
+
+    def best_score(self, n: int, layout: Layout) -> int:
+        return self.solve(n, layout)[0]
+
+    def search(self, n: int, layout: Layout) -> Tuple[int, bytes]:
+        pits, wumpus, gold = layout
+        if not gold:
+            return -1, bytes([CLIMB])
+        step = grid(n).step
+        cells = n * n
+        blocked = [False] * cells
+        for x, y in pits:
+            blocked[cell_index(x, y, n)] = True
+        w = cell_index(*wumpus, n) if wumpus else -1
+        g = cell_index(*gold, n)
+        # hits[c * 4 + d]: an arrow shot from c heading d reaches the Wumpus
+        hits = [False] * (4 * cells)
+        if w >= 0:
+            for d in range(4):
+                c = step[w][(d + 2) & 3]
+                while c >= 0:
+                    hits[c * 4 + d] = True
+                    c = step[c][(d + 2) & 3]
+        # more than 1001 actions loses to climbing out at once
+        limit = 1000
+        dist: Dict[int, int] = {START: 0}
+        parent: Dict[int, Tuple[int, int]] = {}
+        buckets: List[List[int]] = [[START]]
+        cost = 0
+        goal = -1
+        while cost < len(buckets) and cost <= limit:
+            for s in buckets[cost]:
+                if dist[s] != cost:
+                    continue
+                flags = s & 7
+                cd = s >> 3
+                c, d = cd >> 2, cd & 3
+                if c == 0 and flags & HAS_GOLD:
+                    goal = s
+                    break
+                moves = [((cd & ~3 | (d + 1) & 3) << 3 | flags, 1, LEFT),
+                         ((cd & ~3 | (d - 1) & 3) << 3 | flags, 1, RIGHT)]
+                j = step[c][d]
+                if j >= 0 and not blocked[j] and not (j == w and flags & WUMPUS_ALIVE):
+                    moves.append(((j * 4 + d) << 3 | flags, 1, FORWARD))
+                if c == g and not flags & HAS_GOLD:
+                    moves.append((s | HAS_GOLD, 1, GRAB))
+                if flags & ARROW and flags & WUMPUS_ALIVE and hits[cd]:
+                    # a shot that misses only costs, so only the killing ones are edges
+                    moves.append((s & ~(ARROW | WUMPUS_ALIVE), SHOOT_COST, SHOOT))
+                for t, dc, a in moves:
+                    nc = cost + dc
+                    if nc < dist.get(t, limit + 1):
+                        dist[t] = nc
+                        parent[t] = (s, a)
+                        while len(buckets) <= nc:
+                            buckets.append([])
+                        buckets[nc].append(t)
+            if goal >= 0:
+                break
+            cost += 1
+        if goal < 0 or 1000 - dist[goal] - 1 < -1:
+            return -1, bytes([CLIMB])
+        plan = [CLIMB]
+        s = goal
+        while s in parent:
+            s, a = parent[s]
+            plan.append(a)
+        plan.reverse()
+        return 1000 - dist[goal] - 1, bytes(plan)
+
+
+def regret(oracle: Oracle, n: int, layout: Layout, score: int) -> int:
+    return oracle.best_score(n, layout) - score
@@ -0,0 +1,206 @@
+import random
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from engine import DIRS, Agent, Game, World
+from inference import RiskModel
+
+Cell = Tuple[int, int]
+
+
+class PlannerAgent(Agent):
+    """Agent that settles uncertain moves by sampling worlds and rolling them out.
+
+    Forced moves (grab, climb with the gold, walking a known-safe path) are made as in
+    Agent.step, since every world consistent with the percepts agrees on them. When no safe
+    cell is left to explore, the candidates are: step into each unknown neighbour, shoot
+    along each line that may hold the Wumpus, or walk home and climb out. Until `budget`
+    seconds have passed, a world is drawn from the RiskModel posteriors, every candidate is
+    played in it followed by a plain Agent for up to `horizon` steps, and the candidate
+    with the best mean score is taken. The clock is checked on every rollout step, and a
+    rollout still running when the budget is spent is left out of the means.
+    """
+
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model: Optional[RiskModel] = None,
+                 budget: float = 0.005, horizon: Optional[int] = None, max_samples: Optional[int] = None):
+        super().__init__(game, rng)
+        self.model = risk_model if risk_model is not None else RiskModel(game.world.pit_prob)
+        self.budget = budget
+        self.horizon = horizon
+        self.max_samples = max_samples
+        self.sim = Game(world=World(n=game.world.n))
+        self.decisions = 0
+        self.rollouts = 0
+        self.planning_time = 0.0
+
+    def rollouts_per_s(self) -> float:
+        return self.rollouts / self.planning_time if self.planning_time else 0.0
+
+    def run(self, agent: Agent, macro: List[str]):
+        g = agent.game
+        for a in macro:
+            if a == "S":
+                g.shoot()
+            else:
+                agent.execute_action(a)
+
+    def step(self) -> bool:
+        if self.game.terminal:
+            return False
+        x, y = self.game.agent.x, self.game.agent.y
+        self.mark_visited(x, y)
+        p = self.game.percepts()
+        self.update_knowledge(p, x, y)
+        if p.glitter and not self.game.agent.has_gold:
+            self.game.grab()
+            self.plan = self.bfs_path((x, y), lambda pos: pos == (1, 1)) + ["C"]
+            return True
+        if (x, y) == (1, 1) and self.game.agent.has_gold:
+            self.game.climb()
+            return True
+        if not self.plan:
+            self.plan = self.pick_safe_frontier()
+        if not self.plan:
+            self.plan = self.decide()
+        self.run(self, [self.plan.pop(0)])
+        return True
+
+    def candidates(self) -> List[List[str]]:
+        a = self.game.agent
+        world = self.game.world
+        out: List[List[str]] = []
+        for d, (dx, dy) in enumerate(DIRS):
+            c = (a.x + dx, a.y + dy)
+            if not world.inside(*c) or c in self.visited or c in self.pits:
+                continue
+            if world.wumpus_alive and c == self.wumpus_cell:
+                continue
+            out.append(self.turn_seq(a.dir, d) + ["F"])
+        if a.arrow_available and world.wumpus_alive:
+            _, wumpus, _, _ = self.model.update(world.n, self.visited, self.breeze_cells, self.stench_cells, True)
+            for d, (dx, dy) in enumerate(DIRS):
+                cx, cy = a.x + dx, a.y + dy
+                while world.inside(cx, cy):
+                    if (cx, cy) in wumpus:
+                        out.append(self.turn_seq(a.dir, d) + ["S"])
+                        break
+                    cx, cy = cx + dx, cy + dy
+        out.append(self.bfs_path((a.x, a.y), lambda pos: pos == (1, 1)) + ["C"])
+        return out
+
+    def fallback(self, cands: List[List[str]]) -> List[str]:
+        # without a single rollout, step to the least risky neighbour as Agent would,
+        # or go home when there is none
+        a = self.game.agent
+        target = self.best_adjacent_unknown(a.x, a.y)
+        if target is None:
+            return cands[-1]
+        d = DIRS.index((target[0] - a.x, target[1] - a.y))
+        return self.turn_seq(a.dir, d) + ["F"]
+
+    def sample_layout(self, pits_p: Dict[Cell, float], pit_default: float, wumpus_p: Dict[Cell, float]):
+        n = self.game.world.n
+        rng = self.rng
+        visited = self.visited
+        unknown = [(x, y) for x in range(1, n + 1) for y in range(1, n + 1) if (x, y) not in visited]
+        # pits are drawn from the marginals; breezes that end up unexplained are retried,
+        # the last draw is kept if none fits. Only cells next to a breeze can explain one,
+        # so the rest of the board is drawn once
+        near = {c for b in self.breeze_cells for c in self.nbrs(*b)}
+        far = {c for c in unknown if c != (1, 1) and c not in near and rng.random() < pits_p.get(c, pit_default)}
+        edge = [c for c in unknown if c != (1, 1) and c in near]
+        for _ in range(20):
+            pits: Set[Cell] = {c for c in edge if rng.random() < pits_p.get(c, pit_default)}
+            if all(any(c in pits for c in self.nbrs(*b)) for b in self.breeze_cells):
+                break
+        pits |= far
+        spots = [c for c in unknown if c != (1, 1)]
+        if wumpus_p:
+            cells = list(wumpus_p)
+            wumpus = cells[rng.randrange(len(cells))]
+        elif self.wumpus_cell:
+            wumpus = self.wumpus_cell
+        else:
+            # only once it is dead, where it lies no longer matters; any unvisited cell will do
+            wumpus = spots[rng.randrange(len(spots))] if spots else (1, 1)
+        gold = None
+        if not self.game.agent.has_gold:
+            gold = spots[rng.randrange(len(spots))] if spots else None
+        return pits, wumpus, gold
+
+    def clone(self, game: Game) -> Agent:
+        a = Agent(game, self.rng)
+        a.visited = set(self.visited)
+        a.safe = set(self.safe)
+        a.frontier = set(self.frontier)
+        a.pits = set(self.pits)
+        a.wumpus_cell = self.wumpus_cell
+        a.breeze_cells = set(self.breeze_cells)
+        a.stench_cells = set(self.stench_cells)
+        return a
+
+    def decide(self) -> List[str]:
+        # the budget covers the whole decision, candidates and posteriors included
+        clock = time.perf_counter
+        t0 = clock()
+        deadline = t0 + self.budget
+        cands = self.candidates()
+        if len(cands) == 1 or self.budget <= 0:
+            return self.fallback(cands)
+        world = self.game.world
+        a = self.game.agent
+        n = world.n
+        horizon = self.horizon or 2 * n * n
+        pits_p, wumpus_p, pit_default, _ = self.model.update(
+            n, self.visited, self.breeze_cells, self.stench_cells, world.wumpus_alive)
+        sim = self.sim
+        if sim.world.n != n:
+            sim.world = World(n=n)
+        totals = [0.0] * len(cands)
+        counts = [0] * len(cands)
+        samples = 0
+        rollouts = 0
+        out_of_time = False
+        while clock() < deadline and (self.max_samples is None or samples < self.max_samples):
+            sim.reset(self.sample_layout(pits_p, pit_default, wumpus_p))
+            if not world.wumpus_alive:
+                sim.world.kill_wumpus()
+            s = sim.agent
+            s.x, s.y, s.dir = a.x, a.y, a.dir
+            s.has_gold, s.arrow_available = a.has_gold, a.arrow_available
+            sim.rehash()
+            start = sim.snapshot()
+            for i, macro in enumerate(cands):
+                # the clock is checked every rollout step, and a rollout cut off by it is not
+                # counted, so a late sample may cover only some candidates
+                if clock() >= deadline:
+                    out_of_time = True
+                    break
+                sim.restore(start)
+                agent = self.clone(sim)
+                self.run(agent, macro)
+                k = 0
+                while not sim.terminal and k < horizon:
+                    if clock() >= deadline:
+                        out_of_time = True
+                        break
+                    agent.step()
+                    k += 1
+                if out_of_time:
+                    break
+                value = sim.score
+                if not sim.terminal and sim.agent.has_gold:
+                    value += 1000
+                totals[i] += value
+                counts[i] += 1
+                rollouts += 1
+            samples += 1
+        elapsed = clock() - t0
+        self.decisions += 1
+        self.rollouts += rollouts
+        self.planning_time += elapsed
+        scored = [i for i in range(len(cands)) if counts[i]]
+        if not scored:
+            return self.fallback(cands)
+        best = max(scored, key=lambda i: totals[i] / counts[i])
+        return list(cands[best])
@@ -0,0 +1,352 @@
+import argparse
+import mmap
+import os
+import random
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from engine import CELL_PIT_PROB, GLITTER, STENCH, Agent, Game
+from exhaustive import Explorer
+from headless import default_max_steps
+from transposition import Cell, CellSet
+
+# One file per board: a 32-byte header (magic, version, n, agent seed, max steps, capacity,
+# entries), then `capacity` u64 keys, `capacity` u32 values and a heap of step records. Keys
+# are open-addressed with linear probing from key % capacity, 0 marks an empty slot, and a
+# value is the offset of its record in the heap: RNG draws (u8), action count (u8), plan
+# actions dropped (u8), new plan length (u16), the step's action bytes and the new plan. A
+# step that keeps following its plan drops what it played and stores no plan; one that
+# makes a new plan has drop = NEW_PLAN.
+MAGIC = b"WWPT"
+VERSION = 3
+HEADER = struct.Struct("<4sHHIIQQ")
+RECORD = struct.Struct("<BBBH")
+NEW_PLAN = 255
+LOAD = 0.75
+MAX_SIZE = 8
+M64 = (1 << 64) - 1
+KNOWLEDGE = ("visited", "safe", "frontier", "pits", "breeze_cells", "stench_cells")
+# Keys are Zobrist hashes: each knowledge set XORs in a fixed random word per cell it holds,
+# so they can be kept up to date as cells are learnt rather than rebuilt every step
+_words = random.Random(0x57575054)
+CELL_WORDS = tuple(tuple(_words.getrandbits(64) for _ in range(MAX_SIZE * MAX_SIZE)) for _ in KNOWLEDGE)
+PLAN_BASE = _words.getrandbits(64) | 1
+STATE_MUL = 0x9E3779B97F4A7C15
+
+
+def cell_words(cells, n: int, words) -> int:
+    h = 0
+    for x, y in cells:
+        h ^= words[(y - 1) * n + (x - 1)]
+    return h
+
+
+def plan_hashes(plan: List[str]) -> List[int]:
+    # the hash of every suffix of the plan, so following it costs no hashing; the last
+    # entry is the empty plan
+    out = [0] * (len(plan) + 1)
+    h = 0
+    for j in range(len(plan) - 1, -1, -1):
+        h = (h * PLAN_BASE + ord(plan[j])) & M64
+        out[j] = h
+    return out
+
+
+def knowledge_key(agent: Agent, cells: int, plan: int, draws: int) -> int:
+    # Everything Agent.step reads once update_knowledge has run: pose, flags, the percepts
+    # here, the knowledge sets (`cells`, their XORed words), the Wumpus guess, the plan in
+    # hand and how far the RNG has moved. The cell words are random, so XORing the rest in
+    # leaves the key evenly spread. Histories that end in the same knowledge share one key.
+    game = agent.game
+    w = game.world
+    a = game.agent
+    code = w.percept_codes[(a.y - 1) * w.n + (a.x - 1)] & (STENCH | GLITTER)
+    flags = a.has_gold | a.arrow_available << 1 | w.wumpus_alive << 2 | code << 3
+    wc = 0 if agent.wumpus_cell is None else (agent.wumpus_cell[1] - 1) * w.n + agent.wumpus_cell[0]
+    state = a.x | a.y << 4 | a.dir << 8 | flags << 10 | wc << 16 | draws << 24
+    return cells ^ plan ^ (state * STATE_MUL & M64) or 1
+
+
+class ZobristSet(CellSet):
+    # a CellSet that also keeps the XOR of its cells' words
+    __slots__ = ("words", "key")
+
+    def __init__(self, n: int, words, cells=()):
+        self.words = words
+        self.key = 0
+        super().__init__(n, cells)
+
+    def add(self, c: Cell):
+        if c not in self:
+            self.key ^= self.words[(c[1] - 1) * self.n + (c[0] - 1)]
+            CellSet.add(self, c)
+
+    def discard(self, c: Cell):
+        if c in self:
+            self.key ^= self.words[(c[1] - 1) * self.n + (c[0] - 1)]
+            CellSet.discard(self, c)
+
+    def clear(self):
+        CellSet.clear(self)
+        self.key = 0
+
+
+class CountingRandom(random.Random):
+    # counts draws, so a compiled step can record how far it moved the agent's RNG
+    draws = 0
+
+    def seed(self, *args, **kwargs):
+        super().seed(*args, **kwargs)
+        self.draws = 0
+
+    def random(self) -> float:
+        self.draws += 1
+        return super().random()
+
+    def getstate(self):
+        return super().getstate(), self.draws
+
+    def setstate(self, state):
+        inner, self.draws = state
+        super().setstate(inner)
+
+
+def counting_agent(game: Game) -> Agent:
+    return Agent(game, rng=CountingRandom())
+
+
+class PolicyCompiler(Explorer):
+    """Records what the agent does in every knowledge state it can reach on the board.
+
+    With a fixed seed the agent's step is a function of its knowledge state, the plan it
+    holds and how many RNG draws it has made, so that is the key. The exhaustive walk
+    reaches every state some world can produce within max_steps; many percept histories
+    lead to the same state and share its entry.
+    """
+
+    def __init__(self, n: int = 4, pit_prob: float = CELL_PIT_PROB, max_steps: Optional[int] = None,
+                 seed: int = 0):
+        if n > MAX_SIZE:
+            raise ValueError(f"policy tables hold boards up to {MAX_SIZE}x{MAX_SIZE}")
+        super().__init__(n, pit_prob, max_steps, counting_agent, seed)
+        self.entries: Dict[int, bytes] = {}
+        self.conflicts = 0
+
+    def step(self, game: Game, agent: Agent):
+        # the opening of Agent.step, which it repeats to no effect, then the step itself
+        a = game.agent
+        n = self.n
+        agent.mark_visited(a.x, a.y)
+        agent.update_knowledge(game.percepts(), a.x, a.y)
+        cells = 0
+        for name, words in zip(KNOWLEDGE, CELL_WORDS):
+            cells ^= cell_words(getattr(agent, name), n, words)
+        draws = agent.rng.draws
+        key = knowledge_key(agent, cells, plan_hashes(agent.plan)[0], draws)
+        k = len(game.actions)
+        before = list(agent.plan)
+        agent.step()
+        acts = bytes(game.actions[k:])
+        after = agent.plan
+        drop = len(before) - len(after)
+        if 0 <= drop < NEW_PLAN and before[drop:] == after:
+            plan = b""
+        else:
+            drop, plan = NEW_PLAN, "".join(after).encode()
+        record = RECORD.pack(agent.rng.draws - draws, len(acts), drop, len(plan)) + acts + plan
+        if self.entries.setdefault(key, record) != record:
+            self.conflicts += 1
+
+
+def _compile_task(task) -> Tuple[Dict[int, bytes], int]:
+    wumpus, n, max_steps, seed = task
+    c = PolicyCompiler(n, CELL_PIT_PROB, max_steps, seed)
+    c.run(wumpus)
+    return c.entries, c.conflicts
+
+
+def compile_policy(path: str, n: int = 4, max_steps: Optional[int] = None, seed: int = 0,
+                   workers: Optional[int] = None) -> int:
+    if max_steps is None:
+        max_steps = default_max_steps(n)
+    tasks = [(w, n, max_steps, seed) for w in range(1, n * n)]
+    entries: Dict[int, bytes] = {}
+    conflicts = 0
+
+    def merge(parts):
+        nonlocal conflicts
+        for part, bad in parts:
+            conflicts += bad
+            for key, record in part.items():
+                if entries.setdefault(key, record) != record:
+                    conflicts += 1
+
+    if workers == 1:
+        merge(map(_compile_task, tasks))
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            merge(pool.map(_compile_task, tasks))
+    if conflicts:
+        raise ValueError(f"{conflicts} knowledge states led to different steps; is the agent deterministic?")
+    write_table(path, entries, n, seed, max_steps)
+    return len(entries)
+
+
+def write_table(path: str, entries: Dict[int, bytes], n: int, seed: int, max_steps: int):
+    capacity = max(16, int(len(entries) / LOAD) + 1)
+    keys = [0] * capacity
+    values = [0] * capacity
+    # identical records (most steps are one move with no plan change) are stored once
+    offsets: Dict[bytes, int] = {}
+    heap = bytearray()
+    for key, record in entries.items():
+        off = offsets.get(record)
+        if off is None:
+            off = offsets[record] = len(heap)
+            heap += record
+        slot = key % capacity
+        while keys[slot]:
+            slot = (slot + 1) % capacity
+        keys[slot] = key
+        values[slot] = off
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, n, seed, max_steps, capacity, len(entries)))
+        f.write(np.array(keys, dtype="<u8").tobytes())
+        f.write(np.array(values, dtype="<u4").tobytes())
+        f.write(heap)
+
+
+class PolicyTable:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, version, self.n, self.seed, self.max_steps, capacity, self.entries = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} policy table")
+        self.capacity = capacity
+        # plain memoryviews over the mapping: indexing them is far cheaper than a NumPy scalar
+        with open(path, "rb") as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        body = memoryview(self.map)[HEADER.size:]
+        self.keys = body[:8 * capacity].cast("Q")
+        self.values = body[8 * capacity:12 * capacity].cast("I")
+        self.heap = body[12 * capacity:]
+        # a few hundred distinct records serve every key on 4x4, so each is decoded once
+        self.records: Dict[int, Tuple[bytes, int, bytes, int]] = {}
+
+    def __len__(self) -> int:
+        return self.entries
+
+    def __getstate__(self):
+        # worker processes reopen the file rather than receive a copy of it
+        return self.path
+
+    def __setstate__(self, path: str):
+        self.__init__(path)
+
+    def lookup(self, key: int) -> Optional[Tuple[bytes, int, bytes, int]]:
+        # the step's actions, the plan actions it dropped (NEW_PLAN: replaced by the
+        # returned plan) and the RNG draws it made
+        keys = self.keys
+        capacity = self.capacity
+        slot = key % capacity
+        while True:
+            k = keys[slot]
+            if k == key:
+                off = self.values[slot]
+                entry = self.records.get(off)
+                if entry is None:
+                    draws, acts, drop, plan = RECORD.unpack_from(self.heap, off)
+                    at = off + RECORD.size
+                    entry = self.records[off] = (bytes(self.heap[at:at + acts]), drop,
+                                                 bytes(self.heap[at + acts:at + acts + plan]), draws)
+                return entry
+            if k == 0:
+                return None
+            slot = (slot + 1) % capacity
+
+
+class PolicyAgent(Agent):
+    # Agent that keeps its knowledge as usual but takes each decision from a compiled
+    # table: the knowledge sets keep their part of the key current as cells are learnt and
+    # the plan's hashes are worked out once when it is made, so a step mixes one key and
+    # makes one probe, with no search. The table replays the RNG draws of the seed it was
+    # compiled with, so the agent's own `rng` is never used and seeding it changes nothing.
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model=None,
+                 table: Optional[PolicyTable] = None):
+        super().__init__(game, rng, risk_model)
+        if table is None or table.n != game.world.n:
+            raise ValueError(f"PolicyAgent needs a table compiled for n={game.world.n}")
+        self.table = table
+        self.draws = 0
+        self.known = None
+        self.plan_keys = [0]
+        self.track()
+
+    def reset(self):
+        super().reset()
+        self.draws = 0
+        self.known = None
+        self.plan_keys = [0]
+        self.track()
+
+    def track(self):
+        n = self.game.world.n
+        self.knowledge = [ZobristSet(n, words, getattr(self, name)) for name, words in zip(KNOWLEDGE, CELL_WORDS)]
+        for name, cells in zip(KNOWLEDGE, self.knowledge):
+            setattr(self, name, cells)
+
+    def step(self) -> bool:
+        game = self.game
+        if game.terminal:
+            return False
+        a = game.agent
+        visited, safe, frontier, pits, breeze, stench = self.knowledge
+        cells = visited.key ^ safe.key ^ frontier.key ^ pits.key ^ breeze.key ^ stench.key
+        # update_knowledge only reads the pose, the knowledge and the Wumpus. One pass can
+        # find the Wumpus after its breeze rule has run, so only a pass that changed nothing
+        # is a fixed point that can be skipped while they stay the same.
+        known = (a.x, a.y, cells, self.wumpus_cell, game.world.wumpus_alive)
+        if known != self.known:
+            self.mark_visited(a.x, a.y)
+            self.update_knowledge(game.percepts(), a.x, a.y)
+            before = cells
+            cells = visited.key ^ safe.key ^ frontier.key ^ pits.key ^ breeze.key ^ stench.key
+            changed = cells != before or self.wumpus_cell != known[3]
+            self.known = None if changed else known
+        entry = self.table.lookup(knowledge_key(self, cells, self.plan_keys[0], self.draws))
+        if entry is None:
+            raise KeyError(f"no table entry for this state; {self.table.path} covers {self.table.max_steps} steps")
+        acts, drop, plan, draws = entry
+        for b in acts:
+            game.apply(b)
+        if drop == NEW_PLAN:
+            self.plan = list(plan.decode())
+            self.plan_keys = plan_hashes(self.plan)
+        elif drop:
+            del self.plan[:drop]
+            del self.plan_keys[:drop]
+        self.draws += draws
+        return True
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compile Agent into a lookup table over knowledge states.")
+    parser.add_argument("path", help="table file to write")
+    parser.add_argument("--size", type=int, default=4, help="board side length (4 or 5)")
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0, help="agent RNG seed baked into the table")
+    parser.add_argument("--workers", type=int, default=0, help="worker processes (0 = one per core)")
+    args = parser.parse_args(argv)
+    t0 = time.perf_counter()
+    count = compile_policy(args.path, args.size, args.max_steps, args.seed, args.workers or None)
+    print(f"{count} entries, {os.path.getsize(args.path) / 1e6:.1f} MB, {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,159 @@
+import json
+import marshal
+import time
+from typing import Dict, List, Optional, Tuple
+
+from engine import Agent, Game
+
+# agent methods timed as phases when present; BitAgent searches through `search` and
+# scores cells through `risk_at`
+AGENT_PHASES = ("step", "update_knowledge", "pick_safe_frontier", "bfs_path", "search", "cell_risk",
+                "risk_at", "best_adjacent_unknown", "execute_action")
+GAME_ACTIONS = ("move_forward", "turn_left", "turn_right", "grab", "shoot", "climb", "release")
+
+
+class Profiler:
+    """Wall time and counters per phase of Agent.step, summed over every instrumented agent.
+
+    Nothing is patched until instrument() is called, so an agent that is not profiled runs
+    its own methods untouched. Instrumented methods are wrapped on the instance (the game is
+    given a subclass that times its actions), nesting is tracked so each phase also gets
+    its self time, and caller edges are kept for the cProfile-format dump.
+    """
+
+    def __init__(self):
+        # name -> [calls, total seconds, self seconds, max seconds]
+        self.phases: Dict[str, List[float]] = {}
+        # (caller, callee) -> [calls, total seconds, self seconds]
+        self.edges: Dict[Tuple[str, str], List[float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.child: List[float] = []
+
+    def count(self, name: str, k: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + k
+
+    def wrap(self, name: str, fn):
+        names = self.names
+        child = self.child
+        phases = self.phases
+        edges = self.edges
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            names.append(name)
+            child.append(0.0)
+            t0 = clock()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                dt = clock() - t0
+                own = dt - child.pop()
+                names.pop()
+                rec = phases.get(name)
+                if rec is None:
+                    rec = phases[name] = [0, 0.0, 0.0, 0.0]
+                rec[0] += 1
+                rec[1] += dt
+                rec[2] += own
+                if dt > rec[3]:
+                    rec[3] = dt
+                caller = names[-1] if names else "<batch>"
+                if child:
+                    child[-1] += dt
+                edge = edges.get((caller, name))
+                if edge is None:
+                    edge = edges[(caller, name)] = [0, 0.0, 0.0]
+                edge[0] += 1
+                edge[1] += dt
+                edge[2] += own
+
+        return timed
+
+    def instrument(self, agent: Agent) -> Agent:
+        for name in AGENT_PHASES:
+            fn = getattr(agent, name, None)
+            if fn is not None:
+                setattr(agent, name, self.wrap(name, fn))
+        step = agent.step
+        pick = agent.pick_safe_frontier
+        count = self.count
+
+        def counted_step():
+            nodes = agent.bfs_nodes
+            moved = step()
+            count("steps")
+            count("bfs_nodes", agent.bfs_nodes - nodes)
+            return moved
+
+        def counted_pick():
+            count("frontier_calls")
+            count("frontier_cells", frontier_size(agent))
+            return pick()
+
+        agent.step = counted_step
+        agent.pick_safe_frontier = counted_pick
+        self.instrument_game(agent.game)
+        return agent
+
+    def instrument_game(self, game: Game):
+        # Game has __slots__, so its actions are timed by switching it to a subclass
+        cls = type(game)
+        if getattr(cls, "profiler", None) is self:
+            return
+        body = {"__slots__": (), "profiler": self}
+        for name in GAME_ACTIONS:
+            body[name] = self.wrap("game." + name, getattr(cls, name))
+        game.__class__ = type("Profiled" + cls.__name__, (cls,), body)
+
+    def factory(self, agent_cls):
+        # drop-in for an agent class, e.g. run_batch(agent_cls=profiler.factory(Agent))
+        def make(game: Game, *args, **kwargs) -> Agent:
+            return self.instrument(agent_cls(game, *args, **kwargs))
+        return make
+
+    def summary(self) -> Dict:
+        phases = {}
+        for name, (calls, total, own, peak) in sorted(self.phases.items(), key=lambda kv: -kv[1][1]):
+            phases[name] = {"calls": calls, "total_s": total, "self_s": own,
+                            "mean_us": 1e6 * total / calls if calls else 0.0, "max_us": 1e6 * peak}
+        counters = dict(self.counters)
+        if counters.get("frontier_calls"):
+            counters["frontier_cells_mean"] = counters["frontier_cells"] / counters["frontier_calls"]
+        return {"phases": phases, "counters": counters}
+
+    def to_json(self, path: str):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def dump_stats(self, path: str):
+        # The marshal layout pstats.Stats reads: {func: (cc, nc, tt, ct, callers)}, where a
+        # func is (file, line, name) and callers maps caller funcs to (cc, nc, tt, ct).
+        def func(name: str) -> Tuple[str, int, str]:
+            return ("wumpus", 0, name)
+
+        stats = {}
+        for name, (calls, total, own, _) in self.phases.items():
+            callers = {}
+            for (caller, callee), (c, t, o) in self.edges.items():
+                if callee == name:
+                    callers[func(caller)] = (c, c, o, t)
+            stats[func(name)] = (calls, calls, own, total, callers)
+        with open(path, "wb") as f:
+            marshal.dump(stats, f)
+
+    def format(self, top: Optional[int] = None) -> str:
+        s = self.summary()
+        lines = [f"{'phase':>24} {'calls':>9} {'total s':>9} {'self s':>8} {'mean us':>9} {'max us':>9}"]
+        for name, p in list(s["phases"].items())[:top]:
+            lines.append(f"{name:>24} {p['calls']:>9} {p['total_s']:>9.3f} {p['self_s']:>8.3f} "
+                         f"{p['mean_us']:>9.2f} {p['max_us']:>9.1f}")
+        lines.append("  ".join(f"{k}={v:.1f}" if isinstance(v, float) else f"{k}={v}"
+                               for k, v in s["counters"].items()))
+        return "\n".join(lines)
+
+
+def frontier_size(agent: Agent) -> int:
+    if isinstance(agent.safe, int):
+        return (agent.safe & ~agent.visited).bit_count()
+    return len(agent.frontier)
@@ -0,0 +1,143 @@
+from array import array
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from bitboard import grid, to_mask
+from engine import (FORWARD, LEFT, RIGHT, GRAB, SHOOT, CLIMB, RELEASE,
+                    AgentState, Game, Layout, World, cell_index, cell_xy)
+
+# packed per-step state: cell | dir << 16 | flags << 18 | (gold cell + 1) << 23
+HAS_GOLD, ARROW, ALIVE, WUMPUS_ALIVE, TERMINAL = 1 << 18, 1 << 19, 1 << 20, 1 << 21, 1 << 22
+CELL_MASK = 0xFFFF
+GOLD_SHIFT = 23
+
+
+@dataclass
+class Recording:
+    n: int
+    layout: Layout
+    actions: bytes
+
+
+def record(game: Game) -> Recording:
+    return Recording(game.world.n, game.start_layout, bytes(game.actions))
+
+
+@dataclass
+class ReplayState:
+    x: int
+    y: int
+    dir: int
+    score: int
+    has_gold: bool
+    arrow_available: bool
+    alive: bool
+    wumpus_alive: bool
+    terminal: bool
+    gold: Optional[Tuple[int, int]]
+
+
+class Replay:
+    # Applies a recorded action stream once with the Game rules inlined, storing every
+    # intermediate state, so any step can be looked up without re-running the agent or
+    # replaying from the start.
+    def __init__(self, rec: Recording):
+        self.rec = rec
+        n = rec.n
+        pits, wumpus, gold = rec.layout
+        step = grid(n).step
+        pits_mask = to_mask(pits, n)
+        w = cell_index(*wumpus, n) if wumpus else -1
+        g = cell_index(*gold, n) if gold else -1
+        c, d = 0, 0
+        score = 0
+        # flags also carries the gold cell, so a state is just c | d << 16 | flags
+        flags = ARROW | ALIVE | WUMPUS_ALIVE | (g + 1) << GOLD_SHIFT
+        states = array("q", [c | flags])
+        scores = array("q", [0])
+        push_state = states.append
+        push_score = scores.append
+        for a in rec.actions:
+            if flags & TERMINAL:
+                break
+            score -= 1
+            if a == FORWARD:
+                nc = step[c][d]
+                if nc >= 0:
+                    c = nc
+                    if (pits_mask >> c) & 1 or (c == w and flags & WUMPUS_ALIVE):
+                        flags = (flags | TERMINAL) & ~ALIVE
+                        score -= 1000
+            elif a == LEFT:
+                d = (d + 1) & 3
+            elif a == RIGHT:
+                d = (d - 1) & 3
+            elif a == GRAB:
+                if not flags & HAS_GOLD and (flags >> GOLD_SHIFT) == c + 1:
+                    flags = (flags & ~(-1 << GOLD_SHIFT)) | HAS_GOLD
+            elif a == RELEASE:
+                if flags & HAS_GOLD:
+                    flags = (flags & ~HAS_GOLD) | (c + 1) << GOLD_SHIFT
+            elif a == SHOOT:
+                if flags & ARROW:
+                    flags &= ~ARROW
+                    score -= 10
+                    if flags & WUMPUS_ALIVE and w >= 0:
+                        t = step[c][d]
+                        while t >= 0 and t != w:
+                            t = step[t][d]
+                        if t == w:
+                            flags &= ~WUMPUS_ALIVE
+            elif a == CLIMB:
+                if c == 0:
+                    if flags & HAS_GOLD:
+                        score += 1000
+                    flags |= TERMINAL
+            else:
+                raise ValueError(f"unknown action byte {a!r}")
+            push_state(c | d << 16 | flags)
+            push_score(score)
+        self.states = states
+        self.scores = scores
+
+    def __len__(self) -> int:
+        return len(self.states) - 1
+
+    def state(self, t: int) -> ReplayState:
+        s = self.states[t]
+        n = self.rec.n
+        x, y = cell_xy(s & CELL_MASK, n)
+        gold = s >> GOLD_SHIFT
+        return ReplayState(
+            x=x, y=y, dir=(s >> 16) & 3, score=self.scores[t],
+            has_gold=bool(s & HAS_GOLD), arrow_available=bool(s & ARROW), alive=bool(s & ALIVE),
+            wumpus_alive=bool(s & WUMPUS_ALIVE), terminal=bool(s & TERMINAL),
+            gold=cell_xy(gold - 1, n) if gold else None,
+        )
+
+    def restore(self, game: Game, t: int):
+        st = self.state(t)
+        if game.world.n != self.rec.n:
+            game.world = World(n=self.rec.n)
+        game.world.load_layout(self.rec.layout)
+        if not st.wumpus_alive:
+            game.world.kill_wumpus()
+        if st.gold is None:
+            game.world.take_gold()
+        elif st.gold != game.world.gold:
+            game.world.drop_gold(*st.gold)
+        game.agent = AgentState(x=st.x, y=st.y, dir=st.dir, has_gold=st.has_gold,
+                                arrow_available=st.arrow_available, alive=st.alive)
+        game.score = st.score
+        game.terminal = st.terminal
+        game.last_scream = False
+        game.start_layout = self.rec.layout
+        game.actions = bytearray(self.rec.actions[:t])
+        # undo stops at the restored step, the per-action effects before it are not rebuilt
+        game.undo_log = bytearray()
+        game.rehash()
+
+    def game_at(self, t: int) -> Game:
+        game = Game(world=World(n=self.rec.n))
+        self.restore(game, t)
+        return game
@@ -0,0 +1,322 @@
+import argparse
+import math
+import random
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass
+from functools import partial
+from typing import Deque, Dict, List, Optional
+
+import numpy as np
+
+from bitboard import grid
+from engine import CELL_PIT_PROB, GLITTER, GRID_SIZE, Agent, Game, World, check_board
+from headless import format_summary, run_batch
+from vecenv import (ACTIONS, A_CLIMB, A_FORWARD, A_GRAB, A_LEFT, A_RIGHT, A_SHOOT, ARROW, HAS_GOLD, OBS_CELL,
+                    OBS_DIR, OBS_FLAGS, OBS_PERCEPT, VecEnv)
+
+# A knowledge state packs what the learner can tell at the start of a step:
+#   ((((cell * 4 + dir) * 8 + breeze|stench|glitter) * 4 + has_gold|arrow) * 3 + ahead)
+# where ahead is 0 for a wall, 1 for a cell never entered this episode and 2 for one that has.
+PERCEPT_BITS = 8
+FLAG_STATES = 4
+AHEAD_WALL, AHEAD_NEW, AHEAD_SEEN = range(3)
+SCORE_WINDOW = 10_000
+
+
+def state_count(n: int) -> int:
+    return n * n * 4 * PERCEPT_BITS * FLAG_STATES * 3
+
+
+def legal_actions(n: int) -> np.ndarray:
+    # (states, actions) mask of the actions that can change something: no walking into a
+    # wall, grabbing with no glitter, shooting without the arrow, climbing away from the
+    # start, or releasing the gold, which never pays
+    s = np.arange(state_count(n))
+    ahead = s % 3
+    flags = s // 3 % FLAG_STATES
+    percept = s // (3 * FLAG_STATES) % PERCEPT_BITS
+    cell = s // (3 * FLAG_STATES * PERCEPT_BITS * 4)
+    legal = np.zeros((len(s), len(ACTIONS)), dtype=bool)
+    legal[:, A_FORWARD] = ahead != AHEAD_WALL
+    legal[:, A_LEFT] = legal[:, A_RIGHT] = True
+    legal[:, A_GRAB] = (percept & GLITTER != 0) & (flags & HAS_GOLD == 0)
+    legal[:, A_SHOOT] = flags & ARROW != 0
+    legal[:, A_CLIMB] = cell == 0
+    return legal
+
+
+def new_q_table(n: int) -> np.ndarray:
+    # illegal actions hold -inf, so argmax and the bootstrap max never pick them
+    return np.where(legal_actions(n), np.float32(0), np.float32(-np.inf)).astype(np.float32)
+
+
+def encode(obs: np.ndarray, visited: np.ndarray, step_table: np.ndarray) -> np.ndarray:
+    # states for a (k, 4) VecEnv observation; visited is (k, n*n) bool
+    cell = obs[:, OBS_CELL]
+    d = obs[:, OBS_DIR]
+    nxt = step_table[cell, d]
+    ahead = np.where(nxt < 0, AHEAD_WALL,
+                     np.where(visited[np.arange(len(obs)), np.maximum(nxt, 0)], AHEAD_SEEN, AHEAD_NEW))
+    s = (cell * 4 + d) * PERCEPT_BITS + (obs[:, OBS_PERCEPT] & (PERCEPT_BITS - 1))
+    return (s * FLAG_STATES + obs[:, OBS_FLAGS]) * 3 + ahead
+
+
+@dataclass
+class LinearSchedule:
+    start: float = 1.0
+    end: float = 0.05
+    steps: int = 1_000_000
+
+    def __call__(self, t: int) -> float:
+        return self.start + (self.end - self.start) * min(1.0, t / self.steps)
+
+
+@dataclass
+class ExponentialSchedule:
+    start: float = 1.0
+    end: float = 0.05
+    half_life: int = 200_000
+
+    def __call__(self, t: int) -> float:
+        return self.end + (self.start - self.end) * math.pow(0.5, t / self.half_life)
+
+
+class ReplayBuffer:
+    # Fixed-capacity ring of transitions in preallocated arrays; the oldest are overwritten.
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.s = np.zeros(capacity, dtype=np.int32)
+        self.a = np.zeros(capacity, dtype=np.uint8)
+        self.r = np.zeros(capacity, dtype=np.float32)
+        self.s2 = np.zeros(capacity, dtype=np.int32)
+        self.done = np.zeros(capacity, dtype=bool)
+        self.pos = 0
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        return self.s.nbytes + self.a.nbytes + self.r.nbytes + self.s2.nbytes + self.done.nbytes
+
+    def add(self, s: np.ndarray, a: np.ndarray, r: np.ndarray, s2: np.ndarray, done: np.ndarray):
+        k = len(s)
+        idx = (self.pos + np.arange(k)) % self.capacity
+        self.s[idx] = s
+        self.a[idx] = a
+        self.r[idx] = r
+        self.s2[idx] = s2
+        self.done[idx] = done
+        self.pos = (self.pos + k) % self.capacity
+        self.size = min(self.size + k, self.capacity)
+
+    def sample(self, m: int, rng: np.random.Generator):
+        idx = rng.integers(0, self.size, m)
+        return self.s[idx], self.a[idx], self.r[idx], self.s2[idx], self.done[idx]
+
+
+@dataclass
+class TrainReport:
+    env_steps: int
+    episodes: int
+    elapsed: float
+    score_mean: float  # over the last SCORE_WINDOW finished episodes
+    win_rate: float
+    epsilon: float
+    memory: Dict[str, int]
+
+    def format(self) -> str:
+        mem = "  ".join(f"{k}={v / 1e6:.1f}MB" for k, v in self.memory.items())
+        return (f"env steps: {self.env_steps}  episodes: {self.episodes}  time: {self.elapsed:.1f}s  "
+                f"steps/s: {self.env_steps / self.elapsed if self.elapsed else 0:.0f}  epsilon: {self.epsilon:.3f}\n"
+                f"recent score mean: {self.score_mean:.2f}  win rate: {self.win_rate:.2%}\n"
+                f"memory: {mem}")
+
+
+class Trainer:
+    """Tabular Q-learning against VecEnv, with every game stepped in lockstep.
+
+    Each round picks epsilon-greedy actions for all k games from one Q-table lookup, steps
+    them together, pushes the k transitions into the replay ring, and then applies
+    `updates` minibatch Q-learning updates sampled from it. Games that end are restarted by
+    VecEnv. The last step of a truncated game is not stored: its next state is gone by then,
+    and treating the cut-off as terminal would teach the table that stalling is cheap.
+    """
+
+    def __init__(self, envs: int = 256, n: int = GRID_SIZE, pit_prob: float = CELL_PIT_PROB,
+                 pit_count: Optional[int] = None, max_steps: Optional[int] = None, capacity: int = 1 << 20,
+                 batch: int = 1024, updates: int = 1, gamma: float = 0.99, lr: float = 0.1,
+                 epsilon=None, seed: Optional[int] = None):
+        self.env = VecEnv(envs, n, pit_prob, pit_count, max_steps, seed)
+        self.n = n
+        self.q = new_q_table(n)
+        self.replay = ReplayBuffer(capacity)
+        self.batch = batch
+        self.updates = updates
+        self.gamma = gamma
+        self.lr = lr
+        self.epsilon = epsilon if epsilon is not None else LinearSchedule()
+        self.rng = np.random.default_rng(None if seed is None else seed + 1)
+        self.step_table = self.env.step_table
+        self.visited = np.zeros((envs, n * n), dtype=bool)
+        self.env_steps = 0
+        self.episodes = 0
+        self.scores: Deque[int] = deque(maxlen=SCORE_WINDOW)
+        self.obs = self.env.reset()
+        self.visited[:, 0] = True
+
+    def memory(self) -> Dict[str, int]:
+        env = sum(v.nbytes for v in vars(self.env).values() if isinstance(v, np.ndarray))
+        return {"q": self.q.nbytes, "replay": self.replay.nbytes, "envs": env + self.visited.nbytes}
+
+    def act(self, states: np.ndarray, eps: float) -> np.ndarray:
+        rows = self.q[states]
+        actions = rows.argmax(axis=1)
+        explore = np.flatnonzero(self.rng.random(len(states)) < eps)
+        # a uniform legal action: the largest random key among the finite entries
+        keys = self.rng.random((len(explore), len(ACTIONS)))
+        keys[np.isinf(rows[explore])] = -1.0
+        actions[explore] = keys.argmax(axis=1)
+        return actions
+
+    def learn(self):
+        s, a, r, s2, done = self.replay.sample(self.batch, self.rng)
+        target = r + self.gamma * np.where(done, 0.0, self.q[s2].max(axis=1))
+        # common states recur many times in a batch, so each (s, a) moves by its mean error
+        # once; summing them would multiply the step size and diverge
+        flat = self.q.reshape(-1)
+        idx = s.astype(np.int64) * len(ACTIONS) + a
+        keys, inverse, counts = np.unique(idx, return_inverse=True, return_counts=True)
+        err = np.bincount(inverse, weights=target - flat[idx])
+        flat[keys] += self.lr * err / counts
+
+    def round(self):
+        k = self.env.k
+        states = encode(self.obs, self.visited, self.step_table)
+        actions = self.act(states, self.epsilon(self.env_steps))
+        obs, reward, ended, info = self.env.step(actions)
+        finished = np.flatnonzero(ended)
+        if len(finished):
+            self.visited[finished] = False
+            self.scores.extend(info["final_score"][finished].tolist())
+            self.episodes += len(finished)
+        self.visited[self.env.rows, obs[:, OBS_CELL]] = True
+        keep = ~info["truncated"]
+        s2 = encode(obs, self.visited, self.step_table)
+        self.replay.add(states[keep], actions[keep], reward[keep], s2[keep], ended[keep])
+        self.obs = obs
+        self.env_steps += k
+        if len(self.replay) >= self.batch:
+            for _ in range(self.updates):
+                self.learn()
+
+    def train(self, steps: int, report_every: float = 0.0) -> TrainReport:
+        t0 = last = time.perf_counter()
+        stop = self.env_steps + steps
+        while self.env_steps < stop:
+            self.round()
+            if report_every > 0 and time.perf_counter() - last >= report_every:
+                last = time.perf_counter()
+                print(self.report(last - t0).format(), flush=True)
+        return self.report(time.perf_counter() - t0)
+
+    def report(self, elapsed: float) -> TrainReport:
+        scores = self.scores
+        m = len(scores)
+        return TrainReport(self.env_steps, self.episodes, elapsed, sum(scores) / m if m else 0.0,
+                           sum(1 for s in scores if s > 0) / m if m else 0.0, self.epsilon(self.env_steps),
+                           self.memory())
+
+
+def load_q(path: str) -> np.ndarray:
+    return np.load(path)
+
+
+class QAgent(Agent):
+    # Plays a trained Q-table greedily, one action per step, through the same step() as Agent.
+    # The state is encoded from the Game exactly as Trainer encodes VecEnv observations.
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model=None,
+                 q: Optional[np.ndarray] = None, epsilon: float = 0.0):
+        super().__init__(game, rng, risk_model)
+        n = game.world.n
+        if q is None or q.shape != (state_count(n), len(ACTIONS)):
+            raise ValueError(f"QAgent needs a Q-table trained for n={n}")
+        self.q = q
+        self.epsilon = epsilon
+        self.step_table = grid(n).step
+        self.seen = bytearray(n * n)
+
+    def reset(self):
+        self.seen = bytearray(self.game.world.n ** 2)
+
+    def state(self) -> int:
+        w = self.game.world
+        a = self.game.agent
+        cell = (a.y - 1) * w.n + (a.x - 1)
+        self.seen[cell] = 1
+        nxt = self.step_table[cell][a.dir]
+        ahead = AHEAD_WALL if nxt < 0 else AHEAD_SEEN if self.seen[nxt] else AHEAD_NEW
+        flags = a.has_gold * HAS_GOLD | a.arrow_available * ARROW
+        s = (cell * 4 + a.dir) * PERCEPT_BITS + (w.percept_codes[cell] & (PERCEPT_BITS - 1))
+        return (s * FLAG_STATES + flags) * 3 + ahead
+
+    def step(self) -> bool:
+        game = self.game
+        if game.terminal:
+            return False
+        row = self.q[self.state()]
+        if self.epsilon and self.rng.random() < self.epsilon:
+            action = self.rng.choice([i for i, v in enumerate(row) if v > -math.inf])
+        else:
+            action = int(row.argmax())
+        game.apply(ACTIONS[action])
+        return True
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train a tabular Q-learning policy on VecEnv.")
+    parser.add_argument("path", help="where to save the Q-table (.npy)")
+    parser.add_argument("--steps", type=int, default=5_000_000, help="environment steps, summed over games")
+    parser.add_argument("--envs", type=int, default=256, help="games stepped in lockstep")
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="board side length")
+    parser.add_argument("--pit-prob", type=float, default=CELL_PIT_PROB)
+    parser.add_argument("--pit-count", type=int, default=None)
+    parser.add_argument("--max-steps", type=int, default=None)
+    parser.add_argument("--replay", type=int, default=1 << 20, help="replay ring capacity in transitions")
+    parser.add_argument("--batch", type=int, default=1024)
+    parser.add_argument("--updates", type=int, default=1, help="minibatch updates per lockstep round")
+    parser.add_argument("--gamma", type=float, default=0.99)
+    parser.add_argument("--lr", type=float, default=0.1)
+    parser.add_argument("--schedule", choices=["linear", "exp"], default="linear", help="epsilon decay")
+    parser.add_argument("--eps-start", type=float, default=1.0)
+    parser.add_argument("--eps-end", type=float, default=0.05)
+    parser.add_argument("--eps-steps", type=int, default=None,
+                        help="linear: steps to reach --eps-end; exp: half-life (default: half / a tenth of --steps)")
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between progress lines (0 = off)")
+    parser.add_argument("--eval", type=int, default=2000, help="greedy headless episodes after training (0 = none)")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+    try:
+        check_board(args.size, args.pit_prob, args.pit_count)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.schedule == "linear":
+        epsilon = LinearSchedule(args.eps_start, args.eps_end, args.eps_steps or args.steps // 2)
+    else:
+        epsilon = ExponentialSchedule(args.eps_start, args.eps_end, args.eps_steps or args.steps // 10)
+    trainer = Trainer(args.envs, args.size, args.pit_prob, args.pit_count, args.max_steps, args.replay, args.batch,
+                      args.updates, args.gamma, args.lr, epsilon, args.seed)
+    print(trainer.train(args.steps, args.report).format())
+    np.save(args.path, trainer.q)
+    if args.eval:
+        world_cls = partial(World, n=args.size, pit_prob=args.pit_prob, pit_count=args.pit_count)
+        report = run_batch(args.eval, args.max_steps, seed=args.seed or 0, world_cls=world_cls,
+                           agent_cls=partial(QAgent, q=trainer.q))
+        print(format_summary(report.summary()))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
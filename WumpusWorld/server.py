@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from engine import BREEZE, STENCH, GLITTER, BUMP, SCREAM, CELL_PIT_PROB, GRID_SIZE, Game, Percepts, World, check_board
+
+# Line-delimited JSON, one object per line each way. A request is
+#   {"op": OP, "session": k, "id": any, "seed": s}
+# where OP is an action letter (F L R G S C D, as in Game.actions) or one of "reset",
+# "state", "stats", "close". "session" (default 0) picks one of the connection's games, so
+# one socket can multiplex many; "seed" is only read by reset. Every reply echoes "id" and
+# carries the game state (percept bits as in engine.BREEZE...SCREAM), or "error".
+ACTIONS = {"F": "move_forward", "L": "turn_left", "R": "turn_right", "G": "grab", "S": "shoot",
+           "C": "climb", "D": "release"}
+LATENCY_WINDOW = 100_000
+
+
+def percept_code(p: Percepts) -> int:
+    return p.breeze * BREEZE | p.stench * STENCH | p.glitter * GLITTER | p.bump * BUMP | p.scream * SCREAM
+
+
+class Stats:
+    def __init__(self):
+        self.sessions = 0
+        self.connections = 0
+        self.requests = 0
+        self.actions = 0
+        self.errors = 0
+        self.t0 = time.perf_counter()
+        self.last = (self.t0, 0)
+        # seconds from a request's bytes arriving to its reply being handed to the socket
+        self.latency: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+
+    def report(self) -> Dict[str, object]:
+        now = time.perf_counter()
+        t, actions = self.last
+        self.last = (now, self.actions)
+        lat = sorted(self.latency)
+        k = len(lat)
+        pct = lambda q: 1e6 * lat[min(k - 1, int(k * q))] if k else 0.0
+        return {
+            "sessions": self.sessions,
+            "connections": self.connections,
+            "requests": self.requests,
+            "actions": self.actions,
+            "errors": self.errors,
+            "actions_per_s": (self.actions - actions) / (now - t) if now > t else 0.0,
+            "latency_us": {"p50": pct(0.5), "p90": pct(0.9), "p99": pct(0.99), "max": pct(1.0)},
+        }
+
+
+def format_stats(s: Dict[str, object]) -> str:
+    lat = s["latency_us"]
+    return (f"sessions: {s['sessions']}  connections: {s['connections']}  actions/s: {s['actions_per_s']:.0f}  "
+            f"latency us: p50={lat['p50']:.0f} p90={lat['p90']:.0f} p99={lat['p99']:.0f} max={lat['max']:.0f}")
+
+
+class WumpusServer:
+    """Serves one Game per session over a local socket, to agents in other processes.
+
+    Every request already buffered on a connection is answered before the replies are
+    written out together, with one write and one drain per batch, so a client that
+    pipelines requests pays one syscall per batch rather than one per action.
+    """
+
+    def __init__(self, n: int = GRID_SIZE, pit_prob: float = CELL_PIT_PROB, pit_count: Optional[int] = None):
+        self.n = n
+        self.pit_prob = pit_prob
+        self.pit_count = pit_count
+        self.stats = Stats()
+        self.next_seed = 0
+
+    def state(self, game: Game, p: Percepts) -> Dict[str, object]:
+        a = game.agent
+        return {"percept": percept_code(p), "score": game.score, "terminal": game.terminal, "x": a.x, "y": a.y,
+                "dir": a.dir, "has_gold": a.has_gold, "arrow": a.arrow_available, "alive": a.alive}
+
+    def reset(self, game: Game, seed: Optional[int]):
+        if seed is None:
+            seed = self.next_seed
+            self.next_seed += 1
+        game.rng.seed(2 * seed)
+        game.reset()
+
+    def dispatch(self, sessions: Dict[object, Game], req: Dict) -> Dict[str, object]:
+        op = req.get("op")
+        key = req.get("session", 0)
+        if op == "stats":
+            return self.stats.report()
+        if op == "close":
+            if sessions.pop(key, None) is not None:
+                self.stats.sessions -= 1
+            return {"closed": key}
+        game = sessions.get(key)
+        if game is None:
+            game = sessions[key] = Game(world=World(n=self.n, pit_prob=self.pit_prob, pit_count=self.pit_count))
+            self.stats.sessions += 1
+            self.reset(game, req.get("seed"))
+        method = ACTIONS.get(op)
+        if method is not None:
+            self.stats.actions += 1
+            return self.state(game, getattr(game, method)())
+        if op == "reset":
+            self.reset(game, req.get("seed"))
+        elif op != "state":
+            raise ValueError(f"unknown op {op!r}")
+        return self.state(game, game.percepts())
+
+    def answer(self, sessions: Dict[object, Game], line: bytes) -> bytes:
+        rid = None
+        try:
+            req = json.loads(line)
+            rid = req.get("id")
+            reply = self.dispatch(sessions, req)
+        except (ValueError, AttributeError, TypeError) as e:
+            self.stats.errors += 1
+            reply = {"error": str(e)}
+        reply["id"] = rid
+        return json.dumps(reply, separators=(",", ":")).encode() + b"\n"
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        sessions: Dict[object, Game] = {}
+        stats = self.stats
+        stats.connections += 1
+        clock = time.perf_counter
+        pending = b""
+        try:
+            while True:
+                data = await reader.read(1 << 16)
+                if not data:
+                    break
+                t0 = clock()
+                *lines, pending = (pending + data).split(b"\n")
+                out = [self.answer(sessions, line) for line in lines if line.strip()]
+                if not out:
+                    continue
+                writer.write(b"".join(out))
+                stats.requests += len(out)
+                dt = clock() - t0
+                stats.latency.extend([dt] * len(out))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            stats.connections -= 1
+            stats.sessions -= len(sessions)
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 7878, unix: Optional[str] = None,
+                    report: float = 0.0):
+        if unix:
+            server = await asyncio.start_unix_server(self.handle, path=unix)
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            if report <= 0:
+                await server.serve_forever()
+            while True:
+                await asyncio.sleep(report)
+                print(format_stats(self.stats.report()), flush=True)
+
+
+class Client:
+    # A connection that pipelines requests; replies are matched to callers by id.
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.next_id = 0
+        self.task = asyncio.ensure_future(self.read_loop())
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 7878, unix: Optional[str] = None) -> "Client":
+        if unix:
+            reader, writer = await asyncio.open_unix_connection(unix)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def read_loop(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            reply = json.loads(line)
+            fut = self.pending.pop(reply.get("id"), None)
+            if fut is not None and not fut.done():
+                fut.set_result(reply)
+
+    async def call(self, **req) -> Dict[str, object]:
+        rid = self.next_id
+        self.next_id += 1
+        req["id"] = rid
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[rid] = fut
+        self.writer.write(json.dumps(req, separators=(",", ":")).encode() + b"\n")
+        return await fut
+
+    async def close(self):
+        self.writer.close()
+        self.task.cancel()
+
+
+async def load_test(sessions: int = 1000, connections: int = 50, episodes: int = 5, max_steps: int = 100,
+                    host: str = "127.0.0.1", port: int = 7878, unix: Optional[str] = None,
+                    seed: int = 0) -> Dict[str, object]:
+    # Stand-in agents: each session plays random actions, its connection shared with others.
+    clients = [await Client.connect(host, port, unix) for _ in range(connections)]
+    rtt: List[float] = []
+    actions = 0
+    clock = time.perf_counter
+
+    async def play(k: int):
+        nonlocal actions
+        client = clients[k % connections]
+        rng = random.Random(seed + k)
+        for e in range(episodes):
+            t0 = clock()
+            reply = await client.call(op="reset", session=k, seed=(seed + k) * episodes + e)
+            rtt.append(clock() - t0)
+            steps = 0
+            while not reply["terminal"] and steps < max_steps:
+                t0 = clock()
+                reply = await client.call(op=rng.choice("FFFLRGSC"), session=k)
+                rtt.append(clock() - t0)
+                actions += 1
+                steps += 1
+
+    t0 = clock()
+    await asyncio.gather(*(play(k) for k in range(sessions)))
+    elapsed = clock() - t0
+    server = await clients[0].call(op="stats")
+    for c in clients:
+        await c.close()
+    rtt.sort()
+    k = len(rtt)
+    return {
+        "sessions": sessions,
+        "requests": k,
+        "elapsed_s": elapsed,
+        "actions_per_s": actions / elapsed if elapsed else 0.0,
+        "rtt_us": {q: 1e6 * rtt[min(k - 1, int(k * p))] for q, p in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99))},
+        "server": server,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Serve Wumpus World sessions over line-delimited JSON.")
+    parser.add_argument("mode", choices=["serve", "load"], help="run the server, or the load-test client")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7878)
+    parser.add_argument("--unix", metavar="PATH", default=None, help="use a Unix socket instead of TCP")
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="board side length")
+    parser.add_argument("--pit-prob", type=float, default=CELL_PIT_PROB)
+    parser.add_argument("--pit-count", type=int, default=None)
+    parser.add_argument("--report", type=float, default=5.0, help="seconds between server stats lines (0 = off)")
+    parser.add_argument("--sessions", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--episodes", type=int, default=5, help="episodes per load-test session")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    try:
+        check_board(args.size, args.pit_prob, args.pit_count)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.mode == "serve":
+        server = WumpusServer(args.size, args.pit_prob, args.pit_count)
+        try:
+            asyncio.run(server.serve(args.host, args.port, args.unix, args.report))
+        except KeyboardInterrupt:
+            pass
+        return
+    r = asyncio.run(load_test(args.sessions, args.connections, args.episodes, host=args.host, port=args.port,
+                              unix=args.unix, seed=args.seed))
+    rtt = r["rtt_us"]
+    print(f"sessions: {r['sessions']}  requests: {r['requests']}  time: {r['elapsed_s']:.2f}s  "
+          f"actions/s: {r['actions_per_s']:.0f}")
+    print(f"round trip us: p50={rtt['p50']:.0f} p90={rtt['p90']:.0f} p99={rtt['p99']:.0f}")
+    print("server: " + format_stats(r["server"]))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
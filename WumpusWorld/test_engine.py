@@ -0,0 +1,38 @@
+import random
+
+from engine import Game, World
+
+
+def state(game: Game):
+    a = game.agent
+    w = game.world
+    return (a.x, a.y, a.dir, a.has_gold, a.arrow_available, a.alive, game.score, game.terminal, w.wumpus_alive,
+            w.gold, list(w.percept_codes), bytes(game.actions), game.state_hash)
+
+
+def test_undo_restore_and_hash_agree_with_replay():
+    rng = random.Random(0)
+    game = Game(world=World(n=4), rng=rng)
+    for _ in range(3000):
+        game.reset()
+        history = [state(game)]
+        snaps = [game.snapshot()]
+        while not game.terminal and len(history) <= 40:
+            game.apply(rng.choice(b"FFFFLRGSCD"))
+            h = game.state_hash
+            game.rehash()
+            # the incremental hash is the hash of the position, however it was reached
+            assert game.state_hash == h, bytes(game.actions)
+            history.append(state(game))
+            snaps.append(game.snapshot())
+        actions = bytes(game.actions)
+        for t in range(len(history) - 2, -1, -1):
+            assert game.undo()
+            assert state(game) == history[t], (actions, t)
+        assert not game.undo()
+        for b in actions:
+            game.apply(b)
+        assert state(game) == history[-1], actions
+        t = rng.randrange(len(snaps))
+        game.restore(snaps[t])
+        assert state(game) == history[t], (actions, t)
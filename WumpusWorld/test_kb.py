@@ -0,0 +1,48 @@
+from engine import Agent, Game, World, cell_index
+from headless import play_episode, seed_episode
+from kb import KnowledgeBase
+
+
+class CheckedAgent(Agent):
+    # the rule-based agent, with a KnowledgeBase told the same percepts alongside it
+    def reset(self):
+        super().reset()
+        self.kb = KnowledgeBase(self.game.world.n)
+        self.steps = 0
+
+    def update_knowledge(self, p, x, y):
+        super().update_knowledge(p, x, y)
+        kb = self.kb
+        world = self.game.world
+        if kb.alive and not world.wumpus_alive:
+            kb.kill()
+        kb.tell((y - 1) * kb.n + (x - 1), p.breeze, p.stench and world.wumpus_alive)
+        self.steps += 1
+        xy = lambda i: (i % kb.n + 1, i // kb.n + 1)
+        kb_safe = {xy(i) for i in kb.safe}
+        for c in kb_safe:
+            assert c not in world.pits, (c, world.pits, world.wumpus)
+            assert not (world.wumpus_alive and c == world.wumpus), (c, world.pits, world.wumpus)
+        layout = (world.pits, world.wumpus)
+        for i in range(kb.cells):
+            # every derived literal holds in the true layout; a dead Wumpus is no hazard
+            if kb.val[i] is not None:
+                assert kb.val[i] == (xy(i) in world.pits), (xy(i), kb.val[i], layout)
+            w = kb.val[kb.cells + i]
+            if w:
+                assert xy(i) == world.wumpus and world.wumpus_alive, (xy(i), layout)
+            elif w is False:
+                assert not (world.wumpus_alive and xy(i) == world.wumpus), (xy(i), layout)
+        if kb.wumpus is not None:
+            assert xy(kb.wumpus) == world.wumpus, (xy(kb.wumpus), layout)
+        if kb.cand is not None and world.wumpus_alive:
+            assert cell_index(*world.wumpus, kb.n) in kb.cand, (kb.cand, layout)
+        assert self.safe <= kb_safe | {(1, 1)}, (self.safe - kb_safe, world.pits, world.wumpus)
+
+
+def test_kb_agrees_with_rules_on_replayed_trajectories():
+    game = Game(world=World(n=4))
+    agent = CheckedAgent(game)
+    for e in range(3000):
+        seed_episode(game, agent, e)
+        play_episode(game, agent, 128)
@@ -0,0 +1,30 @@
+import time
+
+from engine import Game, World
+from headless import play_episode, seed_episode
+from planner import PlannerAgent
+
+
+def test_decisions_stay_within_budget():
+    budget = 0.005
+    game = Game(world=World(n=16, pit_prob=0.1))
+    agent = PlannerAgent(game, budget=budget)
+    decide = agent.decide
+    times = []
+
+    def timed():
+        t0 = time.perf_counter()
+        plan = decide()
+        times.append(time.perf_counter() - t0)
+        return plan
+
+    agent.decide = timed
+    for e in range(100):
+        seed_episode(game, agent, e)
+        play_episode(game, agent, 2000)
+    assert len(times) > 50
+    # a decision may overrun by the one rollout step or sampled world it was on; the
+    # maximum also leaves room for a stray pause of the test process
+    times.sort()
+    assert times[len(times) * 9 // 10] < budget + 0.001, times[-5:]
+    assert times[-1] < 2 * budget, times[-5:]
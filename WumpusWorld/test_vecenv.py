@@ -0,0 +1,42 @@
+import random
+
+import numpy as np
+
+from engine import PERCEPTS, Game, World, cell_index
+from vecenv import ACTIONS, ARROW, HAS_GOLD, OBS_CELL, OBS_DIR, OBS_FLAGS, OBS_PERCEPT, VecEnv
+
+
+def test_vecenv_matches_game_on_random_layouts():
+    k = 2000
+    rng = random.Random(0)
+    games = []
+    for _ in range(k):
+        game = Game(world=World(n=4), rng=rng)
+        game.reset()
+        games.append(game)
+    env = VecEnv(k, n=4, max_steps=1 << 20, seed=0)
+    env.load_layouts([game.start_layout for game in games])
+    # mostly moves, so games get somewhere before they end
+    moves = [ACTIONS.index(b) for b in b"FFFFLRGSCD"]
+    live = np.ones(k, dtype=bool)
+    for _ in range(64):
+        actions = np.array([rng.choice(moves) for _ in range(k)])
+        obs, reward, done, _ = env.step(actions)
+        for i in np.flatnonzero(live):
+            game = games[i]
+            before = game.score
+            p = game.apply(ACTIONS[actions[i]])
+            assert reward[i] == game.score - before, (i, game.actions)
+            assert done[i] == game.terminal, (i, game.actions)
+            if game.terminal:
+                # VecEnv has already moved this slot on to a new world
+                live[i] = False
+                continue
+            a = game.agent
+            assert obs[i, OBS_PERCEPT] == PERCEPTS.index(p), (i, game.actions)
+            assert obs[i, OBS_CELL] == cell_index(a.x, a.y, 4), (i, game.actions)
+            assert obs[i, OBS_DIR] == a.dir, (i, game.actions)
+            assert obs[i, OBS_FLAGS] == a.has_gold * HAS_GOLD | a.arrow_available * ARROW, (i, game.actions)
+        if not live.any():
+            break
+    assert not live.all()
@@ -0,0 +1,170 @@
+import os
+import struct
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+
+from bitboard import grid
+from engine import BREEZE, STENCH, GLITTER, BUMP, SCREAM, FORWARD, SHOOT, Game, Layout, cell_index, cell_xy
+from headless import OUTCOMES, classify
+from replay import ALIVE, ARROW, CELL_MASK, GOLD_SHIFT, HAS_GOLD, WUMPUS_ALIVE, Recording, Replay, record
+
+# Two append-only files per trace, each starting with a 16-byte header (magic, version, n):
+#   PREFIX.worlds  one WORLD record per finished episode
+#   PREFIX.steps   one STEP record per action, the state right after it
+MAGIC_WORLDS = b"WWTW"
+MAGIC_STEPS = b"WWTS"
+VERSION = 1
+HEADER = struct.Struct("<4sHH8x")
+
+STEP = np.dtype([("episode", "<u4"), ("cell", "<u2"), ("score", "<i4"), ("action", "u1"),
+                 ("percept", "u1"), ("dir", "u1"), ("flags", "u1")])
+# STEP flags, the agent's state after the action
+F_HAS_GOLD, F_ARROW, F_ALIVE, F_WUMPUS_ALIVE = 1, 2, 4, 8
+
+
+def world_dtype(n: int) -> np.dtype:
+    # pits are packed into bits, cell index order, by np.packbits
+    return np.dtype([("first_step", "<u8"), ("steps", "<u4"), ("score", "<i4"), ("outcome", "u1"),
+                     ("wumpus", "<i4"), ("gold", "<i4"), ("pits", "u1", ((n * n + 7) // 8,))])
+
+
+def open_part(path: str, magic: bytes, n: int):
+    if os.path.exists(path) and os.path.getsize(path) >= HEADER.size:
+        with open(path, "rb") as f:
+            got, version, got_n = HEADER.unpack(f.read(HEADER.size))
+        if got != magic or version != VERSION or got_n != n:
+            raise ValueError(f"{path} is not a version {VERSION} trace for n={n}")
+        return open(path, "ab")
+    f = open(path, "wb")
+    f.write(HEADER.pack(magic, VERSION, n))
+    return f
+
+
+class TraceWriter:
+    def __init__(self, prefix: str, n: int):
+        self.n = n
+        self.world_dtype = world_dtype(n)
+        self.worlds = open_part(prefix + ".worlds", MAGIC_WORLDS, n)
+        self.steps = open_part(prefix + ".steps", MAGIC_STEPS, n)
+        self.episodes = (self.worlds.tell() - HEADER.size) // self.world_dtype.itemsize
+        self.step_count = (self.steps.tell() - HEADER.size) // STEP.itemsize
+        self.step_table = np.array(grid(n).step, dtype=np.int64)
+
+    def write_episode(self, game: Game, outcome: Optional[str] = None):
+        self.write(record(game), game.score, classify(game) if outcome is None else outcome)
+
+    def write(self, rec: Recording, score: int, outcome: str):
+        n = self.n
+        cells = n * n
+        rp = Replay(rec)
+        k = len(rp)
+        s = np.frombuffer(rp.states, dtype=np.int64)
+        prev, s = s[:-1], s[1:]
+        cell = s & CELL_MASK
+        actions = np.frombuffer(rec.actions[:k], dtype=np.uint8)
+        pits, wumpus, gold = rec.layout
+        pit_mask = np.zeros(cells, dtype=bool)
+        for x, y in pits:
+            pit_mask[cell_index(x, y, n)] = True
+        w = cell_index(*wumpus, n) if wumpus else -1
+        g = cell_index(*gold, n) if gold else -1
+        # percepts after each action, rebuilt from the layout and the replayed state
+        step = self.step_table
+        breeze = np.zeros(cells + 1, dtype=bool)
+        padded = np.append(pit_mask, False)
+        breeze[:cells] = padded[np.where(step < 0, cells, step)].any(axis=1)
+        near_w = np.zeros(cells, dtype=bool)
+        if w >= 0:
+            near_w[step[w][step[w] >= 0]] = True
+        gold_at = (s >> GOLD_SHIFT) - 1
+        percept = (breeze[cell] * BREEZE
+                   | (near_w[cell] & (s & WUMPUS_ALIVE).astype(bool)) * STENCH
+                   | (gold_at == cell) * GLITTER
+                   | ((actions == FORWARD) & (cell == (prev & CELL_MASK))) * BUMP
+                   | ((actions == SHOOT) & ((prev ^ s) & WUMPUS_ALIVE).astype(bool)) * SCREAM)
+        out = np.empty(k, dtype=STEP)
+        out["episode"] = self.episodes
+        out["cell"] = cell
+        out["score"] = np.frombuffer(rp.scores, dtype=np.int64)[1:]
+        out["action"] = actions
+        out["percept"] = percept
+        out["dir"] = (s >> 16) & 3
+        out["flags"] = (((s & HAS_GOLD) != 0) * F_HAS_GOLD | ((s & ARROW) != 0) * F_ARROW
+                        | ((s & ALIVE) != 0) * F_ALIVE | ((s & WUMPUS_ALIVE) != 0) * F_WUMPUS_ALIVE)
+        self.steps.write(out.tobytes())
+        world = np.zeros(1, dtype=self.world_dtype)
+        world["first_step"] = self.step_count
+        world["steps"] = k
+        world["score"] = score
+        world["outcome"] = OUTCOMES.index(outcome)
+        world["wumpus"] = w
+        world["gold"] = g
+        world["pits"] = np.packbits(pit_mask, bitorder="little")
+        self.worlds.write(world.tobytes())
+        self.step_count += k
+        self.episodes += 1
+
+    def close(self):
+        self.steps.close()
+        self.worlds.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    # Memory-maps both files; the fields of `worlds` and `steps` are NumPy views that only
+    # page in the parts that are touched. Steps past the last world record (an episode that
+    # was still being written) are ignored.
+    def __init__(self, prefix: str):
+        with open(prefix + ".worlds", "rb") as f:
+            magic, version, n = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC_WORLDS or version != VERSION:
+            raise ValueError(f"{prefix}.worlds is not a version {VERSION} trace")
+        self.n = n
+        wd = world_dtype(n)
+        count = (os.path.getsize(prefix + ".worlds") - HEADER.size) // wd.itemsize
+        self.worlds = np.memmap(prefix + ".worlds", dtype=wd, mode="r", offset=HEADER.size, shape=(count,))
+        used = int(self.worlds["first_step"][-1] + self.worlds["steps"][-1]) if count else 0
+        self.steps = np.memmap(prefix + ".steps", dtype=STEP, mode="r", offset=HEADER.size, shape=(used,))
+
+    def __len__(self) -> int:
+        return len(self.worlds)
+
+    def layout(self, i: int) -> Layout:
+        n = self.n
+        w = self.worlds[i]
+        bits = np.unpackbits(w["pits"], bitorder="little")[:n * n]
+        pits = {cell_xy(int(c), n) for c in np.flatnonzero(bits)}
+        wumpus = cell_xy(int(w["wumpus"]), n) if w["wumpus"] >= 0 else None
+        gold = cell_xy(int(w["gold"]), n) if w["gold"] >= 0 else None
+        return pits, wumpus, gold
+
+    def episode(self, i: int) -> np.ndarray:
+        w = self.worlds[i]
+        start = int(w["first_step"])
+        return self.steps[start:start + int(w["steps"])]
+
+    def recording(self, i: int) -> Recording:
+        return Recording(self.n, self.layout(i), self.episode(i)["action"].tobytes())
+
+    def chunks(self, rows: int = 1 << 22) -> Iterator[np.ndarray]:
+        for start in range(0, len(self.steps), rows):
+            yield self.steps[start:start + rows]
+
+    def death_cells(self, outcome: Optional[str] = None) -> np.ndarray:
+        # (n, n) counts of deaths by cell, row y - 1 and column x - 1; only the last step of
+        # each dying episode is read
+        codes = [OUTCOMES.index(o) for o in ((outcome,) if outcome else ("pit", "wumpus"))]
+        dead = np.isin(self.worlds["outcome"], codes)
+        last = (self.worlds["first_step"][dead] + self.worlds["steps"][dead] - 1).astype(np.int64)
+        counts = np.bincount(self.steps["cell"][last], minlength=self.n * self.n)
+        return counts.reshape(self.n, self.n)
+
+    def outcome_counts(self) -> Tuple[Tuple[str, int], ...]:
+        counts = np.bincount(self.worlds["outcome"], minlength=len(OUTCOMES))
+        return tuple(zip(OUTCOMES, counts.tolist()))
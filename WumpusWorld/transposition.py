@@ -0,0 +1,143 @@
+import random
+import sys
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Tuple
+
+from engine import Agent, Game
+
+Cell = Tuple[int, int]
+
+
+def entry_bytes(key: Tuple, value) -> int:
+    # what an entry keeps alive: the key tuple and its ints, the value and its items, and
+    # the OrderedDict's link node and slot (about 100 bytes)
+    size = sys.getsizeof(key) + sum(sys.getsizeof(k) for k in key) + sys.getsizeof(value) + 100
+    if isinstance(value, list):
+        size += sum(sys.getsizeof(v) for v in value)
+    return size
+
+
+class TranspositionCache:
+    """Bounded LRU map from knowledge states to decisions, shared by every episode it sees.
+
+    Keys are canonical: each set of cells is folded into a bitmask, so two episodes that
+    learnt the same facts in a different order map to the same entry. The bound is on the
+    estimated bytes held, not the entry count, so memory stays flat on long runs however
+    large the entries on a given board size are.
+    """
+
+    def __init__(self, max_bytes: int = 64 << 20):
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.sizes: Dict[Hashable, int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable):
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return value
+
+    def put(self, key: Tuple, value):
+        if key in self.entries:
+            return
+        size = entry_bytes(key, value)
+        self.entries[key] = value
+        self.sizes[key] = size
+        self.bytes += size
+        while self.bytes > self.max_bytes and self.entries:
+            old, _ = self.entries.popitem(last=False)
+            self.bytes -= self.sizes.pop(old)
+            self.evictions += 1
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self) -> Dict[str, object]:
+        return {"entries": len(self.entries), "bytes": self.bytes, "hits": self.hits, "misses": self.misses,
+                "hit_rate": self.hit_rate(), "evictions": self.evictions}
+
+    def format(self) -> str:
+        s = self.summary()
+        return (f"tcache: entries={s['entries']} memory={s['bytes'] / 1e6:.1f}MB hit rate={s['hit_rate']:.2%} "
+                f"hits={s['hits']} misses={s['misses']} evictions={s['evictions']}")
+
+
+class CellSet(set):
+    # a set of cells that keeps its bitmask up to date as cells are added, so a key costs
+    # nothing to build however large the set has grown
+    __slots__ = ("n", "mask")
+
+    def __init__(self, n: int, cells=()):
+        super().__init__()
+        self.n = n
+        self.mask = 0
+        for c in cells:
+            self.add(c)
+
+    def add(self, c: Cell):
+        set.add(self, c)
+        self.mask |= 1 << ((c[1] - 1) * self.n + (c[0] - 1))
+
+    def discard(self, c: Cell):
+        set.discard(self, c)
+        self.mask &= ~(1 << ((c[1] - 1) * self.n + (c[0] - 1)))
+
+    def clear(self):
+        set.clear(self)
+        self.mask = 0
+
+
+class CachedAgent(Agent):
+    # Agent whose frontier plans and risk tables go through a TranspositionCache. Both are
+    # pure functions of the keyed state, so play is unchanged; only the work is shared.
+    def __init__(self, game: Game, rng: Optional[random.Random] = None, risk_model=None,
+                 cache: Optional[TranspositionCache] = None):
+        super().__init__(game, rng, risk_model)
+        self.cache = cache if cache is not None else TranspositionCache()
+        self.track()
+
+    def reset(self):
+        super().reset()
+        self.track()
+
+    def track(self):
+        n = self.game.world.n
+        for name in ("visited", "safe", "pits", "breeze_cells", "stench_cells"):
+            setattr(self, name, CellSet(n, getattr(self, name)))
+
+    def wumpus_key(self) -> int:
+        # the Wumpus only matters to planning while it lives
+        if self.wumpus_cell is None or not self.game.world.wumpus_alive:
+            return -1
+        x, y = self.wumpus_cell
+        return (y - 1) * self.game.world.n + (x - 1)
+
+    def pick_safe_frontier(self) -> List[str]:
+        a = self.game.agent
+        key = (0, self.game.world.n, a.x, a.y, a.dir, self.safe.mask, self.pits.mask, self.visited.mask,
+               self.wumpus_key())
+        path = self.cache.get(key)
+        if path is None:
+            path = super().pick_safe_frontier()
+            self.cache.put(key, path)
+        return list(path)
+
+    def best_adjacent_unknown(self, x: int, y: int) -> Optional[Cell]:
+        key = (1, self.game.world.n, x, y, self.safe.mask, self.pits.mask, self.visited.mask, self.breeze_cells.mask,
+               self.stench_cells.mask, self.wumpus_key(), self.game.world.wumpus_alive)
+        table = self.cache.get(key)
+        if table is None:
+            table = self.risk_table(x, y)
+            self.cache.put(key, table)
+        return table[0][1] if table else None
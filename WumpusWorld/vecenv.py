@@ -0,0 +1,185 @@
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from bitboard import grid
+from engine import (BREEZE, STENCH, GLITTER, BUMP, SCREAM, CELL_PIT_PROB, GRID_SIZE,
+                    FORWARD, LEFT, RIGHT, GRAB, SHOOT, CLIMB, RELEASE, Layout, cell_xy)
+from headless import default_max_steps
+from worldgen import generate_worlds
+
+# action ids used by VecEnv.step, in the order of the Game.actions bytes
+ACTIONS = bytes([FORWARD, LEFT, RIGHT, GRAB, SHOOT, CLIMB, RELEASE])
+A_FORWARD, A_LEFT, A_RIGHT, A_GRAB, A_SHOOT, A_CLIMB, A_RELEASE = range(len(ACTIONS))
+
+# observation columns: percept code (BREEZE | STENCH | ... as in engine.PERCEPTS), cell index,
+# heading, and HAS_GOLD | ARROW flags
+OBS_PERCEPT, OBS_CELL, OBS_DIR, OBS_FLAGS = range(4)
+HAS_GOLD, ARROW = 1, 2
+
+
+class VecEnv:
+    # K independent games stepped in lockstep with the Game rules applied to whole arrays.
+    # A game that ends is replaced by a fresh world before step returns; its final score is
+    # in info["final_score"] and the observation is the new game's first one.
+    def __init__(self, k: int, n: int = GRID_SIZE, pit_prob: float = CELL_PIT_PROB,
+                 pit_count: Optional[int] = None, max_steps: Optional[int] = None,
+                 seed: Optional[int] = None):
+        self.k = k
+        self.n = n
+        self.cells = n * n
+        self.pit_prob = pit_prob
+        self.pit_count = pit_count
+        self.max_steps = default_max_steps(n) if max_steps is None else max_steps
+        self.rng = np.random.default_rng(seed)
+        # step[c, d] is the cell reached from c heading d, -1 at the wall
+        self.step_table = np.array(grid(n).step, dtype=np.int32)
+        xy = np.array([cell_xy(i, n) for i in range(self.cells)], dtype=np.int32)
+        self.cx, self.cy = xy[:, 0], xy[:, 1]
+        self.rows = np.arange(k)
+        self.pits = np.zeros((k, self.cells), dtype=bool)
+        self.codes = np.zeros((k, self.cells), dtype=np.uint8)
+        self.wumpus = np.zeros(k, dtype=np.int32)
+        self.gold = np.zeros(k, dtype=np.int32)
+        self.cell = np.zeros(k, dtype=np.int32)
+        self.dir = np.zeros(k, dtype=np.int8)
+        self.has_gold = np.zeros(k, dtype=bool)
+        self.arrow = np.zeros(k, dtype=bool)
+        self.wumpus_alive = np.zeros(k, dtype=bool)
+        self.score = np.zeros(k, dtype=np.int64)
+        self.steps = np.zeros(k, dtype=np.int64)
+
+    def reset(self) -> np.ndarray:
+        self.reset_games(self.rows)
+        return self.observe(np.zeros(self.k, dtype=np.uint8))
+
+    def reset_games(self, idx: np.ndarray):
+        batch = generate_worlds(len(idx), self.rng, self.n, self.pit_prob, self.pit_count)
+        self.load(idx, batch.pits, batch.wumpus, batch.gold)
+
+    def load(self, idx: np.ndarray, pits: np.ndarray, wumpus: np.ndarray, gold: np.ndarray):
+        # pits is (len(idx), n*n) bool, wumpus and gold are cell indices (gold -1 for none)
+        self.pits[idx] = pits
+        self.wumpus[idx] = wumpus
+        self.gold[idx] = gold
+        self.cell[idx] = 0
+        self.dir[idx] = 0
+        self.has_gold[idx] = False
+        self.arrow[idx] = True
+        self.wumpus_alive[idx] = True
+        self.score[idx] = 0
+        self.steps[idx] = 0
+        # same percept table as World.rebuild_percepts, for every reset game at once
+        step = self.step_table
+        padded = np.zeros((len(idx), self.cells + 1), dtype=bool)
+        padded[:, :-1] = pits
+        breeze = padded[:, np.where(step < 0, self.cells, step)].any(axis=2)
+        codes = breeze.astype(np.uint8) * BREEZE
+        rows = np.arange(len(idx))
+        for d in range(4):
+            nb = step[wumpus, d]
+            ok = nb >= 0
+            codes[rows[ok], nb[ok]] |= STENCH
+        has = gold >= 0
+        codes[rows[has], gold[has]] |= GLITTER
+        self.codes[idx] = codes
+
+    def load_layouts(self, layouts):
+        # put explicit Layouts into games 0..len(layouts)-1, mainly for checking against Game
+        m = len(layouts)
+        pits = np.zeros((m, self.cells), dtype=bool)
+        wumpus = np.empty(m, dtype=np.int32)
+        gold = np.empty(m, dtype=np.int32)
+        n = self.n
+        for i, (p, w, g) in enumerate(layouts):
+            for x, y in p:
+                pits[i, (y - 1) * n + (x - 1)] = True
+            wumpus[i] = (w[1] - 1) * n + (w[0] - 1)
+            gold[i] = (g[1] - 1) * n + (g[0] - 1) if g else -1
+        self.load(np.arange(m), pits, wumpus, gold)
+        return self.observe(np.zeros(self.k, dtype=np.uint8))
+
+    def layout(self, i: int) -> Layout:
+        n = self.n
+        pits = {cell_xy(int(c), n) for c in np.flatnonzero(self.pits[i])}
+        gold = cell_xy(int(self.gold[i]), n) if self.gold[i] >= 0 else None
+        return pits, cell_xy(int(self.wumpus[i]), n), gold
+
+    def observe(self, extra: np.ndarray) -> np.ndarray:
+        obs = np.empty((self.k, 4), dtype=np.int32)
+        obs[:, OBS_PERCEPT] = self.codes[self.rows, self.cell] | extra
+        obs[:, OBS_CELL] = self.cell
+        obs[:, OBS_DIR] = self.dir
+        obs[:, OBS_FLAGS] = self.has_gold * HAS_GOLD | self.arrow * ARROW
+        return obs
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        actions = np.asarray(actions)
+        reward = np.full(self.k, -1, dtype=np.int64)
+        extra = np.zeros(self.k, dtype=np.uint8)
+        done = np.zeros(self.k, dtype=bool)
+
+        turn = actions == A_LEFT
+        self.dir[turn] = (self.dir[turn] + 1) & 3
+        turn = actions == A_RIGHT
+        self.dir[turn] = (self.dir[turn] - 1) & 3
+
+        f = np.flatnonzero(actions == A_FORWARD)
+        if len(f):
+            nc = self.step_table[self.cell[f], self.dir[f]]
+            wall = nc < 0
+            extra[f[wall]] |= BUMP
+            moved = f[~wall]
+            nc = nc[~wall]
+            self.cell[moved] = nc
+            dead = self.pits[moved, nc] | (self.wumpus_alive[moved] & (self.wumpus[moved] == nc))
+            died = moved[dead]
+            reward[died] -= 1000
+            done[died] = True
+
+        g = np.flatnonzero((actions == A_GRAB) & ~self.has_gold)
+        g = g[self.gold[g] == self.cell[g]]
+        self.has_gold[g] = True
+        self.codes[g, self.gold[g]] &= 0xFF ^ GLITTER
+        self.gold[g] = -1
+
+        r = np.flatnonzero((actions == A_RELEASE) & self.has_gold)
+        self.has_gold[r] = False
+        self.gold[r] = self.cell[r]
+        self.codes[r, self.cell[r]] |= GLITTER
+
+        s = np.flatnonzero((actions == A_SHOOT) & self.arrow)
+        if len(s):
+            self.arrow[s] = False
+            reward[s] -= 10
+            c, w, d = self.cell[s], self.wumpus[s], self.dir[s]
+            ax, ay, wx, wy = self.cx[c], self.cy[c], self.cx[w], self.cy[w]
+            hit = self.wumpus_alive[s] & (
+                ((d == 0) & (wy == ay) & (wx > ax)) | ((d == 1) & (wx == ax) & (wy > ay))
+                | ((d == 2) & (wy == ay) & (wx < ax)) | ((d == 3) & (wx == ax) & (wy < ay)))
+            killed = s[hit]
+            self.wumpus_alive[killed] = False
+            extra[killed] |= SCREAM
+            for dd in range(4):
+                nb = self.step_table[self.wumpus[killed], dd]
+                ok = nb >= 0
+                self.codes[killed[ok], nb[ok]] &= 0xFF ^ STENCH
+
+        c = np.flatnonzero((actions == A_CLIMB) & (self.cell == 0))
+        reward[c[self.has_gold[c]]] += 1000
+        done[c] = True
+
+        self.score += reward
+        self.steps += 1
+        truncated = ~done & (self.steps >= self.max_steps)
+        ended = done | truncated
+        final_score = np.where(ended, self.score, 0)
+        finished = np.flatnonzero(ended)
+        if len(finished):
+            self.reset_games(finished)
+            extra[finished] = 0
+        obs = self.observe(extra)
+        return obs, reward, ended, {"final_score": final_score, "truncated": truncated}
+
+    def __len__(self) -> int:
+        return self.k
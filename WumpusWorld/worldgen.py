@@ -0,0 +1,243 @@
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+import numpy as np
+
+from engine import GRID_SIZE, CELL_PIT_PROB, Layout, World, cell_xy
+
+
+@dataclass
+class WorldBatch:
+    n: int
+    pits: np.ndarray    # (k, n*n) bool, cell index = (y - 1) * n + (x - 1)
+    wumpus: np.ndarray  # (k,) cell index
+    gold: np.ndarray    # (k,) cell index
+    path: Optional[np.ndarray] = None  # (k,) justified path length to the gold, see justified_path
+
+    def __len__(self) -> int:
+        return self.pits.shape[0]
+
+    def layout(self, i: int) -> Layout:
+        n = self.n
+        pits = {cell_xy(int(c), n) for c in np.flatnonzero(self.pits[i])}
+        return pits, cell_xy(int(self.wumpus[i]), n), cell_xy(int(self.gold[i]), n)
+
+    def layouts(self) -> Iterator[Layout]:
+        for i in range(len(self)):
+            yield self.layout(i)
+
+    def world(self, i: int) -> World:
+        w = World(n=self.n)
+        w.load_layout(self.layout(i))
+        return w
+
+
+def generate_worlds(k: int, rng: Optional[np.random.Generator] = None, n: int = GRID_SIZE,
+                    pit_prob: float = CELL_PIT_PROB, pit_count: Optional[int] = None) -> WorldBatch:
+    # Same distribution as World.reset_random: every cell but the start is a pit with
+    # probability pit_prob (or exactly pit_count cells are), Wumpus and gold are uniform
+    # over the non-start cells.
+    if rng is None:
+        rng = np.random.default_rng()
+    cells = n * n
+    if pit_count is None:
+        pits = rng.random((k, cells), dtype=np.float32) < pit_prob
+        pits[:, 0] = False
+    else:
+        count = min(pit_count, cells - 1)
+        pits = np.zeros((k, cells), dtype=bool)
+        if count > 0:
+            keys = rng.random((k, cells - 1), dtype=np.float32)
+            chosen = np.argpartition(keys, count - 1, axis=1)[:, :count] + 1
+            np.put_along_axis(pits, chosen, True, axis=1)
+    wumpus = rng.integers(1, cells, size=k, dtype=np.int32)
+    gold = rng.integers(1, cells, size=k, dtype=np.int32)
+    return WorldBatch(n, pits, wumpus, gold)
+
+
+def near(mask: np.ndarray, n: int) -> np.ndarray:
+    # (k, n*n) bool: cells with at least one marked neighbour
+    m = mask.reshape(-1, n, n)
+    out = np.zeros_like(m)
+    out[:, 1:, :] |= m[:, :-1, :]
+    out[:, :-1, :] |= m[:, 1:, :]
+    out[:, :, 1:] |= m[:, :, :-1]
+    out[:, :, :-1] |= m[:, :, 1:]
+    return out.reshape(mask.shape)
+
+
+class BitNear:
+    # near() on one uint64 mask per world, for boards of up to 64 cells
+    def __init__(self, n: int):
+        full = (1 << (n * n)) - 1
+        first = sum(1 << (y * n) for y in range(n))
+        self.full = np.uint64(full)
+        self.no_first = np.uint64(full ^ first)
+        self.no_last = np.uint64(full ^ (first << (n - 1)))
+        self.one = np.uint64(1)
+        self.row = np.uint64(n)
+
+    def __call__(self, m: np.ndarray) -> np.ndarray:
+        return (((m & self.no_last) << self.one) | ((m & self.no_first) >> self.one)
+                | ((m << self.row) & self.full) | (m >> self.row))
+
+
+def pack_cells(mask: np.ndarray) -> np.ndarray:
+    # (k, cells <= 64) bool -> (k,) uint64, cell i in bit i
+    k, cells = mask.shape
+    packed = np.zeros((k, 8), dtype=np.uint8)
+    packed[:, :(cells + 7) // 8] = np.packbits(mask, axis=1, bitorder="little")
+    return packed.view(np.uint64)[:, 0]
+
+
+def justified_path(batch: WorldBatch) -> np.ndarray:
+    """Moves from the start to the gold through cells the percepts prove safe, -1 if none.
+
+    A cell with neither breeze nor stench proves its neighbours free of pits and of the
+    Wumpus, so the agent can always step out of it. The proven region grows one ring per
+    round from the start cell, all worlds at once, and a world's path length is the round
+    in which its gold cell joins. Gold in a pit or on the Wumpus never joins.
+    """
+    n = batch.n
+    if n * n <= 64:
+        return justified_path_bits(batch)
+    if n <= 64:
+        return justified_path_rows(batch)
+    k = len(batch)
+    rows = np.arange(k)
+    wumpus = np.zeros_like(batch.pits)
+    wumpus[rows, batch.wumpus] = True
+    quiet = ~(near(batch.pits, n) | near(wumpus, n))
+    region = np.zeros_like(batch.pits)
+    region[:, 0] = True
+    grown = region.copy()
+    path = np.full(k, -1, dtype=np.int32)
+    live = rows
+    for t in range(1, n * n):
+        # only the ring added last round can add new cells
+        ring = near(grown[live] & quiet[live], n) & ~region[live]
+        region[live] |= ring
+        grown[live] = ring
+        found = ring[np.arange(len(live)), batch.gold[live]]
+        path[live[found]] = t
+        live = live[~found & ring.any(axis=1)]
+        if not len(live):
+            break
+    return path
+
+
+def justified_path_bits(batch: WorldBatch) -> np.ndarray:
+    # justified_path with each world's board in one uint64
+    n = batch.n
+    near_bits = BitNear(n)
+    one = np.uint64(1)
+    wumpus = one << batch.wumpus.astype(np.uint64)
+    gold = one << batch.gold.astype(np.uint64)
+    quiet = ~(near_bits(pack_cells(batch.pits)) | near_bits(wumpus))
+    region = np.ones(len(batch), dtype=np.uint64)
+    grown = region.copy()
+    path = np.full(len(batch), -1, dtype=np.int32)
+    live = np.arange(len(batch))
+    for t in range(1, n * n):
+        ring = near_bits(grown & quiet) & ~region
+        region |= ring
+        grown = ring
+        found = (ring & gold[live]) != 0
+        path[live[found]] = t
+        keep = ~found & (ring != 0)
+        live = live[keep]
+        if not len(live):
+            break
+        region, grown, quiet = region[keep], grown[keep], quiet[keep]
+    return path
+
+
+def justified_path_rows(batch: WorldBatch) -> np.ndarray:
+    # justified_path with each board row in one uint64, for boards up to 64 wide
+    n = batch.n
+    k = len(batch)
+    one = np.uint64(1)
+    full = np.uint64((1 << n) - 1)
+
+    def near_rows(m: np.ndarray) -> np.ndarray:
+        out = ((m << one) & full) | (m >> one)
+        out[:, 1:] |= m[:, :-1]
+        out[:, :-1] |= m[:, 1:]
+        return out
+
+    packed = np.zeros((k, n, 8), dtype=np.uint8)
+    packed[:, :, :(n + 7) // 8] = np.packbits(batch.pits.reshape(k, n, n), axis=2, bitorder="little")
+    pits = packed.view(np.uint64)[:, :, 0]
+    rows = np.arange(k)
+    wumpus = np.zeros((k, n), dtype=np.uint64)
+    wumpus[rows, batch.wumpus // n] = one << (batch.wumpus % n).astype(np.uint64)
+    gy = batch.gold // n
+    gx = (batch.gold % n).astype(np.uint64)
+    quiet = ~(near_rows(pits) | near_rows(wumpus))
+    region = np.zeros((k, n), dtype=np.uint64)
+    region[:, 0] = one
+    grown = region.copy()
+    path = np.full(k, -1, dtype=np.int32)
+    live = rows
+    for t in range(1, n * n):
+        ring = near_rows(grown & quiet) & ~region
+        region |= ring
+        grown = ring
+        found = (ring[np.arange(len(live)), gy[live]] >> gx[live]) & one != 0
+        path[live[found]] = t
+        keep = ~found & ring.any(axis=1)
+        live = live[keep]
+        if not len(live):
+            break
+        region, grown, quiet = region[keep], grown[keep], quiet[keep]
+    return path
+
+
+# The longest justified path any layout allows, found by enumerating every pit set and
+# Wumpus cell. Larger boards use a bound: the path is a shortest one, so no two of its cells
+# that are not consecutive touch, and no 2x2 block holds four of them.
+LONGEST_PATH = {2: 1, 3: 4, 4: 8, 5: 13}
+
+
+def longest_path(n: int) -> int:
+    return LONGEST_PATH.get(n, n * n - (n // 2) ** 2 - 1)
+
+
+def solvable_worlds(k: int, rng: Optional[np.random.Generator] = None, n: int = GRID_SIZE,
+                    pit_prob: float = CELL_PIT_PROB, pit_count: Optional[int] = None,
+                    min_path: int = 1, max_path: Optional[int] = None,
+                    max_draws: Optional[int] = None) -> WorldBatch:
+    # generate_worlds, keeping only worlds whose justified path to the gold is between
+    # min_path and max_path moves; the band is the difficulty knob. A band too rare to
+    # fill within max_draws draws (default 16M, or 1024 per world asked for) is an error.
+    if rng is None:
+        rng = np.random.default_rng()
+    longest = longest_path(n)
+    if max_path is None:
+        max_path = longest
+    if not 1 <= min_path <= max_path <= longest:
+        raise ValueError(f"need 1 <= min_path <= max_path <= {longest} on {n}x{n}, got {min_path}..{max_path}")
+    if max_draws is None:
+        max_draws = max(1 << 24, 1024 * k)
+    # batches stay around 16M cells so large boards do not exhaust memory
+    largest = max(64, (1 << 24) // (n * n))
+    parts = []
+    have = 0
+    tried = 0
+    draw = min(largest, max(1024, 2 * k), max_draws)
+    while have < k:
+        if tried >= max_draws:
+            raise ValueError(f"only {have} of {k} worlds in {tried} draws have a justified path of "
+                             f"{min_path}..{max_path} moves")
+        b = generate_worlds(draw, rng, n, pit_prob, pit_count)
+        tried += draw
+        path = justified_path(b)
+        keep = (path >= min_path) & (path <= max_path)
+        got = int(keep.sum())
+        if got:
+            parts.append(WorldBatch(n, b.pits[keep], b.wumpus[keep], b.gold[keep], path[keep]))
+            have += got
+        # draw about what is still missing at the acceptance rate seen so far
+        draw = max(64, min(largest, 2 * (k - have) * draw // max(got, 1), max_draws - tried))
+    return WorldBatch(n, np.concatenate([p.pits for p in parts])[:k], np.concatenate([p.wumpus for p in parts])[:k],
+                      np.concatenate([p.gold for p in parts])[:k], np.concatenate([p.path for p in parts])[:k])
@@ -1,14 +1,24 @@
-import random
+import argparse
+import queue
 import sys
+import threading
+import time
 import pygame
-from dataclasses import dataclass, field
-from typing import List, Tuple, Optional, Set
-from collections import deque
+from functools import partial
+from typing import Dict, List, Optional, Tuple
+from engine import CELL_PIT_PROB, GRID_SIZE, EAST, NORTH, WEST, Agent, Game, Layout, World, check_board
+from headless import classify, default_max_steps
+from replay import Replay, record
 
-GRID_SIZE = 4
-CELL_PIT_PROB = 0.2
 WINDOW_SCALE = 140
+MAX_BOARD_PX = 896
+HUD_HEIGHT = 80
+GLYPH_CACHE_SIZE = 512
 FPS = 30
+# agent steps per frame in auto-run, 0 shows every step the worker has finished
+SPEEDS = (1, 2, 4, 8, 16, 64, 256, 1024, 0)
+# steps kept queued ahead of the display at "max" speed
+MAX_AHEAD = 256
 
 WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
@@ -21,436 +31,6 @@ GOLD = (212, 175, 55)
 PURPLE = (150, 60, 180)
 BROWN = (139, 69, 19)
 
-DIRS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
-EAST, NORTH, WEST, SOUTH = 0, 1, 2, 3
-
-@dataclass
-class Percepts:
-    breeze: bool = False
-    stench: bool = False
-    glitter: bool = False
-    bump: bool = False
-    scream: bool = False
-
-@dataclass
-class World:
-    n: int = GRID_SIZE
-    pits: Set[Tuple[int, int]] = field(default_factory=set)
-    wumpus: Optional[Tuple[int, int]] = None
-    gold: Optional[Tuple[int, int]] = None
-    wumpus_alive: bool = True
-
-    def inside(self, x: int, y: int) -> bool:
-        return 1 <= x <= self.n and 1 <= y <= self.n
-
-    def neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
-        res = []
-        for dx, dy in DIRS:
-            nx, ny = x + dx, y + dy
-            if self.inside(nx, ny):
-                res.append((nx, ny))
-        return res
-
-    def percepts_at(self, x: int, y: int, bump: bool = False, scream: bool = False) -> Percepts:
-        breeze = any((nx, ny) in self.pits for nx, ny in self.neighbors(x, y))
-        stench = self.wumpus_alive and any((nx, ny) == self.wumpus for nx, ny in self.neighbors(x, y))
-        glitter = (x, y) == self.gold
-        return Percepts(breeze=breeze, stench=stench, glitter=glitter, bump=bump, scream=scream)
-
-    def reset_random(self):
-        self.pits.clear()
-        self.wumpus_alive = True
-        self.wumpus = None
-        self.gold = None
-        for x in range(1, self.n + 1):
-            for y in range(1, self.n + 1):
-                if (x, y) == (1, 1):
-                    continue
-                if random.random() < CELL_PIT_PROB:
-                    self.pits.add((x, y))
-        while True:
-            wx, wy = random.randint(1, self.n), random.randint(1, self.n)
-            if (wx, wy) != (1, 1):  # allow Wumpus anywhere except start (even in a pit)
-                self.wumpus = (wx, wy)
-                break
-        while True:
-            gx, gy = random.randint(1, self.n), random.randint(1, self.n)
-            if (gx, gy) != (1, 1):  # allow gold anywhere except start (even in a pit or on the Wumpus)
-                self.gold = (gx, gy)
-                break
-
-@dataclass
-class AgentState:
-    x: int = 1
-    y: int = 1
-    dir: int = EAST
-    has_gold: bool = False
-    arrow_available: bool = True
-    alive: bool = True
-
-@dataclass
-class Game:
-    world: World = field(default_factory=World)
-    agent: AgentState = field(default_factory=AgentState)
-    score: int = 0
-    terminal: bool = False
-    last_scream: bool = False
-
-    def reset(self):
-        self.world.reset_random()
-        self.agent = AgentState()
-        self.score = 0
-        self.terminal = False
-        self.last_scream = False
-
-    def turn_left(self):
-        if self.terminal:
-            return self.percepts()
-        self.agent.dir = (self.agent.dir + 1) % 4
-        self.score -= 1
-        return self.percepts()
-
-    def turn_right(self):
-        if self.terminal:
-            return self.percepts()
-        self.agent.dir = (self.agent.dir - 1) % 4
-        self.score -= 1
-        return self.percepts()
-
-    def move_forward(self):
-        if self.terminal:
-            return self.percepts()
-        dx, dy = DIRS[self.agent.dir]
-        nx, ny = self.agent.x + dx, self.agent.y + dy
-        bump = False
-        if not self.world.inside(nx, ny):
-            bump = True
-        else:
-            self.agent.x, self.agent.y = nx, ny
-            if (nx, ny) in self.world.pits:
-                self.agent.alive = False
-                self.terminal = True
-                self.score -= 1
-                self.score -= 1000
-                return self.percepts()
-            if self.world.wumpus_alive and (nx, ny) == self.world.wumpus:
-                self.agent.alive = False
-                self.terminal = True
-                self.score -= 1
-                self.score -= 1000
-                return self.percepts()
-        self.score -= 1
-        return self.percepts(bump=bump)
-
-    def grab(self):
-        if self.terminal:
-            return self.percepts()
-        if (self.agent.x, self.agent.y) == self.world.gold and not self.agent.has_gold:
-            self.agent.has_gold = True
-            self.world.gold = None
-        self.score -= 1
-        return self.percepts()
-
-    def release(self):
-        if self.terminal:
-            return self.percepts()
-        if self.agent.has_gold:
-            self.world.gold = (self.agent.x, self.agent.y)
-            self.agent.has_gold = False
-        self.score -= 1
-        return self.percepts()
-
-    def shoot(self):
-        if self.terminal:
-            return self.percepts()
-        if not self.agent.arrow_available:
-            self.score -= 1
-            return self.percepts()
-        self.agent.arrow_available = False
-        self.score -= 10
-        self.score -= 1
-        x, y = self.agent.x, self.agent.y
-        dx, dy = DIRS[self.agent.dir]
-        while True:
-            x += dx
-            y += dy
-            if not self.world.inside(x, y):
-                break
-            if self.world.wumpus_alive and (x, y) == self.world.wumpus:
-                self.world.wumpus_alive = False
-                self.last_scream = True
-                break
-        return self.percepts(scream=self.last_scream)
-
-    def climb(self):
-        if self.terminal:
-            return self.percepts()
-        if (self.agent.x, self.agent.y) == (1, 1):
-            self.score -= 1
-            if self.agent.has_gold:
-                self.score += 1000
-            self.terminal = True
-        else:
-            self.score -= 1
-        return self.percepts()
-
-    def percepts(self, bump: bool = False, scream: bool = False) -> Percepts:
-        p = self.world.percepts_at(self.agent.x, self.agent.y, bump=bump, scream=scream or self.last_scream)
-        self.last_scream = False
-        return p
-
-class Agent:
-    def __init__(self, game: Game):
-        self.game = game
-        self.visited: Set[Tuple[int, int]] = set()
-        self.path_home: List[str] = []
-        self.safe: Set[Tuple[int, int]] = {(1, 1)}
-        self.pits: Set[Tuple[int, int]] = set()
-        self.wumpus_cell: Optional[Tuple[int, int]] = None
-        self.breeze_cells: Set[Tuple[int, int]] = set()
-        self.stench_cells: Set[Tuple[int, int]] = set()
-        self.plan: List[str] = []
-
-    def reset(self):
-        self.visited.clear()
-        self.path_home.clear()
-        self.safe = {(1, 1)}
-        self.pits.clear()
-        self.wumpus_cell = None
-        self.breeze_cells.clear()
-        self.stench_cells.clear()
-        self.plan.clear()
-
-    def nbrs(self, x: int, y: int) -> List[Tuple[int, int]]:
-        out: List[Tuple[int, int]] = []
-        for dx, dy in DIRS:
-            nx, ny = x + dx, y + dy
-            if 1 <= nx <= self.game.world.n and 1 <= ny <= self.game.world.n:
-                out.append((nx, ny))
-        return out
-
-    def update_knowledge(self, p: Percepts, x: int, y: int):
-        if not p.breeze and not p.stench:
-            for c in self.nbrs(x, y):
-                if c not in self.pits:
-                    self.safe.add(c)
-        if p.breeze:
-            self.breeze_cells.add((x, y))
-            unknown = [c for c in self.nbrs(x, y) if c not in self.safe and c not in self.pits and c != self.wumpus_cell]
-            if len(unknown) == 1:
-                self.pits.add(unknown[0])
-        if p.stench and self.game.world.wumpus_alive:
-            self.stench_cells.add((x, y))
-            unknown = [c for c in self.nbrs(x, y) if c not in self.safe and c not in self.pits]
-            if self.wumpus_cell is None and len(unknown) == 1:
-                self.wumpus_cell = unknown[0]
-        self.infer_wumpus_from_intersections()
-
-    def infer_wumpus_from_intersections(self):
-        if self.wumpus_cell or not self.game.world.wumpus_alive:
-            return
-        candidates: Optional[Set[Tuple[int, int]]] = None
-        for sx, sy in self.stench_cells:
-            neigh = {c for c in self.nbrs(sx, sy) if c not in self.safe and c not in self.pits}
-            candidates = neigh if candidates is None else candidates & neigh
-            if not candidates:
-                return
-        if candidates and len(candidates) == 1:
-            self.wumpus_cell = next(iter(candidates))
-
-    def cell_risk(self, cell: Tuple[int, int]) -> float:
-        if cell in self.safe or cell in self.pits:
-            return 0.0 if cell in self.safe else 1.0
-        if self.wumpus_cell and self.game.world.wumpus_alive and cell == self.wumpus_cell:
-            return 1.0
-        risk = 0.0
-        for bx, by in self.breeze_cells:
-            u = [c for c in self.nbrs(bx, by) if c not in self.safe and c not in self.pits]
-            if cell in u and len(u) > 0:
-                risk += 1.0 / len(u)
-        return risk
-
-    def best_adjacent_unknown(self, x: int, y: int) -> Optional[Tuple[int, int]]:
-        options = []
-        for dx, dy in DIRS:
-            nx, ny = x + dx, y + dy
-            if not self.game.world.inside(nx, ny):
-                continue
-            c = (nx, ny)
-            if c in self.visited or c in self.safe:
-                continue
-            if c in self.pits:
-                continue
-            if self.wumpus_cell and self.game.world.wumpus_alive and c == self.wumpus_cell:
-                continue
-            options.append((self.cell_risk(c), c))
-        if not options:
-            return None
-        options.sort(key=lambda t: (t[0], t[1][0], t[1][1]))
-        return options[0][1]
-
-    def bfs_path(self, start: Tuple[int, int], goal_pred) -> List[str]:
-        q = deque([(start, [], self.game.agent.dir)])
-        seen = {(start, self.game.agent.dir)}
-        while q:
-            (cx, cy), path, cur_dir = q.popleft()
-            if goal_pred((cx, cy)):
-                return path
-            for i, (dx, dy) in enumerate(DIRS):
-                nx, ny = cx + dx, cy + dy
-                if not self.game.world.inside(nx, ny):
-                    continue
-                nxt = (nx, ny)
-                if nxt in self.pits:
-                    continue
-                if self.wumpus_cell and self.game.world.wumpus_alive and nxt == self.wumpus_cell:
-                    continue
-                if nxt not in self.safe:
-                    continue
-                need_dir = i
-                turn = (need_dir - cur_dir) % 4
-                if turn == 0:
-                    step_seq = ["F"]
-                elif turn == 1:
-                    step_seq = ["L", "F"]
-                elif turn == 3:
-                    step_seq = ["R", "F"]
-                else:
-                    step_seq = ["L", "L", "F"]
-                new_dir = need_dir
-                state = (nxt, new_dir)
-                if state in seen:
-                    continue
-                seen.add(state)
-                q.append((nxt, path + step_seq, new_dir))
-        return []
-
-    def pick_safe_frontier(self) -> List[str]:
-        frontier = [c for c in self.safe if c not in self.visited]
-        if not frontier:
-            return []
-        start = (self.game.agent.x, self.game.agent.y)
-        best = []
-        for cell in frontier:
-            path = self.bfs_path(start, lambda pos, cell=cell: pos == cell)
-            if path and (not best or len(path) < len(best)):
-                best = path
-        return best
-
-    def execute_action(self, a: str):
-        if a == "F":
-            self.game.move_forward()
-        elif a == "L":
-            self.game.turn_left()
-        elif a == "R":
-            self.game.turn_right()
-        elif a == "C":
-            self.game.climb()
-
-    def wumpus_line_of_sight_guess(self) -> bool:
-        if not self.wumpus_cell or not self.game.world.wumpus_alive:
-            return False
-        ax, ay = self.game.agent.x, self.game.agent.y
-        wx, wy = self.wumpus_cell
-        if ax == wx:
-            desired = NORTH if wy > ay else SOUTH
-            for y in range(ay + (1 if wy > ay else -1), wy, (1 if wy > ay else -1)):
-                if (ax, y) in self.pits:
-                    return False
-            for t in self.turn_seq(self.game.agent.dir, desired):
-                self.execute_action(t)
-            self.game.shoot()
-            return True
-        if ay == wy:
-            desired = EAST if wx > ax else WEST
-            for x in range(ax + (1 if wx > ax else -1), wx, (1 if wx > ax else -1)):
-                if (x, ay) in self.pits:
-                    return False
-            for t in self.turn_seq(self.game.agent.dir, desired):
-                self.execute_action(t)
-            self.game.shoot()
-            return True
-        return False
-
-    def turn_seq(self, cur: int, target: int) -> List[str]:
-        diff = (target - cur) % 4
-        if diff == 0:
-            return []
-        if diff == 1:
-            return ["L"]
-        if diff == 3:
-            return ["R"]
-        return ["L", "L"]
-
-    def danger_ahead(self, stench_now: bool) -> bool:
-        dx, dy = DIRS[self.game.agent.dir]
-        nx, ny = self.game.agent.x + dx, self.game.agent.y + dy
-        if not self.game.world.inside(nx, ny):
-            return False
-        nxt = (nx, ny)
-        if nxt in self.pits:
-            return True
-        if self.wumpus_cell and self.game.world.wumpus_alive and nxt == self.wumpus_cell:
-            return True
-        if stench_now and nxt not in self.safe:
-            return True
-        return False
-
-    def step(self) -> bool:
-        if self.game.terminal:
-            return False
-        x, y = self.game.agent.x, self.game.agent.y
-        self.visited.add((x, y))
-        p = self.game.percepts()
-        self.update_knowledge(p, x, y)
-        if p.glitter and not self.game.agent.has_gold:
-            self.game.grab()
-            self.plan = self.bfs_path((self.game.agent.x, self.game.agent.y), lambda pos: pos == (1, 1)) + ["C"]
-            return True
-        if (x, y) == (1, 1) and self.game.agent.has_gold:
-            self.game.climb()
-            return True
-        if p.stench and self.game.agent.arrow_available:
-            if self.wumpus_line_of_sight_guess():
-                return True
-            if self.danger_ahead(stench_now=True):
-                self.game.shoot()
-                return True
-        if self.plan:
-            a = self.plan.pop(0)
-            self.execute_action(a)
-            return True
-        path = self.pick_safe_frontier()
-        if path:
-            self.plan = path
-            a = self.plan.pop(0)
-            self.execute_action(a)
-            return True
-        target = self.best_adjacent_unknown(x, y)
-        if target and not p.stench:
-            tx, ty = target
-            for i, (dx, dy) in enumerate(DIRS):
-                if (x + dx, y + dy) == (tx, ty):
-                    for t in self.turn_seq(self.game.agent.dir, i):
-                        self.execute_action(t)
-                    self.game.move_forward()
-                    return True
-        if p.stench:
-            if random.random() < 0.5:
-                self.game.turn_left()
-            else:
-                self.game.turn_right()
-            return True
-        before = (self.game.agent.x, self.game.agent.y)
-        p2 = self.game.move_forward()
-        after = (self.game.agent.x, self.game.agent.y)
-        if p2.bump or before == after:
-            if random.random() < 0.5:
-                self.game.turn_left()
-            else:
-                self.game.turn_right()
-        return True
-
 class Renderer:
     def __init__(self, game: Game):
         self.game = game
@@ -458,30 +38,89 @@ class Renderer:
         self.font = pygame.font.SysFont("arial", 18)
         self.big = pygame.font.SysFont("arial", 22, bold=True)
         self.n = game.world.n
-        w = self.n * WINDOW_SCALE
-        h = self.n * WINDOW_SCALE + 80
+        # cells shrink on large boards so the window stays on screen; offsets scale with them
+        self.cell = max(1, min(WINDOW_SCALE, MAX_BOARD_PX // self.n))
+        w = max(self.n * self.cell, 4 * WINDOW_SCALE)
+        h = self.n * self.cell + HUD_HEIGHT
         self.screen = pygame.display.set_mode((w, h))
         pygame.display.set_caption("Wumpus World")
         self.clock = pygame.time.Clock()
+        self.status = ""
+        self.speed = 1
+        self.worker: Optional["StepWorker"] = None
+        self.hud_rect = pygame.Rect(0, self.n * self.cell, w, HUD_HEIGHT)
+        self.background = pygame.Surface((w, self.n * self.cell))
+        self.background.fill(WHITE)
+        self.draw_grid(self.background)
+        self.glyphs: Dict[Tuple[str, bool, Tuple[int, int, int]], pygame.Surface] = {}
+        self.invalidate()
+
+    def invalidate(self):
+        # forget what is on screen so the next draw repaints everything
+        self.shown = None
+        self.hud_shown = None
+
+    def glyph(self, text: str, color: Tuple[int, int, int], big: bool = False) -> pygame.Surface:
+        key = (text, big, color)
+        surf = self.glyphs.get(key)
+        if surf is None:
+            if len(self.glyphs) >= GLYPH_CACHE_SIZE:
+                self.glyphs.clear()
+            surf = (self.big if big else self.font).render(text, True, color)
+            self.glyphs[key] = surf
+        return surf
+
+    def frame_state(self):
+        g = self.game
+        a = g.agent
+        # the game and layout themselves, not their ids: holding them keeps them alive, and
+        # a freed layout's id is reused by the next reset's
+        return (g, g.start_layout, g.world.wumpus_alive, g.world.gold,
+                (a.x, a.y), a.dir, a.arrow_available)
 
     def draw(self):
-        self.screen.fill(WHITE)
-        self.draw_grid()
-        self.draw_cells()
-        self.draw_hud()
-        pygame.display.flip()
+        # Only cells whose contents can have changed since the last frame are repainted:
+        # the agent's old and new cell, the gold's old and new cell, and the Wumpus
+        # neighbourhood when it dies. A new world or game repaints everything.
+        state = self.frame_state()
+        prev = self.shown
+        dirty: List[pygame.Rect] = []
+        if prev is None or prev[0] is not state[0] or prev[1] is not state[1]:
+            self.screen.blit(self.background, (0, 0))
+            self.draw_cells()
+            dirty.append(self.background.get_rect())
+        elif prev != state:
+            cells = {prev[4], state[4]}
+            if prev[3] != state[3]:
+                cells.update(c for c in (prev[3], state[3]) if c)
+            if prev[2] != state[2] and self.game.world.wumpus:
+                cells.add(self.game.world.wumpus)
+                cells.update(self.game.world.neighbors(*self.game.world.wumpus))
+            for x, y in cells:
+                dirty.append(self.draw_cell(x, y))
+        self.shown = state
+        hud = self.draw_hud()
+        if hud is not None:
+            dirty.append(hud)
+        if dirty:
+            pygame.display.update(dirty)
+
+    def px(self, v: int) -> int:
+        return max(1, v * self.cell // WINDOW_SCALE)
 
     def grid_to_screen(self, x: int, y: int) -> Tuple[int, int, int, int]:
-        cell = WINDOW_SCALE
+        cell = self.cell
         sx = (x - 1) * cell
         sy = (self.n - y) * cell
         return sx, sy, cell, cell
 
-    def draw_grid(self):
-        cell = WINDOW_SCALE
+    def draw_grid(self, surface: pygame.Surface):
+        cell = self.cell
+        if cell < 4:
+            return
         for i in range(self.n + 1):
-            pygame.draw.line(self.screen, GRAY, (i * cell, 0), (i * cell, self.n * cell), 1)
-            pygame.draw.line(self.screen, GRAY, (0, i * cell), (self.n * cell, i * cell), 1)
+            pygame.draw.line(surface, GRAY, (i * cell, 0), (i * cell, self.n * cell), 1)
+            pygame.draw.line(surface, GRAY, (0, i * cell), (self.n * cell, i * cell), 1)
 
     def draw_triangle(self, rect: Tuple[int, int, int, int], direction: int, color: Tuple[int, int, int]):
         x, y, w, h = rect
@@ -499,70 +138,340 @@ class Renderer:
         pygame.draw.polygon(self.screen, color, pts)
 
     def draw_cells(self):
+        world = self.game.world
+        labels = self.cell >= 32
         for x in range(1, self.n + 1):
             for y in range(1, self.n + 1):
                 rect = self.grid_to_screen(x, y)
-                is_pit = (x, y) in self.game.world.pits
-                is_wumpus = self.game.world.wumpus_alive and self.game.world.wumpus == (x, y)
-                if not is_pit and not is_wumpus:
-                    p = self.game.world.percepts_at(x, y)
-                    if p.breeze:
-                        pygame.draw.circle(self.screen, BLUE, (rect[0] + rect[2] - 20, rect[1] + 20), 8)
-                    if p.stench:
-                        pygame.draw.circle(self.screen, PURPLE, (rect[0] + 20, rect[1] + 20), 8)
-                    if (x, y) == self.game.world.gold:
-                        pygame.draw.circle(self.screen, GOLD, (rect[0] + rect[2] // 2, rect[1] + rect[3] // 2), 10)
-                else:
-                    if (x, y) == self.game.world.gold:
-                        pygame.draw.circle(self.screen, GOLD, (rect[0] + rect[2] // 2, rect[1] + rect[3] // 2), 10)
-        for (x, y) in self.game.world.pits:
-            rect = self.grid_to_screen(x, y)
-            pygame.draw.rect(self.screen, DARK_GRAY, (rect[0] + 10, rect[1] + 10, rect[2] - 20, rect[3] - 20), 2)
-            txt = self.font.render("P", True, DARK_GRAY)
-            self.screen.blit(txt, (rect[0] + 6, rect[1] + rect[3] - 24))
-        if self.game.world.wumpus_alive and self.game.world.wumpus:
-            wx, wy = self.game.world.wumpus
-            rect = self.grid_to_screen(wx, wy)
-            pygame.draw.rect(self.screen, RED, (rect[0] + 14, rect[1] + 14, rect[2] - 28, rect[3] - 28), 2)
-            txt = self.font.render("W", True, RED)
-            self.screen.blit(txt, (rect[0] + rect[2] - 24, rect[1] + rect[3] - 24))
+                is_pit = (x, y) in world.pits
+                is_wumpus = world.wumpus_alive and world.wumpus == (x, y)
+                self.draw_contents(x, y, rect, is_pit, is_wumpus, labels)
+        for (x, y) in world.pits:
+            self.draw_pit(self.grid_to_screen(x, y), labels)
+        if world.wumpus_alive and world.wumpus:
+            self.draw_wumpus(self.grid_to_screen(*world.wumpus), labels)
+        self.draw_agent()
+
+    def draw_cell(self, x: int, y: int) -> pygame.Rect:
+        world = self.game.world
+        labels = self.cell >= 32
+        rect = self.grid_to_screen(x, y)
+        area = pygame.Rect(rect)
+        self.screen.blit(self.background, area, area)
+        is_pit = (x, y) in world.pits
+        is_wumpus = world.wumpus_alive and world.wumpus == (x, y)
+        self.draw_contents(x, y, rect, is_pit, is_wumpus, labels)
+        if is_pit:
+            self.draw_pit(rect, labels)
+        if is_wumpus:
+            self.draw_wumpus(rect, labels)
+        if (self.game.agent.x, self.game.agent.y) == (x, y):
+            self.draw_agent()
+        return area
+
+    def draw_contents(self, x: int, y: int, rect, is_pit: bool, is_wumpus: bool, labels: bool):
+        px = self.px
+        world = self.game.world
+        if not is_pit and not is_wumpus:
+            p = world.percepts_at(x, y)
+            if p.breeze:
+                pygame.draw.circle(self.screen, BLUE, (rect[0] + rect[2] - px(20), rect[1] + px(20)), px(8))
+            if p.stench:
+                pygame.draw.circle(self.screen, PURPLE, (rect[0] + px(20), rect[1] + px(20)), px(8))
+        if (x, y) == world.gold:
+            pygame.draw.circle(self.screen, GOLD, (rect[0] + rect[2] // 2, rect[1] + rect[3] // 2), px(10))
+
+    def draw_pit(self, rect, labels: bool):
+        px = self.px
+        pygame.draw.rect(self.screen, DARK_GRAY, (rect[0] + px(10), rect[1] + px(10), rect[2] - px(20), rect[3] - px(20)), px(2))
+        if labels:
+            self.screen.blit(self.glyph("P", DARK_GRAY), (rect[0] + 6, rect[1] + rect[3] - 24))
+
+    def draw_wumpus(self, rect, labels: bool):
+        px = self.px
+        pygame.draw.rect(self.screen, RED, (rect[0] + px(14), rect[1] + px(14), rect[2] - px(28), rect[3] - px(28)), px(2))
+        if labels:
+            self.screen.blit(self.glyph("W", RED), (rect[0] + rect[2] - 24, rect[1] + rect[3] - 24))
+
+    def draw_agent(self):
+        px = self.px
         ax, ay = self.game.agent.x, self.game.agent.y
         rect = self.grid_to_screen(ax, ay)
-        pygame.draw.rect(self.screen, GREEN, (rect[0] + 6, rect[1] + 6, rect[2] - 12, rect[3] - 12), 2)
+        pygame.draw.rect(self.screen, GREEN, (rect[0] + px(6), rect[1] + px(6), rect[2] - px(12), rect[3] - px(12)), px(2))
         self.draw_triangle(rect, self.game.agent.dir, GREEN)
         if not self.game.agent.arrow_available:
-            pygame.draw.line(self.screen, BROWN, (rect[0] + 8, rect[1] + rect[3] - 8), (rect[0] + rect[2] - 8, rect[1] + rect[3] - 8), 3)
-
-    def draw_hud(self):
-        y = self.n * WINDOW_SCALE + 8
-        s1 = self.big.render(f"Score: {self.game.score}", True, BLACK)
-        s2 = self.font.render(f"Gold: {'yes' if self.game.agent.has_gold else 'no'}  Arrow: {'yes' if self.game.agent.arrow_available else 'no'}  Alive: {'yes' if self.game.agent.alive else 'no'}", True, BLACK)
-        s3_text = "Terminal: yes" if self.game.terminal else "Terminal: no"
-        s3 = self.font.render(s3_text, True, RED if self.game.terminal else BLACK)
-        help1 = self.font.render("Keys: R reset, N step, A auto-run, Q quit", True, BLACK)
-        self.screen.blit(s1, (10, y))
-        self.screen.blit(s2, (10, y + 26))
-        self.screen.blit(s3, (10, y + 48))
-        self.screen.blit(help1, (280, y + 26))
-
-
-def auto_episode(game: Game, agent: Agent, renderer: Renderer):
-    while not game.terminal:
+            pygame.draw.line(self.screen, BROWN, (rect[0] + px(8), rect[1] + rect[3] - px(8)), (rect[0] + rect[2] - px(8), rect[1] + rect[3] - px(8)), px(3))
+
+    def hud_lines(self) -> Tuple[str, str, str, str, str]:
+        a = self.game.agent
+        w = self.worker
+        worker = ""
+        if w is not None:
+            # latency is rounded so the HUD only repaints when it visibly changes
+            worker = f"Step: {w.latency * 1e3:.0f} ms  queue: {'|' * min(w.pending, 20)}{w.pending}  late: {w.late}"
+        return (f"Score: {self.game.score}",
+                f"Gold: {'yes' if a.has_gold else 'no'}  Arrow: {'yes' if a.arrow_available else 'no'}  Alive: {'yes' if a.alive else 'no'}",
+                "Terminal: yes" if self.game.terminal else "Terminal: no",
+                self.status, worker)
+
+    def draw_hud(self) -> Optional[pygame.Rect]:
+        lines = self.hud_lines()
+        if lines == self.hud_shown:
+            return None
+        self.hud_shown = lines
+        score, flags, terminal, status, worker = lines
+        y = self.hud_rect.y + 8
+        self.screen.fill(WHITE, self.hud_rect)
+        self.screen.blit(self.glyph(score, BLACK, big=True), (10, y))
+        if worker:
+            self.screen.blit(self.glyph(worker, DARK_GRAY), (280, y))
+        self.screen.blit(self.glyph(flags, BLACK), (10, y + 26))
+        self.screen.blit(self.glyph(terminal, RED if self.game.terminal else BLACK), (10, y + 48))
+        self.screen.blit(self.glyph("Keys: R reset, N step, A auto-run, P replay, Q quit", BLACK), (280, y + 26))
+        if status:
+            self.screen.blit(self.glyph(status, BLUE), (280, y + 48))
+        return self.hud_rect
+
+
+class StepWorker:
+    """Runs agent steps on a background thread, so a slow step never holds up a frame.
+
+    The agent plays a shadow Game loaded with the displayed game's layout. Each finished
+    step comes back as its action bytes and is applied to the displayed game with
+    Game.apply, so the window only ever replays moves. A reset or cancel bumps the
+    generation, and requests or results from an older one are dropped. Steps slower than
+    `budget` seconds are counted as late. An agent with its own `budget` attribute
+    (PlannerAgent) has that capped to the same value.
+    """
+
+    def __init__(self, game: Game, agent_cls=Agent, budget: float = 0.1):
+        w = game.world
+        self.shadow = Game(world=World(n=w.n, pit_prob=w.pit_prob, pit_count=w.pit_count))
+        self.agent = agent_cls(self.shadow)
+        if getattr(self.agent, "budget", None) is not None:
+            self.agent.budget = min(self.agent.budget, budget)
+        self.budget = budget
+        self.requests: "queue.Queue" = queue.Queue()
+        self.results: "queue.Queue" = queue.Queue()
+        self.generation = 0
+        self.pending = 0  # steps requested and not yet applied
+        self.latency = 0.0
+        self.late = 0
+        self.reset(game.start_layout)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def reset(self, layout: Layout):
+        self.generation += 1
+        self.pending = 0
+        self.requests.put((self.generation, "reset", layout))
+
+    def request(self, k: int = 1):
+        for _ in range(k):
+            self.requests.put((self.generation, "step", None))
+        self.pending += k
+
+    def cancel(self, game: Game):
+        # Drop every queued or finished step and bring the shadow back to the displayed game,
+        # which may be behind it by up to the steps that were in flight.
+        self.generation += 1
+        self.pending = 0
+        self.requests.put((self.generation, "sync", bytes(game.actions)))
+
+    def sync(self, actions: bytes, rng_state):
+        # Replay the agent from the episode's start with the same RNG, so its knowledge is
+        # what it had after those actions. An agent whose steps depend on timing
+        # (PlannerAgent) may not retrace them; it then restarts from the displayed position,
+        # having seen the percepts of every cell along the way.
+        shadow, agent = self.shadow, self.agent
+        shadow.reset(shadow.start_layout)
+        agent.reset()
+        agent.rng.setstate(rng_state)
+        while len(shadow.actions) < len(actions) and not shadow.terminal:
+            agent.step()
+        if bytes(shadow.actions) != actions:
+            shadow.reset(shadow.start_layout)
+            agent.reset()
+            for a in actions:
+                s = shadow.agent
+                agent.mark_visited(s.x, s.y)
+                agent.update_knowledge(shadow.percepts(), s.x, s.y)
+                shadow.apply(a)
+
+    def run(self):
+        shadow = self.shadow
+        agent = self.agent
+        generation = 0
+        clock = time.perf_counter
+        rng_state = agent.rng.getstate()
+        while True:
+            msg = self.requests.get()
+            if msg is None:
+                return
+            gen, op, arg = msg
+            if op == "reset":
+                generation = gen
+                shadow.reset(arg)
+                agent.reset()
+                rng_state = agent.rng.getstate()
+                continue
+            if op == "sync":
+                generation = gen
+                self.sync(arg, rng_state)
+                continue
+            if gen != generation:
+                continue
+            k = len(shadow.actions)
+            t0 = clock()
+            if not shadow.terminal:
+                agent.step()
+            self.results.put((gen, bytes(shadow.actions[k:]), clock() - t0))
+
+    def apply(self, game: Game, limit: Optional[int] = None) -> int:
+        # play finished steps on the displayed game, at most `limit` of them
+        done = 0
+        while limit is None or done < limit:
+            try:
+                gen, actions, latency = self.results.get_nowait()
+            except queue.Empty:
+                break
+            if gen != self.generation:
+                continue
+            self.pending -= 1
+            self.latency = latency
+            self.late += latency > self.budget
+            for a in actions:
+                game.apply(a)
+            done += 1
+        return done
+
+    def close(self):
+        self.requests.put(None)
+
+
+def speed_label(speed: int) -> str:
+    return "max" if speed == 0 else f"x{speed}"
+
+
+def auto_episode(game: Game, worker: StepWorker, renderer: Renderer):
+    # Simulation is decoupled from the frame rate: the worker is kept `speed` steps ahead
+    # (MAX_AHEAD at "max"), each frame applies up to `speed` finished steps, and only the
+    # last state is drawn. With skim on, a finished episode is reset and the next one
+    # starts straight away.
+    paused = False
+    skim = False
+    episodes = wins = 0
+    max_steps = default_max_steps(game.world.n)
+    steps = 0
+    while True:
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 pygame.quit()
                 sys.exit(0)
-        agent.step()
+            if event.type != pygame.KEYDOWN:
+                continue
+            if event.key in (pygame.K_a, pygame.K_ESCAPE):
+                renderer.status = ""
+                worker.cancel(game)
+                return
+            elif event.key == pygame.K_SPACE:
+                paused = not paused
+            elif event.key == pygame.K_c:
+                skim = not skim
+            elif event.key in (pygame.K_UP, pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                renderer.speed = SPEEDS[min(len(SPEEDS) - 1, SPEEDS.index(renderer.speed) + 1)]
+            elif event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS):
+                renderer.speed = SPEEDS[max(0, SPEEDS.index(renderer.speed) - 1)]
+        if not paused:
+            speed = renderer.speed
+            steps += worker.apply(game, speed or None)
+            if (game.terminal or steps >= max_steps) and skim:
+                episodes += 1
+                wins += classify(game) == "win"
+                game.reset()
+                worker.reset(game.start_layout)
+                steps = 0
+            if not game.terminal:
+                ahead = min(speed or MAX_AHEAD, max_steps - steps) - worker.pending
+                if ahead > 0:
+                    worker.request(ahead)
+        done = (game.terminal or steps >= max_steps) and not skim
+        state = "paused" if paused else ("done" if done else "running")
+        renderer.status = f"Speed {speed_label(renderer.speed)} {state}"
+        if skim:
+            renderer.status += f"  ep {episodes} won {wins}"
         renderer.draw()
+        if done:
+            renderer.status = ""
+            worker.cancel(game)
+            return
         renderer.clock.tick(FPS)
 
 
-def main():
-    random.seed()
-    game = Game()
+def replay_episode(game: Game, renderer: Renderer):
+    rp = Replay(record(game))
+    view = rp.game_at(len(rp))
+    live = renderer.game
+    renderer.game = view
+    t = len(rp)
+    moves = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_PAGEUP: -10, pygame.K_PAGEDOWN: 10}
+    viewing = True
+    while viewing:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                sys.exit(0)
+            if event.type != pygame.KEYDOWN:
+                continue
+            if event.key in (pygame.K_p, pygame.K_ESCAPE):
+                viewing = False
+            elif event.key == pygame.K_HOME:
+                t = 0
+            elif event.key == pygame.K_END:
+                t = len(rp)
+            elif event.key in moves:
+                t = max(0, min(len(rp), t + moves[event.key]))
+            else:
+                continue
+            rp.restore(view, t)
+            renderer.invalidate()
+        renderer.status = f"Replay {t}/{len(rp)}  (arrows, PgUp/PgDn, Home/End, P exit)"
+        renderer.draw()
+        renderer.clock.tick(FPS)
+    renderer.game = live
+    renderer.status = ""
+    renderer.invalidate()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Interactive Wumpus World.")
+    parser.add_argument("--size", type=int, default=GRID_SIZE, help="board side length")
+    parser.add_argument("--pit-prob", type=float, default=CELL_PIT_PROB)
+    parser.add_argument("--pit-count", type=int, default=None, help="exact number of pits per world")
+    parser.add_argument("--exact-risk", action="store_true", help="rank risky moves with inference.RiskModel")
+    parser.add_argument("--planner-ms", type=float, default=None,
+                        help="settle uncertain moves with planner.PlannerAgent, this many ms per decision")
+    parser.add_argument("--step-budget-ms", type=float, default=100.0,
+                        help="steps slower than this count as late; also caps --planner-ms")
+    args = parser.parse_args(argv)
+    try:
+        check_board(args.size, args.pit_prob, args.pit_count)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.planner_ms is not None and args.exact_risk:
+        parser.error("--planner-ms plays its own agent and cannot take --exact-risk")
+    game = Game(world=World(n=args.size, pit_prob=args.pit_prob, pit_count=args.pit_count))
     game.reset()
-    agent = Agent(game)
+    agent_cls = Agent
+    if args.exact_risk:
+        from inference import RiskModel
+        agent_cls = partial(Agent, risk_model=RiskModel(args.pit_prob))
+    if args.planner_ms is not None:
+        from planner import PlannerAgent
+        agent_cls = partial(PlannerAgent, budget=args.planner_ms / 1000)
     renderer = Renderer(game)
+    worker = StepWorker(game, agent_cls, args.step_budget_ms / 1000)
+    renderer.worker = worker
     running = True
     while running:
         for event in pygame.event.get():
@@ -572,14 +481,19 @@ def main():
                 if event.key in (pygame.K_q, pygame.K_ESCAPE):
                     running = False
                 elif event.key == pygame.K_r:
-                    game.reset(); agent.reset()
+                    game.reset()
+                    worker.reset(game.start_layout)
                 elif event.key == pygame.K_n:
-                    agent.step()
+                    worker.request()
                 elif event.key == pygame.K_a:
-                    auto_episode(game, agent, renderer)
+                    auto_episode(game, worker, renderer)
+                elif event.key == pygame.K_p:
+                    replay_episode(game, renderer)
+        worker.apply(game)
         renderer.draw()
         renderer.clock.tick(FPS)
+    worker.close()
     pygame.quit()
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1:])